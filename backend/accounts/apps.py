@@ -4,3 +4,13 @@ from django.apps import AppConfig
 class AccountsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'accounts'
+
+    def ready(self):
+        from django.db.models.signals import post_delete, post_save
+
+        from . import throttling  # noqa: F401 (registers the shared cache check)
+        from .authentication import forget_user
+        from .models import User
+
+        post_save.connect(forget_user, sender=User, dispatch_uid='accounts.forget_user.save')
+        post_delete.connect(forget_user, sender=User, dispatch_uid='accounts.forget_user.delete')
@@ -0,0 +1,9 @@
+from django.urls import path
+from . import async_views
+
+urlpatterns = [
+    path('register/', async_views.register, name='async_register'),
+    path('login/', async_views.login, name='async_login'),
+    path('refresh/', async_views.refresh, name='async_refresh'),
+    path('profile/', async_views.profile, name='async_profile'),
+]
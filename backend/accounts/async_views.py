@@ -0,0 +1,188 @@
+"""
+Async versions of the auth views, for ASGI servers. Mounted under
+/api/async/auth/ with the same request and response shapes as views.py.
+"""
+from asgiref.sync import sync_to_async
+from django.contrib.auth import authenticate
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.password_validation import validate_password
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from password_manager.async_api import api_view, json_response, offload
+from password_manager.metrics import LOGINS
+
+from .models import User
+from .serializers import UserSerializer
+from .throttling import (
+    LOGIN_THROTTLES, REGISTER_THROTTLES, clear_failures, lockout_remaining, record_failure, recently_failed,
+    throttle_wait,
+)
+from .views import duplicate_user_error
+
+
+def throttled(wait):
+    return json_response({
+        'detail': f'Request was throttled. Expected available in {wait} seconds.'
+    }, status=429, headers={'Retry-After': str(wait)})
+
+
+def insert_user(user):
+    with transaction.atomic():
+        user.save(force_insert=True)
+
+
+def token_pair(user):
+    refresh = RefreshToken.for_user(user)
+    return {
+        'refresh': str(refresh),
+        'access': str(refresh.access_token),
+    }
+
+
+@api_view(['POST'], authenticated=False)
+async def register(request):
+    """Register a new user"""
+    # The throttle and lockout state is in the cache, which may be a
+    # network round trip: keep it off the event loop like other blocking calls
+    wait = await offload(throttle_wait, request, REGISTER_THROTTLES)
+    if wait is not None:
+        return throttled(wait)
+    
+    try:
+        data = request.data if isinstance(request.data, dict) else {}
+        email = data.get('email')
+        username = data.get('username')
+        password = data.get('password')
+        
+        # Validate required fields
+        if not email or not username or not password:
+            return json_response({
+                'error': 'Email, username, and password are required'
+            }, status=400)
+        
+        # Validate password before paying for the hash
+        try:
+            await offload(validate_password, password)
+        except ValidationError as e:
+            return json_response({
+                'error': list(e.messages)
+            }, status=400)
+        
+        # Hash on the thread pool, then one INSERT; the unique constraints
+        # catch taken emails and usernames
+        user = User(email=User.objects.normalize_email(email), username=User.normalize_username(username))
+        user.password = await offload(make_password, password)
+        try:
+            await sync_to_async(insert_user)(user)
+        except IntegrityError as e:
+            error = duplicate_user_error(e)
+            if error is None:
+                raise
+            return json_response({
+                'error': error
+            }, status=400)
+        await offload(clear_failures, email, password)
+        
+        return json_response({
+            'message': 'User registered successfully',
+            'tokens': token_pair(user),
+            'user': UserSerializer(user).data
+        }, status=201)
+    
+    except Exception:
+        return json_response({
+            'error': 'Registration failed'
+        }, status=500)
+
+
+@api_view(['POST'], authenticated=False)
+async def login(request):
+    """Login user"""
+    wait = await offload(throttle_wait, request, LOGIN_THROTTLES)
+    if wait is not None:
+        return throttled(wait)
+    
+    try:
+        data = request.data if isinstance(request.data, dict) else {}
+        email = data.get('email')
+        password = data.get('password')
+        
+        if not email or not password:
+            return json_response({
+                'error': 'Email and password are required'
+            }, status=400)
+        
+        locked = await offload(lockout_remaining, email)
+        if locked:
+            LOGINS.inc(outcome='locked')
+            return json_response({
+                'error': f'Too many failed login attempts. Try again in {locked} seconds.'
+            }, status=429, headers={'Retry-After': str(locked)})
+        
+        # Authenticate through the auth backends as the sync view does,
+        # skipping the hasher for a pair that just failed. The backends query
+        # the database, so they run on Django's sync thread
+        failed_before = await offload(recently_failed, email, password)
+        user = None if failed_before else await sync_to_async(authenticate)(username=email, password=password)
+        
+        if user:
+            await offload(clear_failures, email)
+            LOGINS.inc(outcome='success')
+            return json_response({
+                'message': 'Login successful',
+                'tokens': token_pair(user),
+                'user': UserSerializer(user).data
+            })
+        
+        await offload(record_failure, email, password)
+        LOGINS.inc(outcome='cached_failure' if failed_before else 'invalid')
+        return json_response({
+            'error': 'Invalid email or password'
+        }, status=401)
+    
+    except Exception:
+        return json_response({
+            'error': 'Login failed'
+        }, status=500)
+
+
+@api_view(['POST'], authenticated=False)
+async def refresh(request):
+    """Exchange a refresh token for a new access token (and refresh token, when rotating)"""
+    token = request.data.get('refresh') if isinstance(request.data, dict) else None
+    if not isinstance(token, str) or not token:
+        return json_response({
+            'error': 'Refresh token is required'
+        }, status=400)
+    
+    serializer = TokenRefreshSerializer(data={'refresh': token})
+    try:
+        if not serializer.is_valid():
+            return json_response({
+                'error': 'Refresh token is required'
+            }, status=400)
+    except TokenError:
+        return json_response({
+            'error': 'Invalid or expired refresh token'
+        }, status=401)
+    
+    return json_response({
+        'tokens': {
+            'refresh': serializer.validated_data.get('refresh', token),
+            'access': serializer.validated_data['access'],
+        }
+    })
+
+
+@api_view(['GET'])
+async def profile(request):
+    """Get user profile"""
+    # request.user is a LazyUser, which cannot load its row on the event loop
+    user = await User.objects.aget(pk=request.user.id)
+    return json_response({
+        'user': UserSerializer(user).data
+    })
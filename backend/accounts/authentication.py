@@ -0,0 +1,87 @@
+"""
+Stateless JWT authentication.
+
+simplejwt's ``JWTAuthentication`` loads the user row on every request, but
+most views only need the user id, which the signed token already carries.
+``StatelessJWTAuthentication`` builds a ``LazyUser`` from the token claims
+instead; the row is fetched only if a view reads another user field.
+
+Tokens of deactivated or deleted users are rejected through a small TTL
+cache of the user's ``is_active`` flag (``settings.ACCOUNTS_AUTH
+['ACTIVE_CHECK_TTL']`` seconds, ``None`` to trust tokens until they
+expire). Saving or deleting a user clears its entry, so revocation is
+immediate within a process and bounded by the TTL across processes.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.functional import SimpleLazyObject
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from .models import User
+
+DEFAULT_ACTIVE_CHECK_TTL = 60
+
+
+def active_cache_key(user_id):
+    return f'accounts:active:{user_id}'
+
+
+def is_active(user_id):
+    """Whether the user exists and is active, cached for ACTIVE_CHECK_TTL"""
+    ttl = getattr(settings, 'ACCOUNTS_AUTH', {}).get('ACTIVE_CHECK_TTL', DEFAULT_ACTIVE_CHECK_TTL)
+    if ttl is None:
+        return True
+
+    key = active_cache_key(user_id)
+    active = cache.get(key)
+    if active is None:
+        active = User.objects.filter(pk=user_id, is_active=True).exists()
+        cache.set(key, active, ttl)
+    return active
+
+
+def forget_user(sender, instance, **kwargs):
+    """Signal receiver: drop the cached is_active flag for a saved or deleted user"""
+    cache.delete(active_cache_key(instance.pk))
+
+
+class LazyUser(SimpleLazyObject):
+    """
+    A User whose id is known up front; the row is loaded on first access to
+    any other attribute. Filter with ``user_id=request.user.id``, since
+    passing the object itself to the ORM loads it.
+    """
+
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, user_id):
+        self.__dict__['_user_id'] = user_id
+        super().__init__(lambda: User.objects.get(pk=user_id))
+
+    @property
+    def id(self):
+        return self.__dict__['_user_id']
+
+    pk = id
+
+    def __bool__(self):
+        return True
+
+    def __repr__(self):
+        return f'<LazyUser: {self.id}>'
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[jwt_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+        if not is_active(user_id):
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        return LazyUser(user_id)
@@ -0,0 +1,108 @@
+"""
+Password hashers tuned to the host by ``manage.py calibrate_hashers``.
+
+The command benchmarks PBKDF2, scrypt and Argon2 and writes the chosen
+parameters to the JSON file named by ``settings.PASSWORD_HASHER_PROFILE``::
+
+    {
+        "algorithm": "scrypt",
+        "pbkdf2_sha256": {"iterations": 870000},
+        "scrypt": {"work_factor": 32768, "block_size": 8, "parallelism": 2},
+        "argon2": {"time_cost": 3, "memory_cost": 65536, "parallelism": 2}
+    }
+
+The hashers below read their cost parameters from that profile, falling
+back to Django's defaults for anything it leaves out, and keep Django's
+algorithm names so every existing hash still verifies. settings.py puts the
+profile's algorithm first in ``PASSWORD_HASHERS``; Django then re-hashes a
+user's password with it (and with the current parameters) the next time
+they log in.
+"""
+import base64
+import functools
+import hashlib
+import json
+
+from django.conf import settings
+from django.contrib.auth.hashers import (
+    Argon2PasswordHasher, PBKDF2PasswordHasher, ScryptPasswordHasher,
+)
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+
+def read_profile(path):
+    """The profile at ``path``, or {} if there is none yet"""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+@functools.lru_cache(maxsize=None)
+def load_profile():
+    return read_profile(settings.PASSWORD_HASHER_PROFILE)
+
+
+@receiver(setting_changed)
+def reset_profile(*, setting, **kwargs):
+    if setting in ('PASSWORD_HASHER_PROFILE', 'PASSWORD_HASHERS'):
+        load_profile.cache_clear()
+
+
+def profile_param(algorithm, name, default):
+    return load_profile().get(algorithm, {}).get(name, default)
+
+
+class CalibratedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    @property
+    def iterations(self):
+        return profile_param(self.algorithm, 'iterations', PBKDF2PasswordHasher.iterations)
+
+
+class CalibratedScryptPasswordHasher(ScryptPasswordHasher):
+    @property
+    def work_factor(self):
+        return profile_param(self.algorithm, 'work_factor', ScryptPasswordHasher.work_factor)
+
+    @property
+    def block_size(self):
+        return profile_param(self.algorithm, 'block_size', ScryptPasswordHasher.block_size)
+
+    @property
+    def parallelism(self):
+        return profile_param(self.algorithm, 'parallelism', ScryptPasswordHasher.parallelism)
+
+    def encode(self, password, salt, n=None, r=None, p=None):
+        self._check_encode_args(password, salt)
+        n = n or self.work_factor
+        r = r or self.block_size
+        p = p or self.parallelism
+        # hashlib refuses more than 32 MiB by default; allow what these
+        # parameters need, so hashes made under a larger budget still verify
+        hash_ = hashlib.scrypt(
+            password.encode(), salt=salt.encode(), n=n, r=r, p=p,
+            maxmem=scrypt_memory(n, r, p) * 2, dklen=64,
+        )
+        hash_ = base64.b64encode(hash_).decode('ascii').strip()
+        return '%s$%d$%s$%d$%d$%s' % (self.algorithm, n, salt, r, p, hash_)
+
+
+def scrypt_memory(n, r, p):
+    """Bytes scrypt needs for the given parameters"""
+    return 128 * r * (n + p)
+
+
+class CalibratedArgon2PasswordHasher(Argon2PasswordHasher):
+    @property
+    def time_cost(self):
+        return profile_param(self.algorithm, 'time_cost', Argon2PasswordHasher.time_cost)
+
+    @property
+    def memory_cost(self):
+        return profile_param(self.algorithm, 'memory_cost', Argon2PasswordHasher.memory_cost)
+
+    @property
+    def parallelism(self):
+        return profile_param(self.algorithm, 'parallelism', Argon2PasswordHasher.parallelism)
@@ -0,0 +1,153 @@
+import json
+import os
+import time
+
+from django.conf import settings
+from django.contrib.auth.hashers import (
+    Argon2PasswordHasher, PBKDF2PasswordHasher, ScryptPasswordHasher,
+)
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from accounts.hashers import CalibratedScryptPasswordHasher, load_profile, scrypt_memory
+
+try:
+    import argon2
+except ImportError:
+    argon2 = None
+
+SALT = 'calibrationsalt0'
+PASSWORD = 'calibration-password'
+
+# Lower bounds no calibration goes under, however slow the host: Django's
+# PBKDF2 default, scrypt's usual n=2**14, r=8 and OWASP's Argon2id minimum
+MIN_PBKDF2_ITERATIONS = PBKDF2PasswordHasher.iterations
+MIN_SCRYPT_WORK_FACTOR = 2 ** 14
+SCRYPT_BLOCK_SIZE = 8
+MIN_ARGON2_TIME_COST = 2
+MIN_ARGON2_MEMORY_KIB = 19 * 1024
+
+
+def measure(func, repeat=3):
+    """Best wall-clock time of ``repeat`` calls, in seconds"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def calibrate_pbkdf2(target, memory_budget, repeat=3):
+    """PBKDF2 time grows linearly with iterations, so scale one probe run"""
+    hasher = PBKDF2PasswordHasher()
+    probe = 100_000
+    elapsed = measure(lambda: hasher.encode(PASSWORD, SALT, probe), repeat)
+    iterations = max(MIN_PBKDF2_ITERATIONS, round(probe * target / elapsed, -4))
+    return {'iterations': int(iterations)}, lambda: hasher.encode(PASSWORD, SALT, int(iterations))
+
+
+def calibrate_scrypt(target, memory_budget, repeat=3):
+    """The largest work factor the memory budget allows, then parallelism to fill the time"""
+    hasher = CalibratedScryptPasswordHasher()
+    r = SCRYPT_BLOCK_SIZE
+    n = MIN_SCRYPT_WORK_FACTOR
+    while scrypt_memory(n * 2, r, 1) <= memory_budget:
+        n *= 2
+
+    elapsed = measure(lambda: hasher.encode(PASSWORD, SALT, n, r, 1), repeat)
+    while elapsed > target and n > MIN_SCRYPT_WORK_FACTOR:
+        n //= 2
+        elapsed = measure(lambda: hasher.encode(PASSWORD, SALT, n, r, 1), repeat)
+
+    # hashlib runs the p lanes one after another: time grows linearly with p
+    # while memory stays at one lane's worth
+    p = max(1, round(target / elapsed))
+    return (
+        {'work_factor': n, 'block_size': r, 'parallelism': p},
+        lambda: hasher.encode(PASSWORD, SALT, n, r, p),
+    )
+
+
+def calibrate_argon2(target, memory_budget, repeat=3):
+    """Spend the memory budget, one lane per core, then passes to fill the time"""
+    memory_cost = max(MIN_ARGON2_MEMORY_KIB, memory_budget // 1024)
+    parallelism = os.cpu_count() or 1
+
+    def run(time_cost):
+        return lambda: argon2.low_level.hash_secret(
+            PASSWORD.encode(), SALT.encode(), time_cost=time_cost, memory_cost=memory_cost,
+            parallelism=parallelism, hash_len=argon2.DEFAULT_HASH_LENGTH, type=argon2.low_level.Type.ID,
+        )
+
+    elapsed = measure(run(1), repeat)
+    time_cost = max(MIN_ARGON2_TIME_COST, round(target / elapsed))
+    return {'time_cost': time_cost, 'memory_cost': memory_cost, 'parallelism': parallelism}, run(time_cost)
+
+
+CALIBRATORS = {
+    PBKDF2PasswordHasher.algorithm: calibrate_pbkdf2,
+    ScryptPasswordHasher.algorithm: calibrate_scrypt,
+    Argon2PasswordHasher.algorithm: calibrate_argon2,
+}
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the password hashers on this host and write parameters that hit a target latency'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target-ms', type=float, default=250, help='Time one hash should take')
+        parser.add_argument('--max-memory-mb', type=int, default=64, help='Memory one hash may use')
+        parser.add_argument(
+            '--algorithm', choices=sorted(CALIBRATORS),
+            help='Algorithm for new hashes (default: argon2 if argon2-cffi is installed, else scrypt)',
+        )
+        parser.add_argument(
+            '--output', default=settings.PASSWORD_HASHER_PROFILE,
+            help='Profile to write (default: settings.PASSWORD_HASHER_PROFILE)',
+        )
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per measurement; the best counts')
+        parser.add_argument('--dry-run', action='store_true', help='Print the results without writing them')
+
+    def handle(self, *args, **options):
+        target = options['target_ms'] / 1000
+        memory_budget = options['max_memory_mb'] * 1024 * 1024
+        algorithm = options['algorithm'] or ('argon2' if argon2 else 'scrypt')
+        if algorithm == 'argon2' and argon2 is None:
+            raise CommandError('argon2 needs the argon2-cffi package')
+
+        profile = {
+            'algorithm': algorithm,
+            'target_ms': options['target_ms'],
+            'max_memory_mb': options['max_memory_mb'],
+            'cpu_count': os.cpu_count(),
+            'calibrated_at': timezone.now().isoformat(),
+        }
+        for name, calibrate in CALIBRATORS.items():
+            if name == 'argon2' and argon2 is None:
+                self.stdout.write('argon2: skipped, argon2-cffi is not installed')
+                continue
+            params, run = calibrate(target, memory_budget, options['repeat'])
+            elapsed = measure(run, options['repeat'])
+            profile[name] = params
+            summary = ', '.join(f'{key}={value}' for key, value in params.items())
+            self.stdout.write(f'{name}: {summary} ({elapsed * 1000:.0f} ms)')
+            if elapsed > target * 1.5:
+                self.stdout.write(self.style.WARNING(
+                    f'{name} is above the target even at its minimum safe cost'
+                ))
+
+        if options['dry_run']:
+            return
+
+        path = options['output']
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(profile, f, indent=2)
+        os.replace(tmp_path, path)
+        load_profile.cache_clear()
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {path}; restart the API workers to hash new passwords with {algorithm}. '
+            'Existing hashes are upgraded as users log in.'
+        ))
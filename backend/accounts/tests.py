@@ -1,3 +1,440 @@
-from django.test import TestCase
+import importlib
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core import checks
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework.throttling import SimpleRateThrottle
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from password_manager import settings as project_settings
+from passwords.crypto import encrypt_password
+from passwords.models import PasswordEntry
+
+from . import throttling, views
+from .hashers import CalibratedScryptPasswordHasher
+from .authentication import LazyUser, StatelessJWTAuthentication
+from .models import User
+
+# Requests in tests skip the per-request timing log line
+NO_TIMING_LOG = {'HEADER': False, 'LOG': False}
+
+
+@override_settings(SERVER_TIMING=NO_TIMING_LOG)
+class StatelessAuthenticationTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='me@example.com', username='me', password='x')
+        self.entry = PasswordEntry.objects.create(
+            user=self.user, site_name='GitHub', username='me', encrypted_secret=encrypt_password('hunter2')
+        )
+        self.token = str(RefreshToken.for_user(self.user).access_token)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+
+    def count_queries(self, path):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_list_and_detail_skip_the_user_query(self):
+        # First request fills the is_active cache
+        self.client.get('/api/passwords/')
+
+        for path in ('/api/passwords/', f'/api/passwords/{self.entry.id}/'):
+            stateless = self.count_queries(path)
+            with mock.patch.object(StatelessJWTAuthentication, 'get_user', JWTAuthentication.get_user):
+                loaded = self.count_queries(path)
+            self.assertEqual(stateless, loaded - 1, path)
+
+    def test_lazy_user_loads_only_for_other_fields(self):
+        user = LazyUser(self.user.id)
+
+        with self.assertNumQueries(0):
+            self.assertEqual((user.id, user.pk, bool(user), user.is_authenticated), (self.user.id, self.user.id, True, True))
+        with self.assertNumQueries(1):
+            self.assertEqual(user.email, 'me@example.com')
+
+        response = self.client.get('/api/auth/profile/')
+        self.assertEqual(response.data['user']['email'], 'me@example.com')
+
+    def test_deactivated_user_is_rejected_at_once(self):
+        self.assertEqual(self.client.get('/api/passwords/').status_code, 200)
+
+        self.user.is_active = False
+        self.user.save()
+
+        self.assertEqual(self.client.get('/api/passwords/').status_code, 401)
+
+    def test_async_views_authenticate_like_sync_views(self):
+        # Run on this thread's connection, so the queries can be captured
+        get = async_to_sync(AsyncClient().get)
+        headers = {'Authorization': f'Bearer {self.token}'}
+        get('/api/async/passwords/', headers=headers)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = get('/api/async/passwords/', headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([q['sql'] for q in queries if '"accounts_user"' in q['sql']], [])
+        self.assertEqual(get('/api/async/auth/profile/', headers=headers).json()['user']['email'], 'me@example.com')
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(get('/api/async/passwords/', headers=headers).status_code, 401)
+
+    @override_settings(ACCOUNTS_AUTH={'ACTIVE_CHECK_TTL': None})
+    def test_active_check_can_be_disabled(self):
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        with self.assertNumQueries(0):
+            self.assertEqual(StatelessJWTAuthentication().get_user({'user_id': self.user.id}).id, self.user.id)
+
+
+@override_settings(SERVER_TIMING=NO_TIMING_LOG)
+class TokenRefreshTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='me@example.com', username='me', password='x')
+        self.refresh = str(RefreshToken.for_user(self.user))
+        self.client = APIClient()
+
+    def test_refresh_returns_working_rotated_tokens(self):
+        response = self.client.post('/api/auth/refresh/', {'refresh': self.refresh}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        tokens = response.data['tokens']
+        self.assertNotEqual(tokens['refresh'], self.refresh)
+        self.assertEqual(AccessToken(tokens['access'])['user_id'], self.user.id)
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {tokens["access"]}')
+        self.assertEqual(self.client.get('/api/passwords/').status_code, 200)
+
+    def test_expired_access_token_does_not_block_refresh(self):
+        expired = AccessToken.for_user(self.user)
+        expired.set_exp(lifetime=-timedelta(minutes=1))
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {expired}')
+
+        response = self.client.post('/api/auth/refresh/', {'refresh': self.refresh}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_missing_and_invalid_tokens(self):
+        response = self.client.post('/api/auth/refresh/', {}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        for body in ([self.refresh], {'refresh': ['not', 'a', 'token']}):
+            response = self.client.post('/api/auth/refresh/', body, format='json')
+            self.assertEqual(response.status_code, 400)
+
+        response = self.client.post('/api/auth/refresh/', {'refresh': 'garbage'}, format='json')
+        self.assertEqual(response.status_code, 401)
+
+        # An access token is not a refresh token
+        access = str(AccessToken.for_user(self.user))
+        response = self.client.post('/api/auth/refresh/', {'refresh': access}, format='json')
+        self.assertEqual(response.status_code, 401)
+
+    async def test_async_refresh(self):
+        client = AsyncClient()
+
+        response = await client.post('/api/async/auth/refresh/', {'refresh': self.refresh}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('access', response.json()['tokens'])
+
+        response = await client.post('/api/async/auth/refresh/', {'refresh': 'garbage'}, content_type='application/json')
+        self.assertEqual(response.status_code, 401)
+
+        response = await client.post('/api/async/auth/refresh/', [self.refresh], content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(SERVER_TIMING=NO_TIMING_LOG)
+class LoginProtectionTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='me@example.com', username='me', password='correct-horse')
+        self.client = APIClient()
+
+    def login(self, password, email='me@example.com', ip='10.0.0.1'):
+        return self.client.post('/api/auth/login/', {'email': email, 'password': password}, format='json', REMOTE_ADDR=ip)
+
+    def test_repeated_bad_password_skips_the_hasher(self):
+        with mock.patch.object(views, 'authenticate', wraps=views.authenticate) as authenticate:
+            self.assertEqual(self.login('wrong').status_code, 401)
+            self.assertEqual(self.login('wrong').status_code, 401)
+            self.assertEqual(authenticate.call_count, 1)
+
+            self.assertEqual(self.login('correct-horse').status_code, 200)
+            self.assertEqual(authenticate.call_count, 2)
+
+    def test_non_object_body_is_rejected(self):
+        response = self.client.post('/api/auth/login/', ['me@example.com'], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'error': 'Email and password are required'})
+
+    def test_process_local_cache_warns_without_debug(self):
+        locmem = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        shared = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://cache'}}
+        with override_settings(DEBUG=False, CACHES=locmem):
+            self.assertEqual([w.id for w in throttling.check_shared_cache(None)], ['accounts.W001'])
+        with override_settings(DEBUG=True, CACHES=locmem):
+            self.assertEqual(throttling.check_shared_cache(None), [])
+        with override_settings(DEBUG=False, CACHES=shared):
+            self.assertEqual(throttling.check_shared_cache(None), [])
+        self.assertIn(throttling.check_shared_cache, checks.registry.registry.deployment_checks)
+
+    @override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'LOGIN_LOCKOUT': {'FAILURES': 3, 'BASE_DELAY': 30}})
+    @mock.patch.object(SimpleRateThrottle, 'THROTTLE_RATES', {'login_ip': '100/min', 'login_email': '100/min'})
+    def test_lockout_grows_exponentially_and_success_clears_it(self):
+        for i in range(2):
+            self.assertEqual(self.login(f'wrong-{i}').status_code, 401)
+        self.assertEqual(self.login('wrong-2').status_code, 401)
+
+        # Locked now, even for the right password, and before any hashing
+        with mock.patch.object(views, 'authenticate') as authenticate:
+            response = self.login('correct-horse')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '30')
+        authenticate.assert_not_called()
+
+        with mock.patch('accounts.throttling.time.time', return_value=time.time() + 31):
+            self.assertEqual(self.login('wrong-3').status_code, 401)
+            self.assertEqual(self.login('correct-horse').status_code, 429)
+        # The fourth failure doubled the delay
+        self.assertGreater(throttling.lockout_remaining('me@example.com'), 59)
+
+        throttling.clear_failures('me@example.com')
+        self.assertEqual(self.login('correct-horse').status_code, 200)
+        self.assertEqual(throttling.lockout_remaining('me@example.com'), 0)
+
+    def test_per_ip_and_per_email_windows(self):
+        with mock.patch.object(SimpleRateThrottle, 'THROTTLE_RATES', {'login_ip': '3/min', 'login_email': '4/min'}):
+            for i in range(3):
+                self.assertEqual(self.login('wrong', email=f'user{i}@example.com').status_code, 401)
+            self.assertEqual(self.login('correct-horse').status_code, 429)
+            # Another client is unaffected
+            self.assertEqual(self.login('correct-horse', ip='10.0.0.2').status_code, 200)
+
+            # One email from many addresses
+            for i in range(3):
+                self.login('correct-horse', ip=f'10.0.1.{i}')
+            response = self.login('correct-horse', ip='10.0.2.1')
+            self.assertEqual(response.status_code, 429)
+            self.assertIn('Retry-After', response)
+
+    def test_register_clears_failures_for_new_account(self):
+        self.assertEqual(self.login('Sup3r-secret-pw!', email='new@example.com').status_code, 401)
+
+        response = self.client.post('/api/auth/register/', {
+            'email': 'new@example.com', 'username': 'new', 'password': 'Sup3r-secret-pw!'
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+
+        self.assertEqual(self.login('Sup3r-secret-pw!', email='new@example.com').status_code, 200)
+
+    async def test_async_login_is_protected(self):
+        client = AsyncClient()
+        body = {'email': 'me@example.com', 'password': 'wrong'}
+
+        with mock.patch('accounts.async_views.authenticate', return_value=None) as authenticate:
+            for _ in range(2):
+                response = await client.post('/api/async/auth/login/', body, content_type='application/json')
+                self.assertEqual(response.status_code, 401)
+        authenticate.assert_called_once_with(username='me@example.com', password='wrong')
+
+        with mock.patch.object(SimpleRateThrottle, 'THROTTLE_RATES', {'login_ip': '1/min', 'login_email': '10/min'}):
+            response = await client.post('/api/async/auth/login/', body, content_type='application/json')
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+
+
+@override_settings(SERVER_TIMING=NO_TIMING_LOG)
+class HasherCalibrationTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.profile = os.path.join(self.tmpdir.name, 'hasher_profile.json')
+
+    def hashers_for(self, profile_path):
+        """PASSWORD_HASHERS as settings.py builds it for this profile"""
+        with mock.patch.dict(os.environ, {'PASSWORD_HASHER_PROFILE': profile_path}):
+            hashers = importlib.reload(project_settings).PASSWORD_HASHERS
+        importlib.reload(project_settings)
+        return hashers
+
+    def write_profile(self, profile):
+        with open(self.profile, 'w') as f:
+            json.dump(profile, f)
+        return override_settings(PASSWORD_HASHER_PROFILE=self.profile, PASSWORD_HASHERS=self.hashers_for(self.profile))
+
+    def test_calibration_never_goes_below_safe_minimums(self):
+        call_command(
+            'calibrate_hashers', target_ms=1, max_memory_mb=16, algorithm='scrypt', repeat=1,
+            output=self.profile, stdout=io.StringIO(),
+        )
+
+        with open(self.profile) as f:
+            profile = json.load(f)
+        self.assertEqual(profile['algorithm'], 'scrypt')
+        self.assertEqual(profile['pbkdf2_sha256'], {'iterations': 600000})
+        self.assertEqual(profile['scrypt'], {'work_factor': 2 ** 14, 'block_size': 8, 'parallelism': 1})
+        self.assertEqual(self.hashers_for(self.profile)[0], 'accounts.hashers.CalibratedScryptPasswordHasher')
+        missing = os.path.join(self.tmpdir.name, 'missing.json')
+        self.assertEqual(self.hashers_for(missing)[0], 'accounts.hashers.CalibratedPBKDF2PasswordHasher')
+
+    def test_hash_is_upgraded_at_next_login(self):
+        user = User.objects.create_user(email='me@example.com', username='me', password='correct-horse')
+        self.assertTrue(user.password.startswith('pbkdf2_sha256$'))
+
+        with self.write_profile({'algorithm': 'scrypt', 'scrypt': {'work_factor': 2 ** 10, 'parallelism': 1}}):
+            response = APIClient().post(
+                '/api/auth/login/', {'email': 'me@example.com', 'password': 'correct-horse'}, format='json'
+            )
+            self.assertEqual(response.status_code, 200)
+            user.refresh_from_db()
+            self.assertTrue(user.password.startswith('scrypt$1024$'))
+            self.assertTrue(user.check_password('correct-horse'))
+
+    async def test_async_login_upgrades_hash(self):
+        user = await User.objects.acreate(email='me@example.com', username='me')
+        user.set_password('correct-horse')
+        await user.asave()
+
+        with self.write_profile({'pbkdf2_sha256': {'iterations': 1000}}):
+            response = await AsyncClient().post(
+                '/api/async/auth/login/', {'email': 'me@example.com', 'password': 'correct-horse'},
+                content_type='application/json',
+            )
+            self.assertEqual(response.status_code, 200)
+            await user.arefresh_from_db()
+            self.assertTrue(user.password.startswith('pbkdf2_sha256$1000$'))
+
+    def test_large_scrypt_hashes_verify(self):
+        # Past hashlib's default 32 MiB limit
+        hasher = CalibratedScryptPasswordHasher()
+        encoded = hasher.encode('secret', hasher.salt(), n=2 ** 15, r=8, p=1)
+        self.assertTrue(hasher.verify('secret', encoded))
+
+
+FAST_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS, SERVER_TIMING=NO_TIMING_LOG)
+class RegistrationTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def register(self, email='me@example.com', username='me', password='Sup3r-secret-pw!'):
+        return self.client.post('/api/auth/register/', {
+            'email': email, 'username': username, 'password': password
+        }, format='json')
+
+    def test_registration_is_a_single_insert(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.register()
+        self.assertEqual(response.status_code, 201)
+
+        # Savepoints come from the test case's own transaction
+        statements = [q['sql'] for q in queries if not q['sql'].startswith(('SAVEPOINT', 'RELEASE SAVEPOINT'))]
+        self.assertEqual(len(statements), 1, statements)
+        self.assertTrue(statements[0].startswith('INSERT INTO "accounts_user"'))
+
+    def test_duplicates_keep_their_messages(self):
+        self.assertEqual(self.register().status_code, 201)
+
+        response = self.register(username='other')
+        self.assertEqual((response.status_code, response.data), (400, {'error': 'User with this email already exists'}))
+
+        response = self.register(email='other@example.com')
+        self.assertEqual((response.status_code, response.data), (400, {'error': 'User with this username already exists'}))
+
+        self.assertEqual(User.objects.count(), 1)
+
+    def test_duplicate_is_matched_by_constraint_not_by_value(self):
+        def postgres_error(constraint, detail):
+            error = IntegrityError(f'duplicate key value violates unique constraint "{constraint}"\nDETAIL:  {detail}')
+            # What the driver's own exception carries
+            error.__cause__ = Exception()
+            error.__cause__.diag = mock.Mock(constraint_name=constraint)
+            return error
+
+        error = postgres_error('accounts_user_username_key', 'Key (username)=(my-email-alias) already exists.')
+        self.assertEqual(views.duplicate_user_error(error), 'User with this username already exists')
+        error = postgres_error('accounts_user_email_key', 'Key (email)=(username@example.com) already exists.')
+        self.assertEqual(views.duplicate_user_error(error), 'User with this email already exists')
+        self.assertIsNone(views.duplicate_user_error(IntegrityError('NOT NULL constraint failed: accounts_user.email')))
+
+    def test_weak_password_is_rejected_before_hashing(self):
+        with mock.patch('django.contrib.auth.base_user.make_password') as make_password:
+            response = self.register(password='123')
+        self.assertEqual(response.status_code, 400)
+        make_password.assert_not_called()
+
+    async def test_async_duplicates(self):
+        client = AsyncClient()
+
+        async def register(email, username):
+            return await client.post('/api/async/auth/register/', {
+                'email': email, 'username': username, 'password': 'Sup3r-secret-pw!'
+            }, content_type='application/json')
+
+        self.assertEqual((await register('me@example.com', 'me')).status_code, 201)
+        response = await register('me@example.com', 'other')
+        self.assertEqual((response.status_code, response.json()), (400, {'error': 'User with this email already exists'}))
+        response = await register('other@example.com', 'me')
+        self.assertEqual((response.status_code, response.json()), (400, {'error': 'User with this username already exists'}))
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS, SERVER_TIMING=NO_TIMING_LOG)
+@mock.patch.object(SimpleRateThrottle, 'THROTTLE_RATES', {'register': '1000/min'})
+class RegistrationConcurrencyTestCase(TransactionTestCase):
+    SIGNUPS = 200
+
+    def test_parallel_signups(self):
+        local = threading.local()
+        start = threading.Barrier(20, timeout=30)
+
+        def register(i):
+            if not hasattr(local, 'client'):
+                local.client = APIClient()
+                start.wait()
+            # Even signups race for one email, odd ones for one username,
+            # and every tenth one is unique
+            if i % 10 == 0:
+                email, username = f'unique{i}@example.com', f'unique{i}'
+            elif i % 2:
+                email, username = f'user{i}@example.com', 'taken'
+            else:
+                email, username = 'taken@example.com', f'user{i}'
+            response = local.client.post('/api/auth/register/', {
+                'email': email, 'username': username, 'password': 'Sup3r-secret-pw!'
+            }, format='json')
+            connection.close()
+            return i, response.status_code, response.data.get('error')
+
+        with ThreadPoolExecutor(20) as pool:
+            results = list(pool.map(register, range(self.SIGNUPS)))
+
+        created = [i for i, code, _ in results if code == 201]
+        self.assertEqual(len(created), self.SIGNUPS // 10 + 2)
+        errors = {error for _, code, error in results if code != 201}
+        self.assertEqual(errors, {'User with this email already exists', 'User with this username already exists'})
+        self.assertEqual(User.objects.filter(email='taken@example.com').count(), 1)
+        self.assertEqual(User.objects.filter(username='taken').count(), 1)
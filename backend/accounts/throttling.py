@@ -0,0 +1,168 @@
+"""
+CPU protection for the login and register endpoints.
+
+Both endpoints are open to anonymous clients and every attempt runs the
+password hasher, which is deliberately slow. Three layers keep a burst of
+bad attempts from tying up the workers:
+
+* Sliding-window rate limits per client IP and per email address, as DRF
+  throttles with the ``login_ip``, ``login_email`` and ``register`` scopes of
+  ``REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']``.
+* Exponential lockout: once an email has collected ``FAILURES`` failed logins
+  within ``WINDOW`` seconds it is locked for ``BASE_DELAY`` seconds, doubling
+  with every further failure up to ``MAX_DELAY``. A successful login clears it.
+* A short-lived record of failed (email, password) pairs, keyed by an HMAC of
+  both, so a repeated bad pair is rejected without hashing again.
+
+Lockout settings live in ``REST_FRAMEWORK['LOGIN_LOCKOUT']``.
+
+All three live in the default Django cache. With several worker processes
+it must be shared (set ``CACHE_URL`` to a Redis server), or every process
+enforces its own limits; the ``accounts.W001`` deployment check
+(``manage.py check --deploy``) warns about a process-local cache when DEBUG
+is off.
+"""
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.crypto import salted_hmac
+from django.core import checks
+from rest_framework.throttling import SimpleRateThrottle
+
+DEFAULT_LOCKOUT = {
+    'FAILURES': 5,
+    'WINDOW': 15 * 60,
+    'BASE_DELAY': 30,
+    'MAX_DELAY': 60 * 60,
+    'FAILED_CREDENTIAL_TTL': 5 * 60,
+}
+
+
+# Backends whose data each process keeps to itself
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@checks.register(checks.Tags.security, checks.Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    backend = settings.CACHES.get('default', {}).get('BACKEND')
+    if settings.DEBUG or backend not in PROCESS_LOCAL_CACHES:
+        return []
+    return [checks.Warning(
+        'Login throttles and lockouts are stored in a per-process cache.',
+        hint='Each worker process enforces its own limits. Set CACHE_URL to a shared Redis cache.',
+        id='accounts.W001',
+    )]
+
+
+def lockout_settings():
+    return {**DEFAULT_LOCKOUT, **settings.REST_FRAMEWORK.get('LOGIN_LOCKOUT', {})}
+
+
+def normalize_email(email):
+    return str(email or '').strip().lower()
+
+
+class LoginIPThrottle(SimpleRateThrottle):
+    """Login attempts per client IP"""
+
+    scope = 'login_ip'
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope, 'ident': self.get_ident(request)}
+
+
+class LoginEmailThrottle(SimpleRateThrottle):
+    """Login attempts per email address, whichever IPs they come from"""
+
+    scope = 'login_email'
+
+    def get_cache_key(self, request, view):
+        # Runs before the view validates the body, which may be any JSON value
+        if not isinstance(request.data, dict):
+            return None
+        email = normalize_email(request.data.get('email'))
+        if not email:
+            return None
+        return self.cache_format % {'scope': self.scope, 'ident': salted_hmac(self.scope, email).hexdigest()}
+
+
+class RegisterIPThrottle(LoginIPThrottle):
+    """Registrations per client IP"""
+
+    scope = 'register'
+
+
+LOGIN_THROTTLES = [LoginIPThrottle, LoginEmailThrottle]
+REGISTER_THROTTLES = [RegisterIPThrottle]
+
+
+def throttle_wait(request, throttle_classes):
+    """
+    Seconds to wait if any throttle rejects ``request``, else None.
+
+    For views outside DRF's dispatch (the async views); DRF views use
+    ``@throttle_classes`` instead.
+    """
+    waits = [throttle.wait() for throttle in (cls() for cls in throttle_classes)
+             if not throttle.allow_request(request, None)]
+    if not waits:
+        return None
+    return math.ceil(max(wait or 0 for wait in waits))
+
+
+def _key(kind, email):
+    return f'accounts:login:{kind}:{salted_hmac("accounts.login", email).hexdigest()}'
+
+
+def _credential_key(email, password):
+    digest = salted_hmac('accounts.login.credential', f'{email}\0{password}', algorithm='sha256').hexdigest()
+    return f'accounts:login:failed-credential:{digest}'
+
+
+def lockout_remaining(email):
+    """Seconds left on the email's lockout, 0 if it is not locked"""
+    until = cache.get(_key('locked', normalize_email(email)))
+    if until is None:
+        return 0
+    return max(0, math.ceil(until - time.time()))
+
+
+def recently_failed(email, password):
+    """Whether this exact email and password failed to log in recently"""
+    return cache.get(_credential_key(normalize_email(email), password)) is not None
+
+
+def record_failure(email, password):
+    """Remember a failed login and lock the email once it has failed too often"""
+    config = lockout_settings()
+    email = normalize_email(email)
+    cache.set(_credential_key(email, password), True, config['FAILED_CREDENTIAL_TTL'])
+
+    key = _key('failures', email)
+    if cache.add(key, 1, config['WINDOW']):
+        failures = 1
+    else:
+        try:
+            failures = cache.incr(key)
+        except ValueError:
+            # Expired between add() and incr()
+            cache.set(key, 1, config['WINDOW'])
+            failures = 1
+
+    if failures >= config['FAILURES']:
+        delay = min(config['BASE_DELAY'] * 2 ** min(failures - config['FAILURES'], 32), config['MAX_DELAY'])
+        cache.set(_key('locked', email), time.time() + delay, delay)
+
+
+def clear_failures(email, password=None):
+    """Reset the failure count and lockout, and forget ``password`` as a failed one"""
+    email = normalize_email(email)
+    keys = [_key('failures', email), _key('locked', email)]
+    if password is not None:
+        keys.append(_credential_key(email, password))
+    cache.delete_many(keys)
@@ -4,5 +4,6 @@ from . import views
 urlpatterns = [
     path('register/', views.register, name='register'),
     path('login/', views.login, name='login'),
+    path('refresh/', views.refresh, name='refresh'),
     path('profile/', views.profile, name='profile'),
 ]
\ No newline at end of file
@@ -1,22 +1,48 @@
 from rest_framework import status
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, authentication_classes, permission_classes, throttle_classes
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import authenticate
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from password_manager.metrics import LOGINS
 from .models import User
 from .serializers import UserSerializer
+from .throttling import (
+    LOGIN_THROTTLES, REGISTER_THROTTLES, clear_failures, lockout_remaining, record_failure, recently_failed,
+)
+
+def duplicate_user_error(error):
+    """Error message for an IntegrityError raised by inserting a user, None if not a duplicate"""
+    # PostgreSQL reports the violated constraint ("accounts_user_email_key")
+    # through the driver; SQLite only in the message, by column
+    # ("UNIQUE constraint failed: accounts_user.email"). The rest of the
+    # message may quote the conflicting values, so it is not searched.
+    table = User._meta.db_table
+    constraint = getattr(getattr(error.__cause__, 'diag', None), 'constraint_name', None)
+    first_line = str(error).split('\n', 1)[0]
+    for field, message in (
+        ('email', 'User with this email already exists'),
+        ('username', 'User with this username already exists'),
+    ):
+        if constraint == f'{table}_{field}_key' or first_line == f'UNIQUE constraint failed: {table}.{field}':
+            return message
+    return None
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes(REGISTER_THROTTLES)
 def register(request):
     """Register a new user"""
     try:
-        email = request.data.get('email')
-        username = request.data.get('username')
-        password = request.data.get('password')
+        data = request.data if isinstance(request.data, dict) else {}
+        email = data.get('email')
+        username = data.get('username')
+        password = data.get('password')
         
         # Validate required fields
         if not email or not username or not password:
@@ -24,18 +50,7 @@ def register(request):
                 'error': 'Email, username, and password are required'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        # Check if user already exists
-        if User.objects.filter(email=email).exists():
-            return Response({
-                'error': 'User with this email already exists'
-            }, status=status.HTTP_400_BAD_REQUEST)
-        
-        if User.objects.filter(username=username).exists():
-            return Response({
-                'error': 'User with this username already exists'
-            }, status=status.HTTP_400_BAD_REQUEST)
-        
-        # Validate password
+        # Validate password before paying for the hash
         try:
             validate_password(password)
         except ValidationError as e:
@@ -43,12 +58,25 @@ def register(request):
                 'error': list(e.messages)
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        # Create user
-        user = User.objects.create_user(
-            email=email,
-            username=username,
-            password=password
-        )
+        # Create user: one INSERT, with the unique constraints catching
+        # taken emails and usernames, even between concurrent signups
+        try:
+            with transaction.atomic():
+                user = User.objects.create_user(
+                    email=email,
+                    username=username,
+                    password=password
+                )
+        except IntegrityError as e:
+            error = duplicate_user_error(e)
+            if error is None:
+                raise
+            return Response({
+                'error': error
+            }, status=status.HTTP_400_BAD_REQUEST)
+        # A login tried with these credentials before the account existed
+        # must not be short-circuited as a failure
+        clear_failures(email, password)
         
         # Generate tokens
         refresh = RefreshToken.for_user(user)
@@ -69,21 +97,34 @@ def register(request):
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes(LOGIN_THROTTLES)
 def login(request):
     """Login user"""
     try:
-        email = request.data.get('email')
-        password = request.data.get('password')
+        data = request.data if isinstance(request.data, dict) else {}
+        email = data.get('email')
+        password = data.get('password')
         
         if not email or not password:
             return Response({
                 'error': 'Email and password are required'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        # Authenticate user
-        user = authenticate(username=email, password=password)
+        locked = lockout_remaining(email)
+        if locked:
+            LOGINS.inc(outcome='locked')
+            return Response({
+                'error': f'Too many failed login attempts. Try again in {locked} seconds.'
+            }, status=status.HTTP_429_TOO_MANY_REQUESTS, headers={'Retry-After': str(locked)})
+        
+        # Authenticate user, skipping the hasher for a pair that just failed
+        failed_before = recently_failed(email, password)
+        user = None if failed_before else authenticate(username=email, password=password)
         
         if user:
+            clear_failures(email)
+            LOGINS.inc(outcome='success')
+            
             # Generate tokens
             refresh = RefreshToken.for_user(user)
             
@@ -96,6 +137,8 @@ def login(request):
                 'user': UserSerializer(user).data
             }, status=status.HTTP_200_OK)
         else:
+            record_failure(email, password)
+            LOGINS.inc(outcome='cached_failure' if failed_before else 'invalid')
             return Response({
                 'error': 'Invalid email or password'
             }, status=status.HTTP_401_UNAUTHORIZED)
@@ -105,6 +148,37 @@ def login(request):
             'error': 'Login failed'
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+@api_view(['POST'])
+@permission_classes([AllowAny])
+@authentication_classes([])
+def refresh(request):
+    """Exchange a refresh token for a new access token (and refresh token, when rotating)"""
+    # No authentication classes: the access token sent along may already
+    # have expired, which is the usual reason to refresh
+    token = request.data.get('refresh') if isinstance(request.data, dict) else None
+    if not isinstance(token, str) or not token:
+        return Response({
+            'error': 'Refresh token is required'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    serializer = TokenRefreshSerializer(data={'refresh': token})
+    try:
+        if not serializer.is_valid():
+            return Response({
+                'error': 'Refresh token is required'
+            }, status=status.HTTP_400_BAD_REQUEST)
+    except TokenError:
+        return Response({
+            'error': 'Invalid or expired refresh token'
+        }, status=status.HTTP_401_UNAUTHORIZED)
+    
+    return Response({
+        'tokens': {
+            'refresh': serializer.validated_data.get('refresh', token),
+            'access': serializer.validated_data['access'],
+        }
+    })
+
 @api_view(['GET'])
 def profile(request):
     """Get user profile"""
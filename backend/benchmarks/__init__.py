@@ -0,0 +1,13 @@
+"""
+Performance benchmarks for the password manager API.
+
+These are not part of the regular test suite. Run them with Django's test
+runner so they get a throwaway database::
+
+    python manage.py test benchmarks --pattern='bench_*.py'
+
+Vault sizes can be changed with the ``BENCH_ENTRIES`` environment variable.
+``bench_api`` also writes its results as JSON and can fail on regressions
+against an earlier run (see its docstring). ``manage.py seed_vault`` fills
+a development database the same way.
+"""
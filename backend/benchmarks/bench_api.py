@@ -0,0 +1,94 @@
+"""
+End-to-end API latency and allocations, with a regression gate.
+
+Every endpoint a client uses is timed at each vault size through DRF's test
+client, so routing, authentication, middleware, crypto and rendering all
+count. Results are written to ``BENCH_OUTPUT`` as JSON; give a previous
+file as ``BENCH_BASELINE`` and the benchmark fails when p50, p95 or peak
+allocations got more than ``BENCH_THRESHOLD`` (default 0.2, i.e. 20%) worse::
+
+    BENCH_OUTPUT=before.json python manage.py test benchmarks.bench_api
+    BENCH_BASELINE=before.json python manage.py test benchmarks.bench_api
+
+Compare runs from the same host only. Whole-vault operations (export) take
+fewer samples on large vaults, so their p99 is the slowest sample there.
+"""
+import json
+import os
+import random
+
+from django.conf import settings
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from passwords.seeding import seed_entries, seed_users
+
+from .utils import NO_TIMING_LOG, bench_sizes, profile, regressions, report, write_results
+
+SAMPLES = int(os.environ.get('BENCH_SAMPLES', '30'))
+OUTPUT = os.environ.get('BENCH_OUTPUT', os.path.join(settings.BASE_DIR, 'benchmarks', 'results', 'api.json'))
+BASELINE = os.environ.get('BENCH_BASELINE')
+THRESHOLD = float(os.environ.get('BENCH_THRESHOLD', '0.2'))
+
+# The desktop client's page size (APIClient.get_all_passwords)
+PAGE_SIZE = 500
+
+
+def whole_vault_samples(size):
+    return SAMPLES if size <= 1000 else max(5, SAMPLES * 1000 // size)
+
+
+@override_settings(SERVER_TIMING=NO_TIMING_LOG)
+class ApiBenchmark(TestCase):
+    def test_endpoints_by_vault_size(self):
+        results = {}
+        for size in bench_sizes([100, 1000, 10000, 100000]):
+            user = seed_users(1, f'api-bench-{size}-', 'bench-pass-123')[0]
+            seed_entries(user, size, random.Random(size))
+            client = APIClient()
+            client.force_authenticate(user)
+            entry_id = user.passwordentry_set.order_by('id').values_list('id', flat=True)[size // 2]
+
+            # Entries to delete, one per call including warmup and the traced run
+            doomed = iter(list(user.passwordentry_set.order_by('-id').values_list('id', flat=True)[:SAMPLES + 4]))
+            created = iter(range(10 ** 9))
+
+            def export():
+                response = client.get('/api/passwords/export/?format=ndjson')
+                b''.join(response.streaming_content)
+
+            cases = {
+                'list': (lambda: client.get(f'/api/passwords/?page_size={PAGE_SIZE}'), SAMPLES),
+                'detail': (lambda: client.get(f'/api/passwords/{entry_id}/'), SAMPLES),
+                'create': (lambda: client.post('/api/passwords/', {
+                    'site_name': f'Bench {next(created)}', 'username': 'bench@example.com',
+                    'password': 'Correct-Horse-Battery-1',
+                }, format='json'), SAMPLES),
+                'update': (lambda: client.put(f'/api/passwords/{entry_id}/', {
+                    'password': f'Rotated-{next(created)}', 'notes': 'Rotated by benchmark',
+                }, format='json'), SAMPLES),
+                'delete': (lambda: client.delete(f'/api/passwords/{next(doomed)}/'), SAMPLES),
+                'search': (lambda: client.get('/api/passwords/search/?q=github&page_size=50'), SAMPLES),
+                'export': (export, whole_vault_samples(size)),
+            }
+
+            rows = []
+            for name, (func, samples) in cases.items():
+                measured = profile(func, samples)
+                results[f'{name}/{size}'] = measured
+                rows.append((
+                    name,
+                    f'p50 {measured["p50_ms"]:.1f} ms, p95 {measured["p95_ms"]:.1f} ms, '
+                    f'p99 {measured["p99_ms"]:.1f} ms, peak {measured["peak_alloc_kib"]:,.0f} KiB',
+                ))
+            report(f'{size} entries ({SAMPLES} samples)', rows)
+
+        write_results(OUTPUT, results)
+        print(f'\nResults written to {OUTPUT}')
+
+        if BASELINE:
+            with open(BASELINE) as f:
+                baseline = json.load(f)
+            found = regressions(results, baseline, THRESHOLD)
+            if found:
+                self.fail(f'Regressions over {THRESHOLD:.0%} against {BASELINE}:\n' + '\n'.join(found))
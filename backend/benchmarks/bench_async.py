@@ -0,0 +1,78 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.test import AsyncClient, Client, TransactionTestCase, override_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from passwords.models import PasswordEntry
+from passwords.seeding import seed_entries, seed_users
+
+from .utils import NO_TIMING_LOG, report
+
+# Worker threads of the WSGI server being compared against (gunicorn gthread style)
+WSGI_THREADS = int(os.environ.get('BENCH_WSGI_THREADS', '8'))
+
+
+@override_settings(SERVER_TIMING=NO_TIMING_LOG)
+class AsyncViewBenchmark(TransactionTestCase):
+    """
+    Requests/sec at N concurrent clients for the sync DRF views on a threaded
+    WSGI server, the same views under ASGI (where Django runs every sync view
+    on one shared thread), and the async views under ASGI.
+    """
+
+    def test_wsgi_vs_asgi(self):
+        user = seed_users(1, 'async-bench-', 'bench-pass-123')[0]
+        seed_entries(user, 500, random.Random(500))
+        pk = PasswordEntry.objects.filter(user=user).values_list('id', flat=True).first()
+        auth = f'Bearer {RefreshToken.for_user(user).access_token}'
+        paths = [
+            ('metadata page', '/api/{prefix}/?mode=metadata&page_size=50'),
+            ('detail (decrypt)', '/api/{prefix}/%d/' % pk),
+        ]
+        levels = [int(n) for n in os.environ.get('BENCH_CONCURRENCY', '50,100,250,500').split(',')]
+
+        for label, template in paths:
+            rows = []
+            for clients in levels:
+                total = max(500, clients * 2)
+                wsgi = self.run_wsgi(template.format(prefix='passwords'), auth, clients, total)
+                sync_asgi = self.run_asgi(template.format(prefix='passwords'), auth, clients, total)
+                asgi = self.run_asgi(template.format(prefix='async/passwords'), auth, clients, total)
+                rows.append((f'{clients} clients, WSGI ({WSGI_THREADS} threads)', f'{total / wsgi:,.0f} req/s'))
+                rows.append((f'{clients} clients, ASGI, sync views', f'{total / sync_asgi:,.0f} req/s'))
+                rows.append((f'{clients} clients, ASGI, async views', f'{total / asgi:,.0f} req/s'))
+            report(f'GET {label}', rows)
+
+    def run_wsgi(self, path, auth, clients, total):
+        local = threading.local()
+
+        def call(_):
+            if not hasattr(local, 'client'):
+                local.client = Client(HTTP_AUTHORIZATION=auth)
+            assert local.client.get(path).status_code == 200
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(min(clients, WSGI_THREADS)) as pool:
+            list(pool.map(call, range(total)))
+        return time.perf_counter() - start
+
+    def run_asgi(self, path, auth, clients, total):
+        async def main():
+            client = AsyncClient()
+            limit = asyncio.Semaphore(clients)
+
+            async def call():
+                async with limit:
+                    response = await client.get(path, headers={'Authorization': auth})
+                    assert response.status_code == 200
+
+            await asyncio.gather(*(call() for _ in range(total)))
+
+        start = time.perf_counter()
+        asyncio.run(main())
+        return time.perf_counter() - start
@@ -0,0 +1,48 @@
+import json
+
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from passwords.models import PasswordEntry
+from passwords.seeding import seed_users
+
+from .utils import NO_TIMING_LOG, bench_sizes, report, timed
+
+
+def import_items(count, prefix):
+    return [
+        {'site_name': f'{prefix}-{i:06d}', 'username': f'user{i}@example.com', 'password': f'secret-{i}'}
+        for i in range(count)
+    ]
+
+
+@override_settings(SERVER_TIMING=NO_TIMING_LOG)
+class BulkCreateBenchmark(TestCase):
+    def test_single_vs_bulk(self):
+        for size in bench_sizes([500, 2000]):
+            user = seed_users(1, f'bulk-{size}-', 'bench-pass-123')[0]
+            client = APIClient()
+            client.force_authenticate(user)
+
+            def one_by_one():
+                for item in import_items(size, 'single'):
+                    client.post('/api/passwords/', item, format='json')
+
+            def bulk_json():
+                client.post('/api/passwords/bulk/', import_items(size, 'json'), format='json')
+
+            body = '\n'.join(json.dumps(item) for item in import_items(size, 'ndjson'))
+
+            def bulk_ndjson():
+                client.post('/api/passwords/bulk/', body, content_type='application/x-ndjson')
+
+            single = timed(one_by_one, repeat=1)
+            bulk = timed(bulk_json, repeat=3)
+            ndjson = timed(bulk_ndjson, repeat=3)
+            assert PasswordEntry.objects.filter(user=user).count() == size * 7
+
+            report(f'Import of {size} entries', [
+                ('POST /api/passwords/ per entry', f'{size / single:,.0f} entries/s'),
+                ('POST /api/passwords/bulk/ (JSON array)', f'{size / bulk:,.0f} entries/s'),
+                ('POST /api/passwords/bulk/ (NDJSON)', f'{size / ndjson:,.0f} entries/s'),
+            ])
@@ -0,0 +1,37 @@
+import time
+
+from django.test import SimpleTestCase
+
+from passwords.ciphers import ENGINES
+from passwords.crypto import decrypt_password, encrypt_password
+from passwords.keyring import get_keyring
+
+from .utils import report
+
+# Typical secrets: a PIN, a generated password, a passphrase, a recovery blob
+SECRET_SIZES = [8, 24, 64, 512]
+ITERATIONS = 20000
+
+
+def ops_per_second(func, iterations=ITERATIONS):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return iterations / (time.perf_counter() - start)
+
+
+class CipherEngineBenchmark(SimpleTestCase):
+    def test_engines(self):
+        ring = get_keyring()
+        for size in SECRET_SIZES:
+            secret = 'x' * size
+            rows = []
+            for name in ENGINES:
+                blob = encrypt_password(secret, ring, engine=name)
+                encrypt_rate = ops_per_second(lambda: encrypt_password(secret, ring, engine=name))
+                decrypt_rate = ops_per_second(lambda: decrypt_password(blob, ring))
+                rows.append((
+                    name,
+                    f'encrypt {encrypt_rate:>9,.0f}/s  decrypt {decrypt_rate:>9,.0f}/s  {len(blob):>4} bytes',
+                ))
+            report(f'{size}-byte secret', rows)
@@ -0,0 +1,53 @@
+import gzip
+import json
+import random
+
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from passwords import middleware, renderers
+from passwords.seeding import seed_entries, seed_users
+
+from .utils import NO_TIMING_LOG, bench_sizes, report, timed
+
+
+def decode(response):
+    """What the desktop client does with a response body"""
+    body = response.content
+    encoding = response.get('Content-Encoding')
+    if encoding == 'gzip':
+        body = gzip.decompress(body)
+    elif encoding == 'br':
+        body = middleware.brotli.decompress(body)
+    if response['Content-Type'].startswith('application/msgpack'):
+        return renderers.msgpack.unpackb(body, raw=False, strict_map_key=False)
+    return json.loads(body)
+
+
+@override_settings(SERVER_TIMING=NO_TIMING_LOG)
+class CompressionBenchmark(TestCase):
+    def test_bytes_and_latency(self):
+        variants = [('JSON, identity', 'application/json', 'identity'), ('JSON, gzip', 'application/json', 'gzip')]
+        if middleware.brotli:
+            variants.append(('JSON, brotli', 'application/json', 'br'))
+        if renderers.msgpack:
+            variants.append(('MessagePack, identity', 'application/msgpack', 'identity'))
+            variants.append(('MessagePack, gzip', 'application/msgpack', 'gzip'))
+
+        for size in bench_sizes([1000, 10000]):
+            user = seed_users(1, f'compress-{size}-', 'bench-pass-123')[0]
+            seed_entries(user, size, random.Random(size))
+            client = APIClient()
+            client.force_authenticate(user)
+
+            rows = []
+            for mode in ('metadata', 'full'):
+                url = '/api/passwords/?mode=metadata' if mode == 'metadata' else '/api/passwords/'
+                for label, accept, encoding in variants:
+                    def fetch():
+                        return decode(client.get(url, HTTP_ACCEPT=accept, HTTP_ACCEPT_ENCODING=encoding))
+
+                    wire = len(client.get(url, HTTP_ACCEPT=accept, HTTP_ACCEPT_ENCODING=encoding).content)
+                    elapsed = timed(fetch, repeat=3)
+                    rows.append((f'{mode}: {label}', f'{wire / 1024:,.0f} KiB  {elapsed * 1000:.0f} ms'))
+            report(f'{size} entries (bytes on the wire, request + decode)', rows)
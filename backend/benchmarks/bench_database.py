@@ -0,0 +1,121 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.test import SimpleTestCase
+
+from password_manager.database import sqlite_pragmas
+
+from .utils import report
+
+SCHEMA = '''
+CREATE TABLE entry (
+    id INTEGER PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    site_name TEXT NOT NULL,
+    username TEXT NOT NULL,
+    secret BLOB NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX entry_user_site ON entry (user_id, site_name, id);
+'''
+
+USERS = 50
+
+
+def run_load(path, pragmas, readers, writers, seconds):
+    """Hammer a database file from reader and writer threads; return counters"""
+    counts = {'reads': 0, 'writes': 0, 'locked': 0}
+    read_latencies = []
+    lock = threading.Lock()
+    stop = time.perf_counter() + seconds
+
+    def connect():
+        conn = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+        for statement in pragmas:
+            conn.execute(statement)
+        return conn
+
+    def reader(n):
+        conn = connect()
+        done, latencies = 0, []
+        while time.perf_counter() < stop:
+            start = time.perf_counter()
+            conn.execute(
+                'SELECT id, site_name, username FROM entry WHERE user_id = ? ORDER BY site_name, id LIMIT 100',
+                (done % USERS,),
+            ).fetchall()
+            latencies.append(time.perf_counter() - start)
+            done += 1
+        with lock:
+            counts['reads'] += done
+            read_latencies.extend(latencies)
+        conn.close()
+
+    def writer(n):
+        conn = connect()
+        done = locked = 0
+        while time.perf_counter() < stop:
+            try:
+                conn.execute('BEGIN IMMEDIATE')
+                conn.execute(
+                    'INSERT INTO entry (user_id, site_name, username, secret, updated_at) VALUES (?, ?, ?, ?, ?)',
+                    (done % USERS, f'w{n}-{done}', 'me', os.urandom(60), time.time()),
+                )
+                conn.execute('UPDATE entry SET updated_at = ? WHERE id = ?', (time.time(), done + 1))
+                conn.execute('COMMIT')
+                done += 1
+            except sqlite3.OperationalError:
+                locked += 1
+                if conn.in_transaction:
+                    conn.execute('ROLLBACK')
+        with lock:
+            counts['writes'] += done
+            counts['locked'] += locked
+        conn.close()
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+    threads += [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    read_latencies.sort()
+    counts['p95_read_ms'] = read_latencies[int(len(read_latencies) * 0.95)] * 1000 if read_latencies else 0
+    return counts
+
+
+class DatabaseLoadBenchmark(SimpleTestCase):
+    """Concurrent readers and writers on a local SQLite file, before and after tuning"""
+
+    def test_rollback_journal_vs_tuned_wal(self):
+        seconds = float(os.environ.get('BENCH_SECONDS', '3'))
+        profiles = [
+            ('default (rollback journal)', ['PRAGMA journal_mode = delete', 'PRAGMA synchronous = full']),
+            ('tuned (settings.SQLITE_PRAGMAS)', sqlite_pragmas()),
+        ]
+
+        for readers, writers in ((8, 1), (8, 4)):
+            rows = []
+            for label, pragmas in profiles:
+                directory = tempfile.mkdtemp()
+                try:
+                    path = os.path.join(directory, 'load.sqlite3')
+                    with sqlite3.connect(path) as conn:
+                        conn.executescript(SCHEMA)
+                        conn.executemany(
+                            'INSERT INTO entry (user_id, site_name, username, secret, updated_at) VALUES (?, ?, ?, ?, ?)',
+                            [(i % USERS, f'site-{i:06d}', 'me', os.urandom(60), time.time()) for i in range(20000)],
+                        )
+                    counts = run_load(path, pragmas, readers, writers, seconds)
+                finally:
+                    shutil.rmtree(directory)
+                rows.append((label, (
+                    f"{counts['reads'] / seconds:,.0f} reads/s  {counts['writes'] / seconds:,.0f} writes/s  "
+                    f"p95 read {counts['p95_read_ms']:.1f} ms  locked {counts['locked']}"
+                )))
+            report(f'{readers} readers, {writers} writers', rows)
@@ -0,0 +1,34 @@
+import time
+
+from django.test import SimpleTestCase
+
+from passwords.crypto import encrypt_password
+from passwords.executor import DecryptionExecutor
+from passwords.keyring import get_keyring
+
+from .utils import bench_sizes, report
+
+
+class DecryptionExecutorBenchmark(SimpleTestCase):
+    def test_throughput(self):
+        ring = get_keyring()
+        executors = {
+            kind: DecryptionExecutor(kind=kind, min_parallel=0)
+            for kind in ('serial', 'thread', 'process')
+        }
+        try:
+            for size in bench_sizes([1000, 10000, 100000]):
+                for engine in ('fernet', 'aes-256-gcm'):
+                    values = [encrypt_password(f'secret-{i}-Pa55word!', ring, engine=engine) for i in range(size)]
+                    rows = []
+                    for kind, executor in executors.items():
+                        executor.decrypt(values[:executor.batch_size])  # warm the pool
+                        start = time.perf_counter()
+                        results = executor.decrypt(values)
+                        elapsed = time.perf_counter() - start
+                        assert not any(result.error for result in results)
+                        rows.append((f'{kind} ({executor.workers} workers)', f'{size / elapsed:>10,.0f} rows/s'))
+                    report(f'{size} {engine} entries', rows)
+        finally:
+            for executor in executors.values():
+                executor.shutdown()
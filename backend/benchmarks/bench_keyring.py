@@ -0,0 +1,54 @@
+import os
+import random
+from unittest import mock
+
+from django.conf import settings
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from passwords import executor
+from passwords.crypto import decrypt_password
+from passwords.keyring import KeyRing, parse_keys
+from passwords.models import PasswordEntry
+from passwords.seeding import seed_entries, seed_users
+
+from .utils import NO_TIMING_LOG, bench_sizes, report, timed
+
+
+def legacy_decrypt_password(encrypted_password, ring=None):
+    """The pre-key-ring behaviour: read the key file on every call, ignoring ``ring``"""
+    key_file = os.path.join(settings.BASE_DIR, 'encryption_key.key')
+    with open(key_file, 'rb') as f:
+        ring = KeyRing(parse_keys(f.read()))
+    return decrypt_password(encrypted_password, ring)
+
+
+@override_settings(SERVER_TIMING=NO_TIMING_LOG)
+class KeyRingListBenchmark(TestCase):
+    def test_list_latency(self):
+        for size in bench_sizes([1000, 5000]):
+            user = seed_users(1, f'keyring-{size}-', 'bench-pass-123')[0]
+            seed_entries(user, size, random.Random(size))
+            tokens = [entry.ciphertext for entry in PasswordEntry.objects.filter(user=user)]
+            client = APIClient()
+            client.force_authenticate(user)
+
+            def fetch():
+                response = client.get('/api/passwords/')
+                assert len(response.data) == size
+
+            def fetch_legacy():
+                with mock.patch.object(executor, 'decrypt_password', legacy_decrypt_password):
+                    fetch()
+
+            decrypt_before = timed(lambda: [legacy_decrypt_password(token) for token in tokens])
+            decrypt_after = timed(lambda: [decrypt_password(token) for token in tokens])
+            list_before = timed(fetch_legacy)
+            list_after = timed(fetch)
+
+            report(f'{size} entries', [
+                ('decrypt loop, key file per call', f'{decrypt_before * 1000:.1f} ms'),
+                ('decrypt loop, key ring', f'{decrypt_after * 1000:.1f} ms'),
+                ('GET /api/passwords/, key file per call', f'{list_before * 1000:.1f} ms'),
+                ('GET /api/passwords/, key ring', f'{list_after * 1000:.1f} ms'),
+            ])
@@ -0,0 +1,28 @@
+import random
+
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from passwords.seeding import seed_entries, seed_users
+
+from .utils import NO_TIMING_LOG, bench_sizes, report, timed
+
+
+@override_settings(SERVER_TIMING=NO_TIMING_LOG)
+class ListModeBenchmark(TestCase):
+    def test_full_vs_metadata(self):
+        for size in bench_sizes([1000, 10000]):
+            user = seed_users(1, f'modes-{size}-', 'bench-pass-123')[0]
+            seed_entries(user, size, random.Random(size))
+            client = APIClient()
+            client.force_authenticate(user)
+
+            full = timed(client.get, '/api/passwords/')
+            metadata = timed(client.get, '/api/passwords/?mode=metadata')
+            reveal = timed(client.post, '/api/passwords/reveal/', {'ids': [1, 2, 3]}, format='json')
+
+            report(f'{size} entries', [
+                ('GET /api/passwords/ (decrypt all)', f'{full * 1000:.1f} ms'),
+                ('GET /api/passwords/?mode=metadata', f'{metadata * 1000:.1f} ms'),
+                ('POST /api/passwords/reveal/ (3 ids)', f'{reveal * 1000:.1f} ms'),
+            ])
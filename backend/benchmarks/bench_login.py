@@ -0,0 +1,112 @@
+import contextlib
+import itertools
+import os
+import statistics
+import threading
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import Client, TransactionTestCase, override_settings
+from rest_framework.throttling import SimpleRateThrottle
+
+from accounts import views
+from passwords.seeding import seed_users
+
+from .utils import NO_TIMING_LOG, report
+
+ATTACK_THREADS = int(os.environ.get('BENCH_ATTACK_THREADS', '8'))
+# Pause between one attacker's requests, standing in for the network round
+# trip; without it in-process attackers just spin on the GIL
+ATTACK_INTERVAL = float(os.environ.get('BENCH_ATTACK_INTERVAL', '0.05'))
+# Seconds the burst runs before measuring, long enough to use up the
+# attackers' rate limit quota
+ATTACK_WARMUP = float(os.environ.get('BENCH_ATTACK_WARMUP', '5'))
+LEGIT_USERS = 4
+LOGINS_PER_USER = 3
+
+
+@override_settings(SERVER_TIMING=NO_TIMING_LOG)
+class LoginProtectionBenchmark(TransactionTestCase):
+    """
+    Latency of legitimate logins while attacker threads replay a credential
+    stuffing list (many emails, a few passwords each, a handful of IPs), with
+    and without the throttles, lockout and failed-credential cache. Every
+    attacker thread offers about 1 / BENCH_ATTACK_INTERVAL requests per second.
+    """
+
+    def test_login_latency_under_stuffing(self):
+        users = seed_users(LEGIT_USERS, 'legit', 'bench-pass-123')
+        rows = [('idle', self.legit_latencies(users))]
+        for protected in (False, True):
+            cache.clear()
+            with self.protection(protected):
+                latencies, attempts, hashed = self.under_attack(users)
+            label = 'stuffing burst, ' + ('protected' if protected else 'unprotected')
+            rows.append((label, latencies))
+            rows.append(('  attacker attempts / hashed', f'{attempts:,} / {hashed:,}'))
+
+        report('Legitimate login latency', [
+            (label, value if isinstance(value, str) else self.describe(value)) for label, value in rows
+        ])
+
+    @contextlib.contextmanager
+    def protection(self, enabled):
+        with contextlib.ExitStack() as stack:
+            if not enabled:
+                stack.enter_context(mock.patch.object(SimpleRateThrottle, 'allow_request', return_value=True))
+                stack.enter_context(mock.patch.object(views, 'lockout_remaining', return_value=0))
+                stack.enter_context(mock.patch.object(views, 'recently_failed', return_value=False))
+            yield
+
+    def under_attack(self, users):
+        stop = threading.Event()
+        attempts = itertools.count()
+        hashed = itertools.count()
+        real_authenticate = views.authenticate
+
+        def counting_authenticate(*args, **kwargs):
+            next(hashed)
+            return real_authenticate(*args, **kwargs)
+
+        def attacker(n):
+            client = Client()
+            for i in itertools.count():
+                if stop.is_set():
+                    return
+                client.post('/api/auth/login/', {
+                    'email': f'victim{i % 500}@example.com', 'password': f'leaked-{i % 3}'
+                }, content_type='application/json', REMOTE_ADDR=f'203.0.113.{n % 4}')
+                next(attempts)
+                time.sleep(ATTACK_INTERVAL)
+
+        threads = [threading.Thread(target=attacker, args=(n,)) for n in range(ATTACK_THREADS)]
+        with mock.patch.object(views, 'authenticate', counting_authenticate):
+            for thread in threads:
+                thread.start()
+            time.sleep(ATTACK_WARMUP)
+            latencies = self.legit_latencies(users)
+            stop.set()
+            for thread in threads:
+                thread.join()
+        # Counters start at 0, so next() is the number of calls
+        return latencies, next(attempts), next(hashed)
+
+    def legit_latencies(self, users):
+        client = Client()
+        latencies = []
+        for _ in range(LOGINS_PER_USER):
+            for n, user in enumerate(users):
+                start = time.perf_counter()
+                response = client.post('/api/auth/login/', {
+                    'email': user.email, 'password': 'bench-pass-123'
+                }, content_type='application/json', REMOTE_ADDR=f'198.51.100.{n}')
+                latencies.append(time.perf_counter() - start)
+                assert response.status_code == 200, response.content
+        return latencies
+
+    def describe(self, latencies):
+        latencies = sorted(latencies)
+        p95 = latencies[int(len(latencies) * 0.95) - 1]
+        return f'p50 {statistics.median(latencies) * 1000:7.1f} ms   p95 {p95 * 1000:7.1f} ms'
+
@@ -0,0 +1,49 @@
+import random
+
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from passwords.models import PasswordEntry
+from passwords.pagination import encode_cursor, paginate
+from passwords.seeding import seed_entries, seed_users
+
+from .utils import NO_TIMING_LOG, bench_sizes, report, timed
+
+PAGE_SIZE = 100
+
+
+@override_settings(SERVER_TIMING=NO_TIMING_LOG)
+class PaginationBenchmark(TestCase):
+    def test_first_vs_deep_page(self):
+        # The deep page is the last full one, which needs a page before it
+        sizes = bench_sizes([10000, 100000])
+        too_small = [size for size in sizes if size <= PAGE_SIZE]
+        if too_small:
+            self.skipTest(f'BENCH_ENTRIES must be over {PAGE_SIZE} (the page size), got {too_small}')
+
+        for size in sizes:
+            user = seed_users(1, f'pages-{size}-', 'bench-pass-123')[0]
+            seed_entries(user, size, random.Random(size))
+            client = APIClient()
+            client.force_authenticate(user)
+            entries = PasswordEntry.objects.filter(user=user).order_by('site_name', 'id')
+            deep = entries.values_list('site_name', 'id')[size - PAGE_SIZE - 1]
+            deep_cursor = encode_cursor('site_name', *deep)
+
+            metadata = entries.defer('encrypted_password', 'encrypted_secret')
+
+            def offset_page(offset):
+                list(metadata[offset:offset + PAGE_SIZE])
+
+            def cursor_page(cursor):
+                paginate(metadata, cursor=cursor, page_size=PAGE_SIZE)
+
+            url = f'/api/passwords/?mode=metadata&page_size={PAGE_SIZE}'
+            report(f'{size} entries, {PAGE_SIZE} per page', [
+                ('GET, first page', f'{timed(client.get, url) * 1000:.2f} ms'),
+                ('GET, last page', f'{timed(client.get, f"{url}&cursor={deep_cursor}") * 1000:.2f} ms'),
+                ('cursor query, first page', f'{timed(cursor_page, None) * 1000:.2f} ms'),
+                ('cursor query, last page', f'{timed(cursor_page, deep_cursor) * 1000:.2f} ms'),
+                ('OFFSET query, first page', f'{timed(offset_page, 0) * 1000:.2f} ms'),
+                ('OFFSET query, last page', f'{timed(offset_page, size - PAGE_SIZE) * 1000:.2f} ms'),
+            ])
@@ -0,0 +1,38 @@
+import random
+
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from passwords import search
+from passwords.seeding import seed_entries, seed_users
+
+from .utils import NO_TIMING_LOG, bench_sizes, report, timed
+
+
+@override_settings(SERVER_TIMING=NO_TIMING_LOG)
+class SearchBenchmark(TestCase):
+    def test_fts_vs_substring_scan(self):
+        for size in bench_sizes([10000, 100000]):
+            user = seed_users(1, f'search-{size}-', 'bench-pass-123')[0]
+            seed_entries(user, size, random.Random(size))
+            # Another vault of the same size, so the index is shared like in production
+            other = seed_users(1, f'search-other-{size}-', 'bench-pass-123')[0]
+            seed_entries(other, size, random.Random(-size))
+            client = APIClient()
+            client.force_authenticate(user)
+
+            # One entry's generated site, a word many sites share, every
+            # entry's username domain, and a popular site
+            rare = user.passwordentry_set.filter(site_name__regex=r'\d$').order_by('id')[size // 4].site_name
+            rows = []
+            for query in (rare, 'harbor', 'example', 'github'):
+                fts = timed(client.get, f'/api/passwords/search/?q={query}&page_size=50')
+                search._fts_available = False
+                try:
+                    scan = timed(client.get, f'/api/passwords/search/?q={query}&page_size=50')
+                finally:
+                    search._fts_available = None
+                rows.append((f'q={query} FTS5', f'{fts * 1000:.1f} ms'))
+                rows.append((f'q={query} LIKE scan', f'{scan * 1000:.1f} ms'))
+
+            report(f'Search in {size} entries', rows)
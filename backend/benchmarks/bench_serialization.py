@@ -0,0 +1,42 @@
+import random
+
+from django.test import TestCase
+from rest_framework.renderers import JSONRenderer
+
+from passwords.models import PasswordEntry
+from passwords.renderers import FastJSONRenderer
+from passwords.seeding import seed_entries, seed_users
+from passwords.serializers import PasswordEntrySerializer, entry_rows
+
+from .utils import bench_sizes, report, timed
+
+
+class SerializationBenchmark(TestCase):
+    def test_model_serializer_vs_fast_path(self):
+        for size in bench_sizes([1000, 10000, 100000]):
+            user = seed_users(1, f'serialize-{size}-', 'bench-pass-123')[0]
+            seed_entries(user, size, random.Random(size))
+            entries = PasswordEntry.objects.filter(user=user).defer('encrypted_password', 'encrypted_secret')
+
+            def per_row_serializer():
+                JSONRenderer().render([PasswordEntrySerializer(entry).data for entry in entries])
+
+            def many_serializer():
+                JSONRenderer().render(PasswordEntrySerializer(entries, many=True).data)
+
+            def fast_rows_stdlib():
+                JSONRenderer().render(entry_rows(entries))
+
+            def fast_rows():
+                FastJSONRenderer().render(entry_rows(entries))
+
+            repeat = 1 if size >= 100000 else 3
+            rows = []
+            for label, func in (
+                ('PasswordEntrySerializer per row', per_row_serializer),
+                ('PasswordEntrySerializer(many=True)', many_serializer),
+                ('entry_rows + JSONRenderer', fast_rows_stdlib),
+                ('entry_rows + FastJSONRenderer', fast_rows),
+            ):
+                rows.append((label, f'{size / timed(func, repeat=repeat):,.0f} rows/s'))
+            report(f'Serialize {size} entries', rows)
@@ -0,0 +1,64 @@
+import base64
+import importlib
+
+from django.apps import apps
+from django.db.models import Sum
+from django.db.models.functions import Coalesce, Length
+from django.test import TestCase
+
+from passwords.crypto import decrypt_password
+from passwords.keyring import get_keyring
+from passwords.models import PasswordEntry
+from passwords.seeding import seed_users
+
+from .utils import bench_sizes, report, timed
+
+migration = importlib.import_module('passwords.migrations.0003_convert_ciphertext_to_binary')
+
+
+class CiphertextStorageBenchmark(TestCase):
+    def stored_bytes(self, user):
+        totals = PasswordEntry.objects.filter(user=user).aggregate(
+            text=Coalesce(Sum(Length('encrypted_password')), 0),
+            binary=Coalesce(Sum(Length('encrypted_secret')), 0),
+        )
+        return totals['text'] + totals['binary']
+
+    def decode_all(self, user):
+        rows = PasswordEntry.objects.filter(user=user).values_list('encrypted_secret', 'encrypted_password')
+        for secret, text in rows:
+            decrypt_password(bytes(secret) if secret is not None else text)
+
+    def test_text_vs_binary(self):
+        for size in bench_sizes([100000]):
+            user = seed_users(1, f'storage-{size}-', 'bench-pass-123')[0]
+            ring = get_keyring()
+
+            def legacy_value(password):
+                token = ring.fernet.encrypt(password.encode())
+                return f'{ring.primary_id}:{base64.b64encode(token).decode()}'
+
+            PasswordEntry.objects.bulk_create(
+                [
+                    PasswordEntry(
+                        user=user, site_name=f'site-{i:06d}', username=f'user{i}',
+                        encrypted_password=legacy_value(f'secret-{i}-Pa55word!'),
+                    )
+                    for i in range(size)
+                ],
+                batch_size=2000,
+            )
+
+            text_bytes = self.stored_bytes(user)
+            text_decode = timed(self.decode_all, user, repeat=1)
+            convert = timed(migration.convert_to_binary, apps, None, repeat=1)
+            binary_bytes = self.stored_bytes(user)
+            binary_decode = timed(self.decode_all, user, repeat=1)
+
+            report(f'{size} entries', [
+                ('ciphertext bytes, text column', f'{text_bytes / 1024:.0f} KiB'),
+                ('ciphertext bytes, binary column', f'{binary_bytes / 1024:.0f} KiB'),
+                ('list decode, text column', f'{text_decode * 1000:.0f} ms'),
+                ('list decode, binary column', f'{binary_decode * 1000:.0f} ms'),
+                ('data migration', f'{convert * 1000:.0f} ms'),
+            ])
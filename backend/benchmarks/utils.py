@@ -0,0 +1,102 @@
+import json
+import math
+import os
+import time
+import tracemalloc
+
+# Requests are timed without the per-request timing log line
+NO_TIMING_LOG = {'HEADER': False, 'LOG': False}
+
+
+def bench_sizes(default):
+    """Vault sizes to benchmark, overridable with BENCH_ENTRIES=100,1000"""
+    value = os.environ.get('BENCH_ENTRIES')
+    if not value:
+        return default
+    return [int(size) for size in value.split(',')]
+
+
+def timed(func, *args, repeat=5, **kwargs):
+    """Return the best wall-clock time of ``repeat`` calls, in seconds"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args, **kwargs)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def report(title, rows):
+    """Print a small aligned results table"""
+    print(f'\n{title}')
+    for label, value in rows:
+        print(f'  {label:<40} {value}')
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(len(ordered) * pct / 100))
+    return ordered[rank - 1]
+
+
+def profile(func, samples=30, warmup=3):
+    """
+    Latency percentiles of ``samples`` calls in milliseconds, and the peak
+    memory allocated by one more call in KiB. Allocations are traced in a
+    separate call since tracemalloc slows everything down.
+    """
+    for _ in range(warmup):
+        func()
+    durations = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        func()
+        durations.append((time.perf_counter() - start) * 1000)
+
+    tracemalloc.start()
+    try:
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'samples': samples,
+        'p50_ms': round(percentile(durations, 50), 3),
+        'p95_ms': round(percentile(durations, 95), 3),
+        'p99_ms': round(percentile(durations, 99), 3),
+        'peak_alloc_kib': round(peak / 1024, 1),
+    }
+
+
+def write_results(path, results):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+
+
+def regressions(results, baseline, threshold, metrics=('p50_ms', 'p95_ms', 'peak_alloc_kib'), min_delta_ms=1.0):
+    """
+    Measurements in ``results`` more than ``threshold`` (0.2 = 20%) worse than
+    the same measurement in ``baseline``. Both map a case name to the dict
+    profile() returns; cases missing from either side are not compared.
+    Latencies must also grow by ``min_delta_ms``, which keeps scheduler
+    jitter on millisecond requests from counting as a regression.
+    """
+    found = []
+    for case, measured in sorted(results.items()):
+        before = baseline.get(case)
+        if before is None:
+            continue
+        for metric in metrics:
+            old, new = before.get(metric), measured.get(metric)
+            if not old or new is None or new <= old * (1 + threshold):
+                continue
+            if metric.endswith('_ms') and new - old < min_delta_ms:
+                continue
+            found.append(f'{case} {metric}: {old} -> {new} (+{(new / old - 1) * 100:.0f}%)')
+    return found
@@ -0,0 +1,30 @@
+"""
+Database connection tuning.
+
+``settings.DATABASES`` keeps connections open between requests
+(``CONN_MAX_AGE``) and checks them before reuse (``CONN_HEALTH_CHECKS``).
+For SQLite, every new connection additionally gets the pragmas in
+``settings.SQLITE_PRAGMAS``: WAL journaling so readers never wait for the
+writer, ``synchronous=NORMAL`` (safe with WAL), a larger page cache, memory
+mapped reads and a busy timeout so concurrent writers queue instead of
+failing with "database is locked".
+"""
+from django.conf import settings
+from django.db.backends.signals import connection_created
+
+
+def sqlite_pragmas():
+    """PRAGMA statements for a new SQLite connection"""
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', {})
+    return [f'PRAGMA {name} = {value}' for name, value in pragmas.items()]
+
+
+def configure_connection(sender, connection, **kwargs):
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            for statement in sqlite_pragmas():
+                cursor.execute(statement)
+
+
+def install():
+    connection_created.connect(configure_connection, dispatch_uid='password_manager.database')
@@ -0,0 +1,378 @@
+"""
+In-process metrics, exposed in Prometheus text format on ``/metrics``.
+
+Counters and fixed-bucket histograms live in a process-wide registry.
+Looking up a labelled series takes no lock once it exists; each series has
+its own small lock for updates, so threads only contend when they update
+the very same series.
+
+Pre-forked workers (gunicorn, uwsgi) each have their own registry. Point
+``settings.METRICS['DIR']`` at a directory they share, ideally on tmpfs:
+every worker then writes a snapshot of its registry there, at most every
+``FLUSH_INTERVAL`` seconds, and a scrape of any worker sums the snapshots
+of all of them. Snapshots of workers that exited are kept so counters never
+go backwards; clear the directory when the server starts. Secrets decrypted
+in a process-kind decryption executor are counted in the pool's processes
+and so are not included.
+
+``/metrics`` is for staff users only.
+"""
+import bisect
+import functools
+import json
+import os
+import threading
+import time
+import uuid
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
+
+from . import timing
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+DEFAULT_FLUSH_INTERVAL = 5
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CRYPTO_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.005, 0.025)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+class CounterValue:
+    __slots__ = ('lock', 'value')
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.value = 0
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+
+    def snapshot(self):
+        return self.value
+
+
+class HistogramValue:
+    __slots__ = ('lock', 'buckets', 'counts', 'sum')
+
+    def __init__(self, buckets):
+        self.lock = threading.Lock()
+        self.buckets = buckets
+        # One count per bucket plus +Inf, not cumulative
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def snapshot(self):
+        with self.lock:
+            return {'counts': list(self.counts), 'sum': self.sum}
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labels=(), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self.series = {}
+        self.lock = threading.Lock()
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def new_value(self):
+        raise NotImplementedError
+
+    def labels(self, **labels):
+        """The series for these label values, created on first use"""
+        key = tuple(str(labels[name]) for name in self.label_names)
+        value = self.series.get(key)
+        if value is None:
+            with self.lock:
+                value = self.series.setdefault(key, self.new_value())
+        return value
+
+    def snapshot(self):
+        return {
+            'type': self.kind,
+            'help': self.documentation,
+            'labels': list(self.label_names),
+            'series': [[list(key), value.snapshot()] for key, value in list(self.series.items())],
+        }
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def new_value(self):
+        return CounterValue()
+
+    def inc(self, amount=1, **labels):
+        self.labels(**labels).inc(amount)
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS, registry=None):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labels, registry)
+
+    def new_value(self):
+        return HistogramValue(self.buckets)
+
+    def observe(self, value, **labels):
+        self.labels(**labels).observe(value)
+
+    def snapshot(self):
+        return {**super().snapshot(), 'buckets': list(self.buckets)}
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+
+    def register(self, metric):
+        if metric.name in self.metrics:
+            raise ValueError(f'Metric {metric.name!r} is already registered')
+        self.metrics[metric.name] = metric
+
+    def snapshot(self):
+        return {name: metric.snapshot() for name, metric in self.metrics.items()}
+
+
+REGISTRY = Registry()
+
+REQUESTS = Counter(
+    'http_requests_total', 'HTTP requests by route, method and status', ['route', 'method', 'status'],
+)
+REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds', 'HTTP request latency by route, method and status',
+    ['route', 'method', 'status'], buckets=LATENCY_BUCKETS,
+)
+REQUEST_QUERIES = Histogram(
+    'http_request_db_queries', 'Database queries per HTTP request by route', ['route'], buckets=QUERY_BUCKETS,
+)
+CRYPTO_DURATION = Histogram(
+    'vault_crypto_duration_seconds', 'Time to encrypt or decrypt one vault secret', ['operation'],
+    buckets=CRYPTO_BUCKETS,
+)
+CRYPTO_ERRORS = Counter(
+    'vault_crypto_errors_total', 'Vault secrets that failed to encrypt or decrypt', ['operation'],
+)
+LOGINS = Counter('auth_logins_total', 'Login attempts by outcome', ['outcome'])
+
+
+def crypto_operation(operation):
+    """Decorator counting and timing each call of an encrypt or decrypt function"""
+    def decorator(func):
+        duration = CRYPTO_DURATION.labels(operation=operation)
+        errors = CRYPTO_ERRORS.labels(operation=operation)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except Exception:
+                errors.inc()
+                raise
+            duration.observe(time.perf_counter() - start)
+            return result
+        return wrapper
+    return decorator
+
+
+# Sharing between worker processes
+
+def metrics_dir():
+    return getattr(settings, 'METRICS', {}).get('DIR')
+
+
+class SnapshotStore:
+    """Writes this process's snapshot to, and merges all snapshots from, a shared directory"""
+
+    def __init__(self, registry=REGISTRY):
+        self.registry = registry
+        self.lock = threading.Lock()
+        self.last_flush = 0.0
+        self.pid = None
+        self.name = None
+
+    def path(self, directory):
+        pid = os.getpid()
+        if self.pid != pid:
+            # Chosen per process (a forked worker inherits the parent's
+            # store): a pid alone is reused once its worker exits, and the
+            # new worker would overwrite the old one's counts
+            self.pid = pid
+            self.name = f'metrics-{pid}-{uuid.uuid4().hex}.json'
+        return os.path.join(directory, self.name)
+
+    def flush(self, force=False):
+        directory = metrics_dir()
+        if not directory:
+            return
+        interval = getattr(settings, 'METRICS', {}).get('FLUSH_INTERVAL', DEFAULT_FLUSH_INTERVAL)
+        now = time.monotonic()
+        if not force and now - self.last_flush < interval:
+            return
+        if not self.lock.acquire(blocking=force):
+            # Another thread of this worker is already flushing
+            return
+        try:
+            self.last_flush = now
+            path = self.path(directory)
+            tmp_path = f'{path}.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(self.registry.snapshot(), f)
+            os.replace(tmp_path, path)
+        finally:
+            self.lock.release()
+
+    def collect(self):
+        """Snapshot of every worker sharing the directory, or of this process alone"""
+        directory = metrics_dir()
+        if not directory:
+            return self.registry.snapshot()
+        self.flush(force=True)
+        snapshots = []
+        for name in sorted(os.listdir(directory)):
+            if name.startswith('metrics-') and name.endswith('.json'):
+                try:
+                    with open(os.path.join(directory, name)) as f:
+                        snapshots.append(json.load(f))
+                except (OSError, ValueError):
+                    # Removed or being replaced; it is written atomically, so
+                    # this only happens when a worker directory is cleared
+                    continue
+        return merge(snapshots)
+
+
+def merge(snapshots):
+    """Sum counters and histogram buckets of the same series across snapshots"""
+    merged = {}
+    for snapshot in snapshots:
+        for name, metric in snapshot.items():
+            target = merged.setdefault(name, {**metric, 'series': {}})
+            for key, value in metric['series']:
+                key = tuple(key)
+                if key not in target['series']:
+                    target['series'][key] = value
+                elif metric['type'] == 'counter':
+                    target['series'][key] += value
+                else:
+                    current = target['series'][key]
+                    target['series'][key] = {
+                        'counts': [a + b for a, b in zip(current['counts'], value['counts'])],
+                        'sum': current['sum'] + value['sum'],
+                    }
+    for metric in merged.values():
+        metric['series'] = [[list(key), value] for key, value in metric['series'].items()]
+    return merged
+
+
+STORE = SnapshotStore()
+
+
+# Prometheus text format
+
+def escape_label(value):
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def format_labels(names, values, extra=()):
+    pairs = [f'{name}="{escape_label(value)}"' for name, value in [*zip(names, values), *extra]]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def format_number(value):
+    if isinstance(value, float) and value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def exposition(snapshot):
+    """Render a (merged) snapshot in the Prometheus text exposition format"""
+    lines = []
+    for name, metric in sorted(snapshot.items()):
+        help_text = metric['help'].replace('\\', '\\\\').replace('\n', '\\n')
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {metric["type"]}')
+        names = metric['labels']
+        for values, value in sorted(metric['series']):
+            if metric['type'] == 'counter':
+                lines.append(f'{name}{format_labels(names, values)} {format_number(value)}')
+                continue
+            cumulative = 0
+            for bound, count in zip([*metric['buckets'], float('inf')], value['counts']):
+                cumulative += count
+                le = format_labels(names, values, [('le', format_number(float(bound)))])
+                lines.append(f'{name}_bucket{le} {cumulative}')
+            lines.append(f'{name}_sum{format_labels(names, values)} {format_number(float(value["sum"]))}')
+            lines.append(f'{name}_count{format_labels(names, values)} {cumulative}')
+    return '\n'.join(lines) + '\n'
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def metrics_view(request):
+    """Prometheus scrape endpoint"""
+    return HttpResponse(exposition(STORE.collect()), content_type=CONTENT_TYPE)
+
+
+# Request instrumentation
+
+def route_of(request):
+    """URL pattern that served the request, which keeps label values bounded"""
+    match = getattr(request, 'resolver_match', None)
+    return match.route if match is not None else '<unmatched>'
+
+
+class MetricsMiddleware:
+    """
+    Records request count, latency and database queries per route. Place it
+    after ServerTimingMiddleware, whose query count it reads.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        start = time.perf_counter()
+        response = self.get_response(request)
+        self.record(request, response, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        response = await self.get_response(request)
+        self.record(request, response, time.perf_counter() - start)
+        return response
+
+    def record(self, request, response, elapsed):
+        route = route_of(request)
+        labels = {'route': route, 'method': request.method, 'status': response.status_code}
+        REQUESTS.inc(**labels)
+        REQUEST_DURATION.observe(elapsed, **labels)
+        timings = timing.current()
+        if timings is not None:
+            REQUEST_QUERIES.observe(timings.queries, route=route)
+        STORE.flush()
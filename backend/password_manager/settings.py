@@ -10,6 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import json
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -44,6 +46,9 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'password_manager.timing.ServerTimingMiddleware',
+    'password_manager.metrics.MetricsMiddleware',
+    'passwords.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -76,11 +81,87 @@ WSGI_APPLICATION = 'password_manager.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# SQLite by default; DATABASE_PROFILE=postgres selects the PostgreSQL
+# profile, configured from the DB_* environment variables. Connections are
+# persistent and health-checked either way; see password_manager/database.py
+# for the per-connection SQLite pragmas.
+DATABASE_PROFILE = os.environ.get('DATABASE_PROFILE', 'sqlite')
+
+if DATABASE_PROFILE == 'postgres':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DB_NAME', 'password_manager'),
+            'USER': os.environ.get('DB_USER', 'password_manager'),
+            'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+            'HOST': os.environ.get('DB_HOST', '127.0.0.1'),
+            'PORT': os.environ.get('DB_PORT', '5432'),
+            'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', '600')),
+            'CONN_HEALTH_CHECKS': True,
+            # Transaction pooling (pgbouncer) cannot keep server-side cursors
+            # open across transactions
+            'DISABLE_SERVER_SIDE_CURSORS': os.environ.get('DB_POOLER') == 'pgbouncer',
+            'OPTIONS': {
+                'connect_timeout': 5,
+                'application_name': 'password_manager',
+            },
+        }
     }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+            'CONN_MAX_AGE': 600,
+            'CONN_HEALTH_CHECKS': True,
+            # A file rather than the shared in-memory database, which fails
+            # concurrent writers at once instead of honouring busy_timeout
+            'TEST': {
+                'NAME': BASE_DIR / 'test_db.sqlite3',
+            },
+        }
+    }
+
+# Per-request db/crypto/serialize timings (see password_manager/timing.py).
+# The Server-Timing header exposes decryption times, so it follows DEBUG
+SERVER_TIMING = {
+    'HEADER': DEBUG,
+    'LOG': True,
+}
+
+# Request, crypto and login metrics on /metrics (see password_manager/metrics.py).
+# With several worker processes, set METRICS_DIR to a directory they share
+# (and clear it when the server starts) so a scrape sees all of them
+METRICS = {
+    'DIR': os.environ.get('METRICS_DIR'),
+    'FLUSH_INTERVAL': 5,  # seconds
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'password_manager.timing': {
+            'handlers': ['console'],
+            'level': os.environ.get('TIMING_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+    },
+}
+
+# Applied to every new SQLite connection (see password_manager/database.py)
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'busy_timeout': 5000,
+    'cache_size': -64000,  # KiB
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'memory',
 }
 
 # Password validation
@@ -101,6 +182,31 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Password hashing cost tuned for this host: `manage.py calibrate_hashers`
+# writes the profile, whose algorithm is used for new hashes. Existing
+# hashes are upgraded when their user next logs in (see accounts/hashers.py)
+PASSWORD_HASHER_PROFILE = os.environ.get('PASSWORD_HASHER_PROFILE', str(BASE_DIR / 'hasher_profile.json'))
+
+calibrated_hashers = {
+    'pbkdf2_sha256': 'accounts.hashers.CalibratedPBKDF2PasswordHasher',
+    'scrypt': 'accounts.hashers.CalibratedScryptPasswordHasher',
+    'argon2': 'accounts.hashers.CalibratedArgon2PasswordHasher',
+}
+try:
+    with open(PASSWORD_HASHER_PROFILE) as f:
+        preferred_hasher = json.load(f).get('algorithm')
+except FileNotFoundError:
+    preferred_hasher = None
+if preferred_hasher not in calibrated_hashers:
+    preferred_hasher = 'pbkdf2_sha256'
+
+PASSWORD_HASHERS = [calibrated_hashers[preferred_hasher]] + [
+    path for algorithm, path in calibrated_hashers.items() if algorithm != preferred_hasher
+] + [
+    # Verify-only, for passwords set before the project's defaults changed
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+]
 
 # Internationalization
 # https://docs.djangoproject.com/en/4.2/topics/i18n/
@@ -127,13 +233,46 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'accounts.authentication.StatelessJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'passwords.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'passwords.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+    # Login and register throttles (see accounts/throttling.py). The counters
+    # live in the default cache, which must be shared between processes
+    'DEFAULT_THROTTLE_RATES': {
+        'login_ip': '10/min',
+        'login_email': '5/min',
+        'register': '20/hour',
+    },
+    'LOGIN_LOCKOUT': {
+        'FAILURES': 5,
+        'WINDOW': 15 * 60,
+        'BASE_DELAY': 30,
+        'MAX_DELAY': 60 * 60,
+        'FAILED_CREDENTIAL_TTL': 5 * 60,
+    },
 }
 
+# MessagePack is offered (Accept: application/msgpack) only when the
+# optional msgpack package is installed
+try:
+    import msgpack  # noqa: F401
+except ImportError:
+    pass
+else:
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'].insert(1, 'passwords.renderers.MessagePackRenderer')
+    REST_FRAMEWORK['DEFAULT_PARSER_CLASSES'].insert(1, 'passwords.parsers.MessagePackParser')
+
 # JWT settings
 from datetime import timedelta
 SIMPLE_JWT = {
@@ -142,10 +281,77 @@ SIMPLE_JWT = {
     'ROTATE_REFRESH_TOKENS': True,
 }
 
+# Login throttles, lockouts and the is_active cache live here, so several
+# worker processes need a shared cache (see accounts/throttling.py)
+CACHE_URL = os.environ.get('CACHE_URL')
+if CACHE_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Stateless token auth (see accounts/authentication.py): seconds a user's
+# is_active flag is cached; None skips the check entirely
+ACCOUNTS_AUTH = {
+    'ACTIVE_CHECK_TTL': 60,
+}
+
 # CORS settings
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:8000",
 ]
 
 # Custom user model
-AUTH_USER_MODEL = 'accounts.User'
\ No newline at end of file
+AUTH_USER_MODEL = 'accounts.User'
+
+# Vault encryption key ring (see passwords/keyring.py)
+PASSWORD_KEYRING = {
+    'PROVIDER': 'passwords.keyring.FileKeyProvider',
+    'OPTIONS': {
+        'path': BASE_DIR / 'encryption_key.key',
+    },
+    'RELOAD_SIGNAL': 'SIGHUP',
+}
+
+# Cipher engine for new vault secrets: aes-256-gcm, chacha20-poly1305 or fernet
+PASSWORD_CIPHER = 'aes-256-gcm'
+
+# Cursor pagination for GET /api/passwords/?page_size=...
+PASSWORDS_PAGINATION = {
+    'PAGE_SIZE': 100,
+    'MAX_PAGE_SIZE': 1000,
+}
+
+# Response compression (see passwords/middleware.py)
+PASSWORDS_COMPRESSION = {
+    'PATHS': ['/api/passwords/', '/api/async/passwords/'],
+    'MIN_SIZE': 1024,
+    'GZIP_LEVEL': 6,
+    'BROTLI_QUALITY': 4,
+}
+
+# Limits for /api/passwords/bulk/
+PASSWORDS_BULK = {
+    'MAX_ITEMS': 5000,
+}
+
+# Rows decrypted per step of a streaming /api/passwords/export/
+PASSWORDS_EXPORT = {
+    'CHUNK_SIZE': 1000,
+}
+
+# Pool used to decrypt many vault entries at once (see passwords/executor.py)
+PASSWORD_DECRYPT_EXECUTOR = {
+    'KIND': 'thread',
+    'WORKERS': None,
+    'BATCH_SIZE': 256,
+    'MIN_PARALLEL': 512,
+}
\ No newline at end of file
@@ -0,0 +1,167 @@
+"""
+Per-request timing breakdown.
+
+``ServerTimingMiddleware`` measures every request and splits its time into
+phases: ``db`` (every SQL query, through a connection execute wrapper),
+``crypto`` (encrypting and decrypting vault secrets) and ``serialize``
+(building response rows and rendering them). Phases are exclusive: a query
+run while serializing counts as db time, not serialize time.
+
+Each request logs one logfmt line on the ``password_manager.timing`` logger,
+with the same values attached as ``extra={'timing': {...}}`` for structured
+handlers. With ``settings.SERVER_TIMING['HEADER']`` (default: DEBUG) the
+response also carries a ``Server-Timing`` header::
+
+    Server-Timing: db;dur=3.1;desc="4 queries", crypto;dur=41.0, serialize;dur=6.2, total;dur=55.8
+
+The header tells any client how long decryption took, so keep it off in
+production. For streaming responses the timings stop at the first byte.
+
+Code marks a phase with ``with timing.phase('crypto'):`` or the
+``@timing.timed('crypto')`` decorator; both do nothing outside a request.
+"""
+import functools
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger(__name__)
+
+PHASES = ('db', 'crypto', 'serialize')
+
+
+class RequestTimings:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.durations = dict.fromkeys(PHASES, 0.0)
+        self.queries = 0
+
+    def as_dict(self):
+        """Milliseconds per phase, the total and the query count"""
+        timing = {f'{name}_ms': round(value * 1000, 2) for name, value in self.durations.items()}
+        timing['total_ms'] = round((time.perf_counter() - self.start) * 1000, 2)
+        timing['queries'] = self.queries
+        return timing
+
+
+_timings = ContextVar('request_timings', default=None)
+# Open phases, innermost last, as [name, start, time spent in nested phases]
+_phases = ContextVar('timing_phases', default=())
+
+
+def current():
+    """The RequestTimings of the request being handled, or None"""
+    return _timings.get()
+
+
+@contextmanager
+def phase(name):
+    """Add the time spent in the block, minus any nested phases, to ``name``"""
+    timings = _timings.get()
+    if timings is None:
+        yield
+        return
+    outer = _phases.get()
+    frame = [name, time.perf_counter(), 0.0]
+    token = _phases.set(outer + (frame,))
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - frame[1]
+        _phases.reset(token)
+        timings.durations[name] += max(0.0, elapsed - frame[2])
+        if outer:
+            outer[-1][2] += elapsed
+
+
+def timed(name):
+    """Decorator form of phase()"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            # Called per row in bulk paths: skip the bookkeeping outside a
+            # request and inside a phase of the same name, where it would
+            # not change the result
+            outer = _phases.get()
+            if _timings.get() is None or (outer and outer[-1][0] == name):
+                return func(*args, **kwargs)
+            with phase(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_query(execute, sql, params, many, context):
+    """Connection execute wrapper counting and timing queries"""
+    timings = _timings.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    timings.queries += 1
+    with phase('db'):
+        return execute(sql, params, many, context)
+
+
+def instrument_connection(sender, connection, **kwargs):
+    # connection_created fires again on every reconnect of the same wrapper
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def install():
+    connection_created.connect(instrument_connection, dispatch_uid='password_manager.timing')
+
+
+def server_timing_header(timing):
+    parts = [f'db;dur={timing["db_ms"]:.1f};desc="{timing["queries"]} queries"']
+    parts += [f'{name};dur={timing[f"{name}_ms"]:.1f}' for name in PHASES if name != 'db']
+    parts.append(f'total;dur={timing["total_ms"]:.1f}')
+    return ', '.join(parts)
+
+
+class ServerTimingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        token = _timings.set(RequestTimings())
+        try:
+            response = self.get_response(request)
+            return self.finish(request, response, _timings.get())
+        finally:
+            _timings.reset(token)
+
+    async def __acall__(self, request):
+        token = _timings.set(RequestTimings())
+        try:
+            response = await self.get_response(request)
+            return self.finish(request, response, _timings.get())
+        finally:
+            _timings.reset(token)
+
+    def finish(self, request, response, timings):
+        config = getattr(settings, 'SERVER_TIMING', {})
+        timing = timings.as_dict()
+        if config.get('HEADER', settings.DEBUG):
+            response['Server-Timing'] = server_timing_header(timing)
+        if config.get('LOG', True):
+            logger.info(
+                'method=%s path=%s status=%d total_ms=%.1f queries=%d db_ms=%.1f crypto_ms=%.1f serialize_ms=%.1f',
+                request.method, request.path, response.status_code, timing['total_ms'], timing['queries'],
+                timing['db_ms'], timing['crypto_ms'], timing['serialize_ms'],
+                extra={'timing': {'method': request.method, 'path': request.path,
+                                  'status': response.status_code, **timing}},
+            )
+        return response
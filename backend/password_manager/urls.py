@@ -17,8 +17,15 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 
+from .metrics import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/auth/', include('accounts.urls')),
     path('api/passwords/', include('passwords.urls')),
+    # Async views for ASGI servers (see password_manager/async_api.py)
+    path('api/async/auth/', include('accounts.async_urls')),
+    path('api/async/passwords/', include('passwords.async_urls')),
+    # Prometheus scrape endpoint, staff only
+    path('metrics', metrics_view, name='metrics'),
 ]
\ No newline at end of file
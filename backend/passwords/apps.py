@@ -1,6 +1,26 @@
+import logging
+
 from django.apps import AppConfig
 
+logger = logging.getLogger(__name__)
+
 
 class PasswordsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'passwords'
+
+    def ready(self):
+        from password_manager import database, timing
+        from . import keyring
+
+        database.install()
+        timing.install()
+
+        # Load the vault key once per worker instead of on every request.
+        # A failure here is not fatal: management commands such as migrate
+        # must keep working, and get_keyring() retries on first use.
+        try:
+            keyring.load_keyring()
+        except Exception:
+            logger.exception('Could not load the vault key ring at startup')
+        keyring.install_reload_handler()
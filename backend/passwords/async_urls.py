@@ -0,0 +1,7 @@
+from django.urls import path
+from . import async_views
+
+urlpatterns = [
+    path('', async_views.password_list, name='async_password_list'),
+    path('<int:pk>/', async_views.password_detail, name='async_password_detail'),
+]
@@ -0,0 +1,166 @@
+"""
+Async versions of the password list and detail views, for ASGI servers.
+
+They return the same bodies and status codes as views.py, and the same
+ETags, so clients can switch between the two freely. They are mounted under
+/api/async/passwords/.
+"""
+from asgiref.sync import sync_to_async
+from django.db import transaction
+
+from password_manager.async_api import api_view, json_response, offload
+
+from .changes import acurrent_sequence, lock_vault, record_changes
+from .crypto import encrypt_password
+from .executor import decrypt_many
+from .models import PasswordChange, PasswordEntry
+from .pagination import DEFAULT_ORDERING, InvalidCursor, paginate
+from .serializers import PasswordEntrySerializer, entry_columns, entry_rows, rows_from_tuples
+from .views import add_decrypted, etag_matches, get_page_size, vault_etag
+
+
+@sync_to_async
+def save_with_change(password_entry, action):
+    """Save an entry and log the change in one transaction"""
+    with transaction.atomic():
+        lock_vault(password_entry.user_id)
+        password_entry.save()
+        record_changes(password_entry.user_id, action, [password_entry.id])
+
+
+@sync_to_async
+def delete_with_change(password_entry):
+    with transaction.atomic():
+        lock_vault(password_entry.user_id)
+        entry_id = password_entry.id
+        password_entry.delete()
+        record_changes(password_entry.user_id, PasswordChange.DELETED, [entry_id])
+
+
+@api_view(['GET', 'POST'])
+async def password_list(request):
+    """List user's passwords or create new password"""
+    
+    if request.method == 'GET':
+        sequence = await acurrent_sequence(request.user.id)
+        etag = vault_etag(request, sequence)
+        if_none_match = request.headers.get('If-None-Match', '')
+        if if_none_match and etag_matches(etag, if_none_match):
+            return json_response(status=304, headers={'ETag': etag})
+        
+        passwords = PasswordEntry.objects.filter(user_id=request.user.id)
+        metadata_only = request.query_params.get('mode') == 'metadata'
+        with_secret = not metadata_only
+        
+        paginated = 'cursor' in request.query_params or 'page_size' in request.query_params
+        if paginated:
+            try:
+                password_data, next_cursor = await sync_to_async(paginate)(
+                    passwords,
+                    ordering=request.query_params.get('ordering', DEFAULT_ORDERING),
+                    cursor=request.query_params.get('cursor'),
+                    page_size=get_page_size(request),
+                    serialize=lambda queryset: entry_rows(queryset, with_secret),
+                )
+            except (InvalidCursor, ValueError) as e:
+                return json_response({
+                    'error': str(e)
+                }, status=400)
+        else:
+            tuples = [row async for row in passwords.values_list(*entry_columns(with_secret))]
+            password_data = rows_from_tuples(tuples, with_secret)
+        
+        if with_secret:
+            results = await offload(decrypt_many, [data.pop('ciphertext') for data in password_data])
+            for data, result in zip(password_data, results):
+                add_decrypted(data, result)
+        
+        if paginated:
+            return json_response({
+                'results': password_data,
+                'next': next_cursor,
+                'sequence': sequence
+            }, headers={'ETag': etag})
+        return json_response(password_data, headers={'ETag': etag})
+    
+    elif request.method == 'POST':
+        try:
+            data = request.data if isinstance(request.data, dict) else {}
+            site_name = data.get('site_name')
+            username = data.get('username')
+            password = data.get('password')
+            
+            if not site_name or not username or not password:
+                return json_response({
+                    'error': 'Site name, username, and password are required'
+                }, status=400)
+            
+            password_entry = PasswordEntry(
+                user_id=request.user.id,
+                site_name=site_name,
+                site_url=data.get('site_url', ''),
+                username=username,
+                encrypted_secret=await offload(encrypt_password, password),
+                notes=data.get('notes', '')
+            )
+            await save_with_change(password_entry, PasswordChange.CREATED)
+        except Exception:
+            return json_response({
+                'error': 'Failed to save password'
+            }, status=500)
+        
+        return json_response({
+            'message': 'Password saved successfully',
+            'password': PasswordEntrySerializer(password_entry).data
+        }, status=201)
+
+
+@api_view(['GET', 'PUT', 'DELETE'])
+async def password_detail(request, pk):
+    """Get, update, or delete a specific password"""
+    
+    try:
+        password_entry = await PasswordEntry.objects.aget(pk=pk, user_id=request.user.id)
+    except PasswordEntry.DoesNotExist:
+        return json_response({
+            'error': 'Password not found'
+        }, status=404)
+    
+    if request.method == 'GET':
+        data = PasswordEntrySerializer(password_entry).data
+        result, = await offload(decrypt_many, [password_entry.ciphertext])
+        return json_response(add_decrypted(data, result))
+    
+    elif request.method == 'PUT':
+        if not isinstance(request.data, dict):
+            return json_response({
+                'error': 'Expected a JSON object'
+            }, status=400)
+        
+        try:
+            for field in ('site_name', 'site_url', 'username', 'notes'):
+                if field in request.data:
+                    setattr(password_entry, field, request.data[field])
+            
+            # Only encrypt new password if provided
+            password = request.data.get('password')
+            if password:
+                password_entry.encrypted_secret = await offload(encrypt_password, password)
+                password_entry.encrypted_password = ''
+            
+            await save_with_change(password_entry, PasswordChange.UPDATED)
+        except Exception:
+            return json_response({
+                'error': 'Failed to update password'
+            }, status=500)
+        
+        return json_response({
+            'message': 'Password updated successfully',
+            'password': PasswordEntrySerializer(password_entry).data
+        })
+    
+    elif request.method == 'DELETE':
+        await delete_with_change(password_entry)
+        return json_response({
+            'message': 'Password deleted successfully'
+        }, status=204)
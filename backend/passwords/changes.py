@@ -0,0 +1,83 @@
+"""
+Per-user change log behind delta sync (``GET /api/passwords/changes/``).
+
+Every write to a vault goes through ``record_changes`` inside the same
+transaction as the write. It bumps the user's ``VaultState.sequence`` under a
+row lock and appends one ``PasswordChange`` per entry, so sequence numbers
+are gap-free per user and appear in commit order: a client that has applied
+everything up to N never misses a change numbered N or below.
+
+The same counter doubles as the vault version behind the list endpoint's
+ETag: it moves on every write and on nothing else.
+"""
+from django.db import transaction
+from django.db.models import F
+
+from .models import PasswordChange, VaultState
+
+
+def current_sequence(user_id):
+    """Latest change sequence number for a user's vault"""
+    return VaultState.objects.filter(user_id=user_id).values_list('sequence', flat=True).first() or 0
+
+
+async def acurrent_sequence(user_id):
+    """Async version of current_sequence()"""
+    return await VaultState.objects.filter(user_id=user_id).values_list('sequence', flat=True).afirst() or 0
+
+
+def lock_vault(user_id):
+    """
+    Take the vault's write lock; call it first in every transaction that
+    writes entries. On SQLite a transaction that starts with a read cannot
+    become a writer once another connection has committed (WAL answers
+    SQLITE_BUSY_SNAPSHOT, which busy_timeout does not retry), and a first
+    write that fires the search index triggers fails with SQLITE_BUSY at once
+    while another connection holds the lock. A plain UPDATE waits for the
+    lock instead, even when it matches no row. On PostgreSQL it locks the
+    user's VaultState row, queueing concurrent writers to the same vault.
+    """
+    VaultState.objects.filter(user_id=user_id).update(sequence=F('sequence'))
+
+
+def lock_vaults_of(entry_ids):
+    """lock_vault() for every vault holding one of these entries, in one statement"""
+    VaultState.objects.filter(user__passwordentry__in=entry_ids).update(sequence=F('sequence'))
+
+
+def record_changes(user_id, action, entry_ids):
+    """Append ``action`` for each entry id and return the new sequence number"""
+    entry_ids = list(entry_ids)
+    with transaction.atomic():
+        VaultState.objects.get_or_create(user_id=user_id)
+        state = VaultState.objects.select_for_update().get(user_id=user_id)
+        if not entry_ids:
+            return state.sequence
+        start = state.sequence
+        state.sequence += len(entry_ids)
+        state.save(update_fields=['sequence'])
+        PasswordChange.objects.bulk_create([
+            PasswordChange(user_id=user_id, sequence=start + i, entry_id=entry_id, action=action)
+            for i, entry_id in enumerate(entry_ids, start=1)
+        ])
+    return state.sequence
+
+
+def changes_since(user_id, since, limit):
+    """
+    Collapse up to ``limit`` log records after ``since`` into the latest
+    action per entry. Returns (actions by entry id, last sequence, has_more).
+    """
+    records = list(
+        PasswordChange.objects.filter(user_id=user_id, sequence__gt=since)
+        .order_by('sequence')
+        .values_list('sequence', 'entry_id', 'action')[:limit + 1]
+    )
+    has_more = len(records) > limit
+    records = records[:limit]
+
+    actions = {}
+    for _, entry_id, action in records:
+        actions[entry_id] = action
+    last = records[-1][0] if records else since
+    return actions, last, has_more
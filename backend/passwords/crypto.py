@@ -0,0 +1,118 @@
+"""
+Encryption of vault secrets.
+
+Secrets are stored in ``PasswordEntry.encrypted_secret`` as a compact
+binary blob::
+
+    +--------+--------+-------------------------------+
+    | format | key id | engine payload                |
+    +--------+--------+-------------------------------+
+
+The format byte names the cipher engine (see ciphers.py) and the key id
+names the key ring entry. New secrets use ``settings.PASSWORD_CIPHER``;
+existing rows are always opened with the engine their header names.
+
+``FORMAT_FERNET_ANY`` marks Fernet tokens converted from old rows that never
+recorded a key id; those are decrypted by trying every key in the ring until
+``rotate_vault_keys`` rewrites them.
+
+Rows written before the binary format keep their value in the text column
+``encrypted_password``, either as ``<key id>:<base64 Fernet token>`` or, before
+key ids existed, as a bare base64 token. Both are still accepted here while
+the data migration catches up.
+"""
+import base64
+
+from django.conf import settings
+
+from password_manager.metrics import crypto_operation
+from password_manager.timing import timed
+
+from . import keyring
+from .ciphers import ENGINES, FernetCipher
+
+FORMAT_FERNET_ANY = 0x00
+FORMAT_FERNET = FernetCipher.format_id
+
+HEADER_SIZE = 2
+
+DEFAULT_ENGINE = 'aes-256-gcm'
+
+
+def default_engine():
+    """Engine name used for new secrets"""
+    return getattr(settings, 'PASSWORD_CIPHER', DEFAULT_ENGINE)
+
+
+def stored_value(encrypted_secret, encrypted_password):
+    """Pick the stored ciphertext out of the binary and legacy text columns"""
+    if encrypted_secret is not None:
+        return bytes(encrypted_secret)
+    return encrypted_password
+
+
+def parse_header(value):
+    """Return (format id, key id or None) for a stored value"""
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        format_id, key_id = value[0], value[1]
+        if format_id == FORMAT_FERNET_ANY:
+            return FORMAT_FERNET, None
+        return format_id, key_id
+
+    # Legacy text column, always Fernet
+    key_id, sep, _ = value.partition(':')
+    return FORMAT_FERNET, int(key_id) if sep else None
+
+
+def key_id_of(value):
+    """Key id a stored value was encrypted with, or None if not recorded"""
+    return parse_header(value)[1]
+
+
+def format_of(value):
+    """Cipher engine format id of a stored value"""
+    return parse_header(value)[0]
+
+
+@crypto_operation('encrypt')
+@timed('crypto')
+def encrypt_password(password, ring=None, engine=None):
+    """Encrypt password with the primary key into a binary blob"""
+    ring = ring or keyring.get_keyring()
+    format_id = ENGINES[engine or default_engine()].format_id
+    header = bytes((format_id, ring.primary_id))
+    return header + ring.cipher(format_id, ring.primary_id).encrypt(password.encode(), header)
+
+
+@timed('crypto')
+def encrypt_many(passwords, ring=None, engine=None):
+    """Encrypt several passwords with one key ring lookup"""
+    ring = ring or keyring.get_keyring()
+    return [encrypt_password(password, ring, engine) for password in passwords]
+
+
+def _decrypt(value, ring):
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        value = bytes(value)
+        header, payload = value[:HEADER_SIZE], value[HEADER_SIZE:]
+        if header[0] == FORMAT_FERNET_ANY:
+            return ring.fernet.decrypt(base64.urlsafe_b64encode(payload))
+        return ring.cipher(header[0], header[1]).decrypt(payload, header)
+
+    key_id, sep, token = value.partition(':')
+    if not sep:
+        return ring.fernet.decrypt(base64.b64decode(value.encode()))
+    return ring.cipher(FORMAT_FERNET, int(key_id)).fernet.decrypt(base64.b64decode(token.encode()))
+
+
+@crypto_operation('decrypt')
+@timed('crypto')
+def decrypt_password(value, ring=None):
+    """Decrypt a stored value in any supported format"""
+    if ring is not None:
+        return _decrypt(value, ring).decode()
+    try:
+        return _decrypt(value, keyring.get_keyring()).decode()
+    except keyring.UnknownKeyError as e:
+        # Another process may have added a key this worker has not loaded yet
+        return _decrypt(value, keyring.reload_for_keys([e.key_id])).decode()
@@ -0,0 +1,152 @@
+"""
+Parallel decryption of many vault secrets.
+
+Used wherever plaintext is needed for a large number of rows at once (full
+listings, bulk reveal, exports). Values are split into batches and fanned out
+to a thread or process pool sized to the host; results come back in input
+order, one ``DecryptResult`` per value, so a single corrupt row never fails
+the whole response.
+
+Configure with ``settings.PASSWORD_DECRYPT_EXECUTOR``::
+
+    PASSWORD_DECRYPT_EXECUTOR = {
+        'KIND': 'thread',        # 'thread', 'process' or 'serial'
+        'WORKERS': None,         # default: os.cpu_count()
+        'BATCH_SIZE': 256,
+        'MIN_PARALLEL': 512,     # smaller inputs are decrypted inline
+    }
+"""
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import NamedTuple, Optional
+
+from django.conf import settings
+
+from password_manager.timing import timed
+
+from . import keyring
+from .crypto import decrypt_password, key_id_of
+
+logger = logging.getLogger(__name__)
+
+
+class DecryptResult(NamedTuple):
+    password: Optional[str]
+    error: Optional[str]
+
+
+def decrypt_one(value, ring):
+    """Decrypt a single value, turning any failure into an error code"""
+    try:
+        return DecryptResult(decrypt_password(value, ring), None)
+    except keyring.UnknownKeyError:
+        return DecryptResult(None, 'unknown_key')
+    except Exception as e:
+        return DecryptResult(None, type(e).__name__)
+
+
+def decrypt_batch(values, ring=None):
+    ring = ring or _worker_ring
+    return [decrypt_one(value, ring) for value in values]
+
+
+_worker_ring = None
+
+
+def _init_process_worker(keys):
+    global _worker_ring
+    _worker_ring = keyring.KeyRing(keys)
+
+
+class DecryptionExecutor:
+    """Order-preserving batch decryption on a thread or process pool"""
+
+    def __init__(self, kind='thread', workers=None, batch_size=256, min_parallel=512):
+        if kind not in ('thread', 'process', 'serial'):
+            raise ValueError(f'Unknown executor kind {kind!r}')
+        self.kind = kind
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.min_parallel = min_parallel
+        self._pool = None
+        self._pool_ring = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self, ring):
+        with self._lock:
+            # Process workers hold a copy of the key ring, so they are
+            # replaced whenever the ring is reloaded
+            if self._pool is not None and self.kind == 'process' and self._pool_ring is not ring:
+                self._pool.shutdown(wait=False)
+                self._pool = None
+            if self._pool is None:
+                if self.kind == 'process':
+                    self._pool = ProcessPoolExecutor(
+                        self.workers, initializer=_init_process_worker, initargs=(ring.keys,)
+                    )
+                else:
+                    self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix='decrypt')
+                self._pool_ring = ring
+            return self._pool
+
+    def decrypt(self, values):
+        """Decrypt stored values; returns a DecryptResult per value, in order"""
+        values = list(values)
+        ring = keyring.get_keyring()
+
+        if self.kind == 'serial' or self.workers == 1 or len(values) < self.min_parallel:
+            results = decrypt_batch(values, ring)
+        else:
+            pool = self._get_pool(ring)
+            batches = [values[i:i + self.batch_size] for i in range(0, len(values), self.batch_size)]
+            if self.kind == 'process':
+                mapped = pool.map(decrypt_batch, batches)
+            else:
+                mapped = pool.map(decrypt_batch, batches, [ring] * len(batches))
+            results = [result for batch in mapped for result in batch]
+
+        retry = [i for i, result in enumerate(results) if result.error == 'unknown_key']
+        if retry:
+            # Another process may have added a key this worker has not loaded yet
+            ring = keyring.reload_for_keys({key_id_of(values[i]) for i in retry})
+            for i in retry:
+                results[i] = decrypt_one(values[i], ring)
+
+        failed = sum(1 for result in results if result.error)
+        if failed:
+            logger.warning('Failed to decrypt %d of %d vault entries', failed, len(values))
+        return results
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Process-wide executor built from settings.PASSWORD_DECRYPT_EXECUTOR"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                config = getattr(settings, 'PASSWORD_DECRYPT_EXECUTOR', {})
+                _executor = DecryptionExecutor(
+                    kind=config.get('KIND', 'thread'),
+                    workers=config.get('WORKERS'),
+                    batch_size=config.get('BATCH_SIZE', 256),
+                    min_parallel=config.get('MIN_PARALLEL', 512),
+                )
+    return _executor
+
+
+@timed('crypto')
+def decrypt_many(values):
+    """Decrypt stored values with the process-wide executor"""
+    return get_executor().decrypt(values)
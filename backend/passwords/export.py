@@ -0,0 +1,105 @@
+"""
+Streaming vault export.
+
+Rows are read with ``QuerySet.iterator()`` and decrypted one chunk at a time,
+and every format writer yields text as it goes, so the memory an export needs
+depends on the chunk size, not on the size of the vault.
+"""
+import csv
+import json
+import zlib
+
+from .crypto import stored_value
+from .executor import decrypt_many
+
+EXPORT_FIELDS = ('site_name', 'site_url', 'username', 'password', 'notes', 'created_at', 'updated_at', 'decrypt_error')
+
+COLUMNS = ('site_name', 'site_url', 'username', 'notes', 'created_at', 'updated_at',
+           'encrypted_secret', 'encrypted_password')
+
+# Pieces are joined into writes of about this many bytes
+WRITE_SIZE = 64 * 1024
+
+
+def decrypt_chunk(rows):
+    results = decrypt_many(stored_value(row.pop('encrypted_secret'), row.pop('encrypted_password')) for row in rows)
+    for row, result in zip(rows, results):
+        row['password'] = result.password or ''
+        row['decrypt_error'] = result.error or ''
+        row['created_at'] = row['created_at'].isoformat()
+        row['updated_at'] = row['updated_at'].isoformat()
+        yield row
+
+
+def export_rows(queryset, chunk_size=1000):
+    """Yield one plain dict per entry, decrypting ``chunk_size`` rows at a time"""
+    chunk = []
+    for row in queryset.values(*COLUMNS).iterator(chunk_size=chunk_size):
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield from decrypt_chunk(chunk)
+            chunk = []
+    if chunk:
+        yield from decrypt_chunk(chunk)
+
+
+class Echo:
+    """File-like object whose write() hands the text back to the caller"""
+
+    def write(self, value):
+        return value
+
+
+def csv_pieces(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for row in rows:
+        yield writer.writerow([row[field] for field in EXPORT_FIELDS])
+
+
+def json_pieces(rows):
+    yield '['
+    for i, row in enumerate(rows):
+        yield (',\n' if i else '\n') + json.dumps({field: row[field] for field in EXPORT_FIELDS})
+    yield '\n]\n'
+
+
+def ndjson_pieces(rows):
+    for row in rows:
+        yield json.dumps({field: row[field] for field in EXPORT_FIELDS}) + '\n'
+
+
+WRITERS = {
+    'csv': csv_pieces,
+    'json': json_pieces,
+    'ndjson': ndjson_pieces,
+}
+
+
+def encoded(pieces, size=WRITE_SIZE):
+    """Join small text pieces into UTF-8 chunks of about ``size`` bytes"""
+    parts, length = [], 0
+    for piece in pieces:
+        parts.append(piece)
+        length += len(piece)
+        if length >= size:
+            yield ''.join(parts).encode()
+            parts, length = [], 0
+    if parts:
+        yield ''.join(parts).encode()
+
+
+def gzipped(chunks, level=6):
+    """Compress a byte stream into a gzip file as it is produced"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def stream_export(queryset, export_format, chunk_size=1000, compress=False):
+    """Byte chunks of ``queryset`` exported as ``export_format``"""
+    chunks = encoded(WRITERS[export_format](export_rows(queryset, chunk_size)))
+    return gzipped(chunks) if compress else chunks
@@ -0,0 +1,314 @@
+"""
+Process-wide key ring for vault encryption.
+
+Keys are loaded once per worker process (see ``PasswordsConfig.ready``)
+from a pluggable provider and kept as ready-to-use cipher engines, so
+encrypting or decrypting an entry no longer touches the filesystem.
+
+A ring holds several keys, each with a small integer id (0-255). The first
+key is the primary one used for new ciphertexts; the others stay available
+for decryption until ``manage.py rotate_vault_keys`` has moved every entry
+onto the primary key. Key material is written one key per line as
+``<id>:<key>``; a bare key (the original single-key file) gets id 0.
+
+Configure the provider with ``settings.PASSWORD_KEYRING``::
+
+    PASSWORD_KEYRING = {
+        'PROVIDER': 'passwords.keyring.FileKeyProvider',
+        'OPTIONS': {'path': BASE_DIR / 'encryption_key.key'},
+        'RELOAD_SIGNAL': 'SIGHUP',
+        'MISSING_KEY_RETRY': 30,
+    }
+
+Sending the reload signal to a worker makes it pick up the current key
+material on the next request. A ciphertext naming a key id the ring does not
+hold also triggers a reload, since another process may have added the key;
+an id still missing afterwards is not looked for again for
+``MISSING_KEY_RETRY`` seconds.
+"""
+import logging
+import os
+import signal
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+from cryptography.fernet import Fernet, MultiFernet
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+
+from .ciphers import ENGINES_BY_FORMAT, FernetCipher
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROVIDER = 'passwords.keyring.FileKeyProvider'
+MAX_KEY_ID = 255
+DEFAULT_MISSING_KEY_RETRY = 30
+
+
+class UnknownKeyError(Exception):
+    """A ciphertext names a key id that is not in the ring"""
+
+    def __init__(self, key_id):
+        super().__init__(f'Key id {key_id} is not in the key ring')
+        self.key_id = key_id
+
+
+def parse_keys(data):
+    """Parse ``<id>:<key>`` lines into a list of (id, key), primary first"""
+    keys = []
+    for line in data.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if b':' in line:
+            key_id, key = line.split(b':', 1)
+            key_id = int(key_id)
+        else:
+            key_id, key = 0, line
+        if not 0 <= key_id <= MAX_KEY_ID:
+            raise ImproperlyConfigured(f'Key id {key_id} is outside 0-{MAX_KEY_ID}')
+        if any(key_id == existing for existing, _ in keys):
+            raise ImproperlyConfigured(f'Key id {key_id} appears more than once')
+        keys.append((key_id, key))
+    return keys
+
+
+def format_keys(keys):
+    """Inverse of parse_keys"""
+    return b''.join(b'%d:%s\n' % (key_id, key) for key_id, key in keys)
+
+
+class KeyProvider:
+    """Base class for key material sources"""
+
+    def load(self):
+        """Return a list of (key id, urlsafe base64 key), primary first"""
+        raise NotImplementedError
+
+
+class FileKeyProvider(KeyProvider):
+    """Read keys from a file, creating it exactly once if it is missing"""
+
+    def __init__(self, path=None, lock_timeout=10.0):
+        self.path = str(path or os.path.join(settings.BASE_DIR, 'encryption_key.key'))
+        self.lock_timeout = lock_timeout
+
+    def load(self):
+        data = self._read()
+        if not data:
+            data = self._create()
+        return parse_keys(data)
+
+    def add_key(self):
+        """Generate a new primary key, keeping the old ones for decryption"""
+        with self._locked():
+            keys = parse_keys(self._read())
+            key_id = max((existing for existing, _ in keys), default=-1) + 1
+            if key_id > MAX_KEY_ID:
+                raise ImproperlyConfigured('No free key id left; retire old keys first')
+            keys.insert(0, (key_id, Fernet.generate_key()))
+            self._write(format_keys(keys))
+        return key_id
+
+    def _read(self):
+        try:
+            with open(self.path, 'rb') as f:
+                return f.read().strip()
+        except FileNotFoundError:
+            return b''
+
+    def _create(self):
+        # Several workers may start at once against an empty deployment. Only
+        # the one holding the lock generates the key; the others wait and then
+        # read what the winner wrote.
+        with self._locked():
+            data = self._read()
+            if not data:
+                data = Fernet.generate_key()
+                self._write(data)
+            return data
+
+    def _write(self, data):
+        tmp_path = f'{self.path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    @contextmanager
+    def _locked(self):
+        # The lock file is created with O_EXCL, which is atomic on every
+        # platform we run on, unlike fcntl/msvcrt locking.
+        lock_path = f'{self.path}.lock'
+        deadline = time.monotonic() + self.lock_timeout
+        while True:
+            try:
+                fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                break
+            except FileExistsError:
+                if time.monotonic() > deadline:
+                    raise ImproperlyConfigured(
+                        f'Timed out waiting for key lock {lock_path}; remove it if stale'
+                    )
+                time.sleep(0.05)
+
+        try:
+            yield
+        finally:
+            os.close(fd)
+            os.unlink(lock_path)
+
+
+class EnvironmentKeyProvider(KeyProvider):
+    """Read keys from an environment variable, comma separated"""
+
+    def __init__(self, variable='PASSWORD_MANAGER_ENCRYPTION_KEY'):
+        self.variable = variable
+
+    def load(self):
+        value = os.environ.get(self.variable, '').strip()
+        if not value:
+            raise ImproperlyConfigured(f'Environment variable {self.variable} is not set')
+        return parse_keys(value.replace(',', '\n').encode())
+
+
+class SocketKeyProvider(KeyProvider):
+    """
+    Fetch keys from a local key service, standing in for a real KMS.
+
+    The service listens on a unix socket (``path``) or TCP ``host``/``port``
+    and answers a ``GET <name>\\n`` line with one key per line, then closes
+    the connection or sends an empty line.
+    """
+
+    def __init__(self, path=None, host='127.0.0.1', port=None, name='vault', timeout=2.0):
+        if not path and not port:
+            raise ImproperlyConfigured('SocketKeyProvider needs a socket path or a port')
+        self.path = path
+        self.host = host
+        self.port = port
+        self.name = name
+        self.timeout = timeout
+
+    def _connect(self):
+        if self.path:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(str(self.path))
+            return sock
+        return socket.create_connection((self.host, self.port), timeout=self.timeout)
+
+    def load(self):
+        with self._connect() as sock:
+            sock.sendall(f'GET {self.name}\n'.encode())
+            response = b''
+            while not response.endswith(b'\n\n'):
+                chunk = sock.recv(4096)
+                if not chunk:
+                    break
+                response += chunk
+
+        response = response.strip()
+        if not response or response.startswith(b'ERR'):
+            raise ImproperlyConfigured(f'Key service returned no key for {self.name!r}')
+        return parse_keys(response)
+
+
+class KeyRing:
+    """Pre-built cipher engines for one generation of key material"""
+
+    def __init__(self, keys):
+        if not keys:
+            raise ImproperlyConfigured('The key ring is empty')
+        self.keys = list(keys)
+        self.primary_id = keys[0][0]
+        self.ciphers = {
+            key_id: {format_id: engine(key) for format_id, engine in ENGINES_BY_FORMAT.items()}
+            for key_id, key in keys
+        }
+        # Fernet tokens that never recorded a key id are tried against every key
+        self.fernet = MultiFernet([self.ciphers[key_id][FernetCipher.format_id].fernet for key_id, _ in keys])
+        self.loaded_at = time.time()
+
+    def cipher(self, format_id, key_id):
+        """Engine for a blob header's format and key id"""
+        try:
+            engines = self.ciphers[key_id]
+        except KeyError:
+            raise UnknownKeyError(key_id) from None
+        try:
+            return engines[format_id]
+        except KeyError:
+            raise ValueError(f'Unknown ciphertext format {format_id}') from None
+
+
+_keyring = None
+_reload_requested = False
+_lock = threading.Lock()
+# Key id -> monotonic time of the last reload that did not find it
+_missing_keys = {}
+
+
+def get_provider():
+    """Build the provider configured in settings.PASSWORD_KEYRING"""
+    config = getattr(settings, 'PASSWORD_KEYRING', {})
+    provider_class = import_string(config.get('PROVIDER', DEFAULT_PROVIDER))
+    return provider_class(**config.get('OPTIONS', {}))
+
+
+def load_keyring():
+    """Load key material from the provider and make it the active key ring"""
+    global _keyring, _reload_requested
+    with _lock:
+        _keyring = KeyRing(get_provider().load())
+        _reload_requested = False
+    return _keyring
+
+
+def get_keyring():
+    """Return the active key ring, loading it on first use or after a reload signal"""
+    keyring = _keyring
+    if keyring is None or _reload_requested:
+        keyring = load_keyring()
+    return keyring
+
+
+def request_reload(*args):
+    """Mark the key ring stale; safe to call from a signal handler"""
+    global _reload_requested
+    _reload_requested = True
+
+
+def reload_for_keys(key_ids):
+    """Reload the key ring to find unknown key ids, unless they were just looked for"""
+    retry = getattr(settings, 'PASSWORD_KEYRING', {}).get('MISSING_KEY_RETRY', DEFAULT_MISSING_KEY_RETRY)
+    now = time.monotonic()
+    if all(key_id in _missing_keys and now - _missing_keys[key_id] < retry for key_id in key_ids):
+        return get_keyring()
+
+    request_reload()
+    keyring = get_keyring()
+    for key_id in key_ids:
+        if key_id in keyring.ciphers:
+            _missing_keys.pop(key_id, None)
+        else:
+            logger.warning('Key id %s is still missing after reloading the key ring', key_id)
+            _missing_keys[key_id] = now
+    return keyring
+
+
+def install_reload_handler():
+    """Reload the key ring when the configured signal arrives"""
+    signal_name = getattr(settings, 'PASSWORD_KEYRING', {}).get('RELOAD_SIGNAL', 'SIGHUP')
+    signum = getattr(signal, signal_name or '', None)
+    if signum is None:
+        # Not available on this platform (e.g. SIGHUP on Windows)
+        return False
+    if threading.current_thread() is not threading.main_thread():
+        return False
+    signal.signal(signum, request_reload)
+    return True
@@ -0,0 +1,159 @@
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, transaction
+
+from passwords import keyring
+from passwords.changes import lock_vaults_of
+from passwords.ciphers import ENGINES
+from passwords.crypto import default_engine, stored_value
+from passwords.models import PasswordEntry
+from passwords.rotation import init_worker, reencrypt
+
+# Attempts to commit a chunk while API writers hold the database, doubling
+# the pause after each one
+COMMIT_ATTEMPTS = 6
+RETRY_DELAY = 0.1
+
+
+class Command(BaseCommand):
+    help = 'Re-encrypt every vault entry with the primary key and engine, resuming from a checkpoint'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--generate-key', action='store_true',
+            help='Add a new primary key to the key file before re-encrypting',
+        )
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 1,
+            help='Re-encryption processes; 1 re-encrypts in this process',
+        )
+        parser.add_argument(
+            '--checkpoint', default=os.path.join(settings.BASE_DIR, '.rotate_vault_keys.json'),
+            help='Progress file used to resume after an interruption',
+        )
+        parser.add_argument('--restart', action='store_true', help='Ignore an existing checkpoint')
+        parser.add_argument(
+            '--engine', choices=sorted(ENGINES),
+            help='Cipher engine to re-encrypt with (default: settings.PASSWORD_CIPHER)',
+        )
+
+    def handle(self, *args, **options):
+        provider = keyring.get_provider()
+
+        if options['generate_key']:
+            if not hasattr(provider, 'add_key'):
+                raise CommandError(f'{type(provider).__name__} cannot generate keys; add one at the source')
+            key_id = provider.add_key()
+            self.stdout.write(
+                f'Added primary key {key_id}. Send SIGHUP to API workers so they encrypt with it too.'
+            )
+
+        keys = provider.load()
+        ring = keyring.KeyRing(keys)
+        keyring.load_keyring()
+
+        engine = options['engine'] or default_engine()
+
+        checkpoint_path = options['checkpoint']
+        state = {'primary_id': ring.primary_id, 'engine': engine, 'last_pk': 0, 'rotated': 0}
+        if not options['restart']:
+            saved = self.read_checkpoint(checkpoint_path)
+            if saved and saved.get('primary_id') == ring.primary_id and saved.get('engine') == engine:
+                state = saved
+                self.stdout.write(f"Resuming after entry {state['last_pk']}")
+
+        chunk_size = options['chunk_size']
+        workers = max(1, options['workers'])
+        pool = None
+        if workers > 1:
+            pool = ProcessPoolExecutor(workers, initializer=init_worker, initargs=(keys, engine))
+
+        try:
+            while True:
+                # Walk the table in primary-key windows so each chunk is an
+                # independent query and transaction; the API keeps serving
+                # between chunks and a crash loses at most one chunk of work.
+                rows = [
+                    (pk, stored_value(secret, text))
+                    for pk, secret, text in PasswordEntry.objects.filter(pk__gt=state['last_pk'])
+                    .order_by('pk')
+                    .values_list('pk', 'encrypted_secret', 'encrypted_password')[:chunk_size]
+                ]
+                if not rows:
+                    break
+
+                if pool:
+                    step = -(-len(rows) // workers)
+                    batches = [rows[i:i + step] for i in range(0, len(rows), step)]
+                    results = [item for batch in pool.map(reencrypt, batches) for item in batch]
+                else:
+                    results = reencrypt(rows, ring, engine)
+
+                state['rotated'] += self.commit_chunk(results)
+                state['last_pk'] = rows[-1][0]
+                self.write_checkpoint(checkpoint_path, state)
+                self.stdout.write(f"Processed up to entry {state['last_pk']} ({state['rotated']} re-encrypted)")
+        finally:
+            if pool:
+                pool.shutdown()
+
+        if os.path.exists(checkpoint_path):
+            os.unlink(checkpoint_path)
+        self.stdout.write(self.style.SUCCESS(
+            f"Re-encrypted {state['rotated']} entries with key {ring.primary_id} ({engine})"
+        ))
+
+    def commit_chunk(self, results):
+        """Write re-encrypted values, retrying while API writers hold the database"""
+        if not results:
+            return 0
+        for attempt in range(COMMIT_ATTEMPTS):
+            try:
+                return self.write_chunk(results)
+            except OperationalError:
+                if attempt == COMMIT_ATTEMPTS - 1:
+                    raise
+                time.sleep(RETRY_DELAY * 2 ** attempt)
+
+    def write_chunk(self, results):
+        """Write re-encrypted values, skipping rows edited since they were read"""
+        pks = [pk for pk, _, _ in results]
+        with transaction.atomic():
+            # Write lock before the read; see lock_vault()
+            lock_vaults_of(pks)
+            current = self.current_values(pks)
+            entries = [
+                PasswordEntry(pk=pk, encrypted_secret=new, encrypted_password='')
+                for pk, old, new in results
+                if current.get(pk) == old
+            ]
+            PasswordEntry.objects.bulk_update(entries, ['encrypted_secret', 'encrypted_password'])
+        return len(entries)
+
+    def current_values(self, pks):
+        """Stored ciphertext of these entries, locked until the chunk commits"""
+        return {
+            pk: stored_value(secret, text)
+            for pk, secret, text in PasswordEntry.objects.select_for_update()
+            .filter(pk__in=pks)
+            .values_list('pk', 'encrypted_secret', 'encrypted_password')
+        }
+
+    def read_checkpoint(self, path):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def write_checkpoint(self, path, state):
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, path)
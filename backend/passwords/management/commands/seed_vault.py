@@ -0,0 +1,50 @@
+import random
+import re
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.models import User
+from passwords.seeding import seed_entries, seed_users
+
+
+class Command(BaseCommand):
+    help = 'Create users with synthetic, really encrypted vault entries for development and benchmarks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1, help='Users to create')
+        parser.add_argument('--entries', type=int, default=100, help='Vault entries per user')
+        parser.add_argument('--prefix', default='seed', help='Users are named <prefix><n>@example.com')
+        parser.add_argument('--password', default='seed-pass-123', help='Login password of every seeded user')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed; the same seed gives the same vaults')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Entries encrypted and inserted at once')
+
+    def handle(self, *args, **options):
+        if options['users'] < 1 or options['entries'] < 0 or options['batch_size'] < 1:
+            raise CommandError('--users and --batch-size must be positive and --entries not negative')
+
+        prefix = options['prefix']
+        start = self.next_number(prefix)
+        rng = random.Random(options['seed'])
+
+        began = time.perf_counter()
+        users = seed_users(options['users'], prefix, options['password'], start)
+        for user in users:
+            seed_entries(user, options['entries'], rng, options['batch_size'])
+            self.stdout.write(f'{user.email}: {options["entries"]} entries')
+
+        elapsed = time.perf_counter() - began
+        total = len(users) * options['entries']
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {len(users)} users with {total} entries in {elapsed:.1f} s '
+            f'({total / elapsed if elapsed else 0:.0f} entries/s)'
+        ))
+
+    def next_number(self, prefix):
+        """Number after the highest one seeded with this prefix, whatever was deleted since"""
+        pattern = re.compile(rf'{re.escape(prefix)}(\d+)@example\.com')
+        emails = User.objects.filter(email__startswith=prefix, email__endswith='@example.com').values_list(
+            'email', flat=True
+        )
+        numbers = [int(match.group(1)) for match in map(pattern.fullmatch, emails) if match]
+        return max(numbers, default=-1) + 1
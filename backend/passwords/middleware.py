@@ -0,0 +1,95 @@
+"""
+Response compression for the vault API.
+
+Vault listings are repetitive JSON (field names, URLs, notes) and shrink
+several times over. Responses under the configured paths are compressed
+with brotli when the client accepts it and the optional ``brotli`` package
+is installed, otherwise with gzip. Small bodies are sent as they are, since
+compressing them costs more time than the bytes it saves.
+
+Configure with ``settings.PASSWORDS_COMPRESSION``::
+
+    PASSWORDS_COMPRESSION = {
+        'PATHS': ['/api/passwords/', '/api/async/passwords/'],
+        'MIN_SIZE': 1024,
+        'GZIP_LEVEL': 6,
+        'BROTLI_QUALITY': 4,
+    }
+"""
+import gzip
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+DEFAULTS = {
+    'PATHS': ['/api/passwords/', '/api/async/passwords/'],
+    'MIN_SIZE': 1024,
+    'GZIP_LEVEL': 6,
+    'BROTLI_QUALITY': 4,
+}
+
+
+def accepted_encodings(header):
+    """Content codings named in an Accept-Encoding header, minus any with q=0"""
+    encodings = set()
+    for item in header.split(','):
+        coding, _, params = item.strip().partition(';')
+        q = params.strip()
+        if q.startswith('q=') and q[2:].strip() in ('0', '0.0', '0.00', '0.000'):
+            continue
+        if coding:
+            encodings.add(coding.strip().lower())
+    return encodings
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    # MiddlewareMixin makes this usable from both WSGI and ASGI handlers, so
+    # async views are not forced back onto a thread
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.config = {**DEFAULTS, **getattr(settings, 'PASSWORDS_COMPRESSION', {})}
+
+    def choose_encoding(self, request):
+        encodings = accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if brotli is not None and 'br' in encodings:
+            return 'br'
+        if 'gzip' in encodings or '*' in encodings:
+            return 'gzip'
+        return None
+
+    def process_response(self, request, response):
+        if not request.path.startswith(tuple(self.config['PATHS'])):
+            return response
+        # Streams (exports) have their own compress option
+        if response.streaming or response.has_header('Content-Encoding'):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if len(response.content) < self.config['MIN_SIZE']:
+            return response
+
+        encoding = self.choose_encoding(request)
+        if encoding == 'br':
+            content = brotli.compress(response.content, quality=self.config['BROTLI_QUALITY'])
+        elif encoding == 'gzip':
+            content = gzip.compress(response.content, self.config['GZIP_LEVEL'], mtime=0)
+        else:
+            return response
+        if len(content) >= len(response.content):
+            return response
+
+        response.content = content
+        response['Content-Length'] = str(len(content))
+        response['Content-Encoding'] = encoding
+        # The bytes differ from the uncompressed representation, so a strong
+        # validator becomes weak (as Django's GZipMiddleware does)
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-17 19:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('passwords', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='passwordentry',
+            name='encrypted_secret',
+            field=models.BinaryField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='passwordentry',
+            name='encrypted_password',
+            field=models.TextField(blank=True, default=''),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-17 19:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('passwords', '0003_convert_ciphertext_to_binary'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='passwordentry',
+            options={'ordering': ['site_name', 'id']},
+        ),
+        migrations.AddIndex(
+            model_name='passwordentry',
+            index=models.Index(fields=['user', 'site_name', 'id'], name='passwords_user_site_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='passwordentry',
+            index=models.Index(fields=['user', 'updated_at'], name='passwords_user_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,97 @@
+from django.db import migrations
+
+# SQLite: an FTS5 table over the searchable metadata, kept in step with
+# passwords_passwordentry by triggers so bulk_create(), bulk_update() and
+# queryset deletes are covered too. The owner column holds "u<user id>" so a
+# search only touches the requesting user's postings. See passwords/search.py.
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE passwords_search USING fts5(
+        owner, site_name, username, site_url,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER passwords_search_insert AFTER INSERT ON passwords_passwordentry BEGIN
+        INSERT INTO passwords_search (rowid, owner, site_name, username, site_url)
+        VALUES (new.id, 'u' || new.user_id, new.site_name, new.username, coalesce(new.site_url, ''));
+    END
+    """,
+    """
+    CREATE TRIGGER passwords_search_update
+    AFTER UPDATE OF user_id, site_name, username, site_url ON passwords_passwordentry BEGIN
+        UPDATE passwords_search
+        SET owner = 'u' || new.user_id, site_name = new.site_name,
+            username = new.username, site_url = coalesce(new.site_url, '')
+        WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER passwords_search_delete AFTER DELETE ON passwords_passwordentry BEGIN
+        DELETE FROM passwords_search WHERE rowid = old.id;
+    END
+    """,
+    """
+    INSERT INTO passwords_search (rowid, owner, site_name, username, site_url)
+    SELECT id, 'u' || user_id, site_name, username, coalesce(site_url, '')
+    FROM passwords_passwordentry
+    """,
+]
+
+SQLITE_BACKWARD = [
+    'DROP TRIGGER IF EXISTS passwords_search_insert',
+    'DROP TRIGGER IF EXISTS passwords_search_update',
+    'DROP TRIGGER IF EXISTS passwords_search_delete',
+    'DROP TABLE IF EXISTS passwords_search',
+]
+
+# PostgreSQL: trigram indexes, which serve the ILIKE '%term%' fallback query
+POSTGRES_FORWARD = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+] + [
+    f'CREATE INDEX IF NOT EXISTS passwords_{column}_trgm_idx '
+    f'ON passwords_passwordentry USING gin ({column} gin_trgm_ops)'
+    for column in ('site_name', 'username', 'site_url')
+]
+
+POSTGRES_BACKWARD = [
+    f'DROP INDEX IF EXISTS passwords_{column}_trgm_idx'
+    for column in ('site_name', 'username', 'site_url')
+]
+
+
+def sqlite_has_fts5(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        return bool(cursor.fetchone()[0])
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite' and sqlite_has_fts5(connection):
+        statements = SQLITE_FORWARD
+    elif connection.vendor == 'postgresql':
+        statements = POSTGRES_FORWARD
+    else:
+        return
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    statements = {'sqlite': SQLITE_BACKWARD, 'postgresql': POSTGRES_BACKWARD}.get(vendor, [])
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('passwords', '0005_change_log'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
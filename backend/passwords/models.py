@@ -1,18 +1,67 @@
 from django.db import models
 from django.conf import settings
+from .crypto import stored_value
 
 class PasswordEntry(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     site_name = models.CharField(max_length=255)
     site_url = models.URLField(blank=True, null=True)
     username = models.CharField(max_length=255)
-    encrypted_password = models.TextField()
+    # Legacy text ciphertext; new rows use encrypted_secret (see crypto.py)
+    encrypted_password = models.TextField(blank=True, default='')
+    encrypted_secret = models.BinaryField(null=True)
     notes = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
-        ordering = ['site_name']
+        ordering = ['site_name', 'id']
+        indexes = [
+            # Keyset pagination (see pagination.py) for both list orderings
+            models.Index(fields=['user', 'site_name', 'id'], name='passwords_user_site_idx'),
+            models.Index(fields=['user', 'updated_at'], name='passwords_user_updated_idx'),
+        ]
+
+    @property
+    def ciphertext(self):
+        """Stored ciphertext in whichever format this row has"""
+        return stored_value(self.encrypted_secret, self.encrypted_password)
+
+    def __str__(self):
+        return f"{self.site_name} - {self.username}"
+
+class VaultState(models.Model):
+    """Per-user counter that orders every change to a vault"""
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True)
+    sequence = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user_id} @ {self.sequence}"
+
+
+class PasswordChange(models.Model):
+    """One insert, update or delete of a PasswordEntry, numbered per user"""
+    CREATED = 'created'
+    UPDATED = 'updated'
+    DELETED = 'deleted'
+    ACTION_CHOICES = [
+        (CREATED, 'Created'),
+        (UPDATED, 'Updated'),
+        (DELETED, 'Deleted'),
+    ]
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    sequence = models.BigIntegerField()
+    # Plain id rather than a foreign key so tombstones outlive the entry
+    entry_id = models.BigIntegerField()
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['user', 'sequence']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'sequence'], name='passwords_change_user_seq_uniq'),
+        ]
 
     def __str__(self):
-        return f"{self.site_name} - {self.username}"
\ No newline at end of file
+        return f"{self.user_id} #{self.sequence} {self.action} {self.entry_id}"
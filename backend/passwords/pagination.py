@@ -0,0 +1,88 @@
+"""
+Keyset (cursor) pagination for vault listings.
+
+A page is selected with a ``WHERE (sort key, id) > (last sort key, last id)``
+condition instead of OFFSET, so every page costs one index range scan no
+matter how deep it is, and rows inserted or deleted between requests never
+shift other rows onto the wrong page. Cursors are opaque to clients: they are
+urlsafe base64 JSON holding the sort key and id of the last row served.
+"""
+import base64
+import binascii
+import json
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+# ordering parameter -> (field, descending)
+ORDERINGS = {
+    'site_name': ('site_name', False),
+    '-updated_at': ('updated_at', True),
+}
+DEFAULT_ORDERING = 'site_name'
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def encode_cursor(ordering, value, pk):
+    if hasattr(value, 'isoformat'):
+        value = value.isoformat()
+    payload = json.dumps([ordering, value, pk], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return (ordering, value, pk) from a cursor string"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        ordering, value, pk = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError, binascii.Error):
+        raise InvalidCursor('Invalid cursor') from None
+    if ordering not in ORDERINGS or not isinstance(pk, int):
+        raise InvalidCursor('Invalid cursor')
+    if ORDERINGS[ordering][0] == 'updated_at':
+        value = parse_datetime(value) if isinstance(value, str) else None
+        if value is None:
+            raise InvalidCursor('Invalid cursor')
+    return ordering, value, pk
+
+
+def paginate(queryset, ordering=DEFAULT_ORDERING, cursor=None, page_size=100, serialize=list):
+    """
+    Return (entries, next cursor or None) for one page of ``queryset``.
+
+    A cursor carries its own ordering, which wins over ``ordering``.
+    ``serialize`` turns the sliced queryset into the returned entries, either
+    model instances or dicts holding ``id`` and the ordering field.
+    """
+    if cursor:
+        ordering, value, pk = decode_cursor(cursor)
+    elif ordering not in ORDERINGS:
+        raise InvalidCursor(f'Unsupported ordering {ordering!r}')
+
+    field, descending = ORDERINGS[ordering]
+    if descending:
+        queryset = queryset.order_by(f'-{field}', '-id')
+    else:
+        queryset = queryset.order_by(field, 'id')
+
+    if cursor:
+        # (field, id) > (value, pk), written with a plain range condition on
+        # the leading column so the database can seek into the index rather
+        # than scan it for the OR
+        after = 'lt' if descending else 'gt'
+        queryset = queryset.filter(**{f'{field}__{after}e': value}).filter(
+            Q(**{f'{field}__{after}': value}) | Q(**{f'id__{after}': pk})
+        )
+
+    # One extra row tells us whether there is a next page
+    entries = serialize(queryset[:page_size + 1])
+    if len(entries) <= page_size:
+        return entries, None
+    entries = entries[:page_size]
+    last = entries[-1]
+    if isinstance(last, dict):
+        return entries, encode_cursor(ordering, last[field], last['id'])
+    return entries, encode_cursor(ordering, getattr(last, field), last.pk)
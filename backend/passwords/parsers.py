@@ -0,0 +1,72 @@
+import json
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser, JSONParser
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+class FastJSONParser(JSONParser):
+    """JSONParser that decodes with orjson when it is installed"""
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if orjson is None:
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as e:
+            raise ParseError(f'JSON parse error - {e}')
+
+
+class MessagePackParser(BaseParser):
+    """application/msgpack request bodies (needs the optional msgpack package)"""
+    media_type = 'application/msgpack'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return msgpack.unpackb(stream.read(), raw=False, strict_map_key=False)
+        except ValueError as e:
+            raise ParseError(f'MessagePack parse error - {e}')
+
+
+class NDJSONParser(BaseParser):
+    """
+    Newline-delimited JSON: one object per line, parsed into a list.
+
+    The stream is read line by line, so an oversized upload is rejected as
+    soon as it passes the bulk item limit instead of after buffering it all.
+    """
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+        max_items = getattr(settings, 'PASSWORDS_BULK', {}).get('MAX_ITEMS', 5000)
+
+        items = []
+        for line_number, line in enumerate(stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            if len(items) >= max_items:
+                raise ParseError(f'At most {max_items} entries can be sent at once')
+            try:
+                items.append(json.loads(line.decode(encoding)))
+            except ValueError as e:
+                raise ParseError(f'Line {line_number}: {e}')
+        return items
+
+
+# Bulk endpoint bodies: the default parsers' JSON and, when installed,
+# MessagePack, plus NDJSON
+BULK_PARSERS = [FastJSONParser, NDJSONParser]
+if msgpack is not None:
+    BULK_PARSERS.insert(1, MessagePackParser)
@@ -0,0 +1,83 @@
+"""
+Renderers for the vault API.
+
+``FastJSONRenderer`` is the project-wide JSON renderer (see REST_FRAMEWORK in
+settings): it encodes with orjson when that is installed and otherwise is
+DRF's JSONRenderer unchanged. ``MessagePackRenderer`` is added next to it
+when the optional msgpack package is installed.
+
+The export renderers only name a format for content negotiation
+(``?format=csv`` or an Accept header); the export view streams the rows
+itself, so the only data that reaches ``render()`` is an error body.
+"""
+import json
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+from password_manager.timing import timed
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Datetimes and other non-native types go through DRF's encoder, so output
+# is identical with and without orjson
+ORJSON_OPTIONS = (orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME) if orjson else 0
+
+
+class FastJSONRenderer(JSONRenderer):
+    @timed('serialize')
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+        ret = orjson.dumps(data, default=JSONEncoder().default, option=ORJSON_OPTIONS)
+        # Like JSONRenderer, escape the two line terminators JavaScript rejects
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+class MessagePackRenderer(BaseRenderer):
+    """application/msgpack, for clients that ask for it in Accept"""
+
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    @timed('serialize')
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=JSONEncoder().default)
+
+
+class ExportRenderer(BaseRenderer):
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return json.dumps(data).encode()
+
+
+class CSVExportRenderer(ExportRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+class JSONExportRenderer(ExportRenderer):
+    media_type = 'application/json'
+    format = 'json'
+
+
+class NDJSONExportRenderer(ExportRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
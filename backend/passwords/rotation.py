@@ -0,0 +1,35 @@
+"""
+Re-encryption of vault entries onto the primary key.
+
+The functions here run inside ``rotate_vault_keys`` worker processes, so they
+only depend on key material passed in by the parent, never on settings.
+"""
+from .ciphers import ENGINES
+from .crypto import decrypt_password, encrypt_password, parse_header
+from .keyring import KeyRing
+
+_ring = None
+_engine = None
+
+
+def init_worker(keys, engine):
+    """Process pool initializer: build the key ring once per worker"""
+    global _ring, _engine
+    _ring = KeyRing(keys)
+    _engine = engine
+
+
+def reencrypt(rows, ring=None, engine=None):
+    """
+    Re-encrypt (pk, stored value) pairs that are not already under the
+    primary key and engine. Returns (pk, old value, new value) triples.
+    """
+    ring = ring or _ring
+    engine = engine or _engine
+    target = (ENGINES[engine].format_id, ring.primary_id)
+    results = []
+    for pk, value in rows:
+        if not isinstance(value, str) and parse_header(value) == target:
+            continue
+        results.append((pk, value, encrypt_password(decrypt_password(value, ring), ring, engine)))
+    return results
@@ -0,0 +1,79 @@
+"""
+Server-side search over vault metadata.
+
+On SQLite the lookup goes through the ``passwords_search`` FTS5 table
+(created in migration 0006 and kept current by triggers): every word of the
+query is matched as a prefix against site name, username and URL, and hits
+are ranked with bm25, weighting the site name highest. Every match is
+scored, so each page is a slice of one ranking, ties broken by id. Other
+databases fall back to a case-insensitive substring match ordered by site
+name, which the trigram indexes from the same migration make fast on
+PostgreSQL.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+from .models import PasswordEntry
+from .serializers import entry_rows
+
+# bm25 weights for the owner, site_name, username and site_url columns
+RANK_WEIGHTS = (0.0, 10.0, 5.0, 2.0)
+
+TERM_RE = re.compile(r'\w+')
+
+_fts_available = None
+
+
+def search_terms(query):
+    """Lower-cased words of a search query; punctuation is ignored"""
+    return TERM_RE.findall(query.lower())
+
+
+def match_expression(user_id, terms):
+    """FTS5 query requiring every term as a prefix within the user's rows"""
+    words = ' AND '.join(f'"{term}"*' for term in terms)
+    return f'owner:"u{user_id}" AND {{site_name username site_url}}:({words})'
+
+
+def fts_available():
+    global _fts_available
+    if _fts_available is None:
+        _fts_available = connection.vendor == 'sqlite' and 'passwords_search' in connection.introspection.table_names()
+    return _fts_available
+
+
+def search_ids(user_id, terms, limit, offset=0):
+    """Ids of the user's entries matching every term, best match first"""
+    if fts_available():
+        weights = ', '.join(str(weight) for weight in RANK_WEIGHTS)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM passwords_search WHERE passwords_search MATCH %s'
+                f' ORDER BY bm25(passwords_search, {weights}), rowid LIMIT %s OFFSET %s',
+                [match_expression(user_id, terms), limit, offset],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    queryset = PasswordEntry.objects.filter(user_id=user_id)
+    for term in terms:
+        queryset = queryset.filter(
+            Q(site_name__icontains=term) | Q(username__icontains=term) | Q(site_url__icontains=term)
+        )
+    return list(queryset.order_by('site_name', 'id').values_list('id', flat=True)[offset:offset + limit])
+
+
+def search(user_id, query, limit, offset=0):
+    """
+    Return (rows, has_more) for one page of search results, serialized
+    without the secret columns.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return [], False
+    ids = search_ids(user_id, terms, limit + 1, offset)
+    has_more = len(ids) > limit
+    ids = ids[:limit]
+    by_id = {row['id']: row for row in entry_rows(PasswordEntry.objects.filter(user_id=user_id, id__in=ids))}
+    return [by_id[pk] for pk in ids if pk in by_id], has_more
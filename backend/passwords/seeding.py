@@ -0,0 +1,117 @@
+"""
+Synthetic vaults for development and benchmarks (``manage.py seed_vault``).
+
+Entries look like a real vault: well-known sites mixed with a long tail of
+generated ones, a few accounts per site, passwords of varied length and
+alphabet, and occasional notes. Secrets go through ``encrypt_many`` so the
+stored ciphertext, and the cost of decrypting it, match real data. A fixed
+seed reproduces the same vaults.
+"""
+import string
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+
+from accounts.models import User
+
+from .changes import lock_vault, record_changes
+from .crypto import encrypt_many
+from .models import PasswordChange, PasswordEntry
+
+SITES = [
+    ('GitHub', 'https://github.com/login'),
+    ('GitLab', 'https://gitlab.com/users/sign_in'),
+    ('Google', 'https://accounts.google.com/'),
+    ('Microsoft', 'https://login.live.com/'),
+    ('Amazon', 'https://www.amazon.com/ap/signin'),
+    ('Apple ID', 'https://appleid.apple.com/'),
+    ('Netflix', 'https://www.netflix.com/login'),
+    ('Spotify', 'https://accounts.spotify.com/login'),
+    ('Dropbox', 'https://www.dropbox.com/login'),
+    ('Slack', 'https://slack.com/signin'),
+    ('LinkedIn', 'https://www.linkedin.com/login'),
+    ('Reddit', 'https://www.reddit.com/login'),
+    ('PayPal', 'https://www.paypal.com/signin'),
+    ('Stripe', 'https://dashboard.stripe.com/login'),
+    ('AWS Console', 'https://signin.aws.amazon.com/'),
+    ('DigitalOcean', 'https://cloud.digitalocean.com/login'),
+    ('Atlassian', 'https://id.atlassian.com/login'),
+    ('Figma', 'https://www.figma.com/login'),
+    ('Notion', 'https://www.notion.so/login'),
+    ('Zoom', 'https://zoom.us/signin'),
+]
+
+WORDS = [
+    'acme', 'blue', 'cloud', 'data', 'echo', 'forge', 'grid', 'harbor', 'iron', 'jade',
+    'kite', 'lumen', 'metro', 'nova', 'orbit', 'pixel', 'quartz', 'river', 'solar', 'tide',
+]
+TLDS = ['com', 'net', 'org', 'io', 'dev', 'co.uk']
+NOTES = [
+    'Recovery codes are in the safe',
+    'Shared with the family account',
+    '2FA via authenticator app',
+    'Security question: first pet',
+    'Work account, rotate every 90 days',
+]
+SYMBOLS = '!@#$%^&*-_=+?'
+
+# Share of entries on the well-known sites; the rest are generated
+POPULAR_SHARE = 0.3
+
+
+def random_password(rng):
+    length = rng.choice([8, 10, 12, 16, 20, 24, 32])
+    alphabet = string.ascii_letters + string.digits
+    if rng.random() < 0.7:
+        alphabet += SYMBOLS
+    return ''.join(rng.choice(alphabet) for _ in range(length))
+
+
+def fake_fields(rng, index, owner):
+    """Plain fields of one entry, with its password under 'password'"""
+    if rng.random() < POPULAR_SHARE:
+        site_name, site_url = rng.choice(SITES)
+    else:
+        domain = f'{rng.choice(WORDS)}{rng.choice(WORDS)}{index}.{rng.choice(TLDS)}'
+        site_name = domain.split('.')[0].capitalize()
+        site_url = f'https://{domain}/login' if rng.random() < 0.9 else ''
+    return {
+        'site_name': site_name,
+        'site_url': site_url,
+        'username': rng.choice([owner.email, owner.username, f'{owner.username}+{index}@example.com']),
+        'password': random_password(rng),
+        'notes': rng.choice(NOTES) if rng.random() < 0.2 else '',
+    }
+
+
+def seed_entries(user, count, rng, batch_size=1000):
+    """Add ``count`` encrypted entries to a user's vault, recording them in the change log"""
+    created = 0
+    while created < count:
+        batch = [fake_fields(rng, created + i, user) for i in range(min(batch_size, count - created))]
+        secrets = encrypt_many(fields.pop('password') for fields in batch)
+        entries = [
+            PasswordEntry(user=user, encrypted_secret=secret, **fields)
+            for fields, secret in zip(batch, secrets)
+        ]
+        with transaction.atomic():
+            lock_vault(user.id)
+            PasswordEntry.objects.bulk_create(entries)
+            record_changes(user.id, PasswordChange.CREATED, [entry.id for entry in entries])
+        created += len(entries)
+    return created
+
+
+def seed_users(count, prefix, password, start=0):
+    """
+    Create ``count`` users named ``<prefix><n>@example.com``. They all share
+    one password hash, so seeding does not hash once per user.
+    """
+    encoded = make_password(password)
+    users = [
+        User(email=f'{prefix}{n}@example.com', username=f'{prefix}{n}', password=encoded)
+        for n in range(start, start + count)
+    ]
+    User.objects.bulk_create(users)
+    # bulk_create only sets primary keys on some backends
+    return list(User.objects.filter(email__in=[user.email for user in users]).order_by('id'))
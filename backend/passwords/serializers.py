@@ -1,8 +1,62 @@
+from django.utils import timezone
 from rest_framework import serializers
+from password_manager.timing import phase, timed
+from .crypto import stored_value
 from .models import PasswordEntry
 
 class PasswordEntrySerializer(serializers.ModelSerializer):
     class Meta:
         model = PasswordEntry
         fields = ['id', 'site_name', 'site_url', 'username', 'notes', 'created_at', 'updated_at']
-        read_only_fields = ['id', 'created_at', 'updated_at']
\ No newline at end of file
+        read_only_fields = ['id', 'created_at', 'updated_at']
+
+    def to_representation(self, instance):
+        with phase('serialize'):
+            return super().to_representation(instance)
+
+# Read-only fast path for listings: the same output as PasswordEntrySerializer,
+# built from values_list() tuples instead of a model instance and a
+# serializer per row.
+ROW_FIELDS = PasswordEntrySerializer.Meta.fields
+SECRET_COLUMNS = ('encrypted_secret', 'encrypted_password')
+
+def format_datetime(value, tz):
+    """Format like DRF's DateTimeField: ISO 8601 in tz, with 'Z' for UTC"""
+    value = value.astimezone(tz).isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+def entry_columns(with_secret=False):
+    """values_list() columns read by entry_rows()"""
+    return ROW_FIELDS + list(SECRET_COLUMNS) if with_secret else ROW_FIELDS
+
+@timed('serialize')
+def rows_from_tuples(tuples, with_secret=False):
+    """Build entry_rows() output from already fetched entry_columns() tuples"""
+    tz = timezone.get_current_timezone()
+    rows = []
+    for pk, site_name, site_url, username, notes, created_at, updated_at, *secret in tuples:
+        row = {
+            'id': pk,
+            'site_name': site_name,
+            'site_url': site_url,
+            'username': username,
+            'notes': notes,
+            'created_at': format_datetime(created_at, tz),
+            'updated_at': format_datetime(updated_at, tz),
+        }
+        if with_secret:
+            row['ciphertext'] = stored_value(*secret)
+        rows.append(row)
+    return rows
+
+def entry_rows(queryset, with_secret=False):
+    """
+    Serialize a PasswordEntry queryset into a list of dicts in one pass.
+
+    With ``with_secret`` each dict also carries the stored ciphertext under
+    ``'ciphertext'``, for the caller to decrypt and remove.
+    """
+    # Fetch first, so the query is timed as db rather than serialize work
+    return rows_from_tuples(list(queryset.values_list(*entry_columns(with_secret))), with_secret)
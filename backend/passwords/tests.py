@@ -1,3 +1,1374 @@
-from django.test import TestCase
+import base64
+import csv
+import gzip
+import importlib
+import json
+import os
+import random
+import shutil
+import socket
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timezone as dt_timezone
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from cryptography.exceptions import InvalidTag
+from cryptography.fernet import Fernet
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.db.backends.sqlite3.base import DatabaseWrapper as SQLiteDatabaseWrapper
+from django.test import AsyncClient, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils.translation import gettext_lazy
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from accounts.models import User
+
+from password_manager import metrics, timing
+
+from benchmarks.utils import percentile, regressions
+
+from . import ciphers, crypto, keyring, middleware, parsers, renderers, views
+from .executor import DecryptionExecutor
+from .management.commands import rotate_vault_keys
+from .pagination import encode_cursor, paginate
+from .crypto import decrypt_password, encrypt_password, key_id_of
+from .models import PasswordChange, PasswordEntry
+from .seeding import seed_entries, seed_users
+from .serializers import PasswordEntrySerializer, entry_rows
+
+# Requests in tests skip the per-request timing log line
+NO_TIMING_LOG = {'HEADER': False, 'LOG': False}
+
+
+class TempKeyFileMixin:
+    def setUp(self):
+        super().setUp()
+        self.tmpdir = tempfile.mkdtemp()
+        self.key_path = os.path.join(self.tmpdir, 'encryption_key.key')
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.addCleanup(keyring.load_keyring)
+
+    def keyring_settings(self, provider='passwords.keyring.FileKeyProvider', **options):
+        if provider.endswith('FileKeyProvider'):
+            options.setdefault('path', self.key_path)
+        return override_settings(PASSWORD_KEYRING={'PROVIDER': provider, 'OPTIONS': options})
+
+
+class KeyRingTestCase(TempKeyFileMixin, SimpleTestCase):
+
+    def test_file_provider_creates_key_once(self):
+        with self.keyring_settings():
+            first = keyring.load_keyring()
+            with open(self.key_path, 'rb') as f:
+                stored = f.read()
+            second = keyring.load_keyring()
+
+        self.assertEqual(decrypt_password(encrypt_password('x', second), first), 'x')
+        self.assertEqual(keyring.parse_keys(stored)[0][0], 0)
+
+    def test_file_provider_treats_empty_file_as_missing(self):
+        open(self.key_path, 'wb').close()
+        with self.keyring_settings():
+            keyring.load_keyring()
+        self.assertGreater(os.path.getsize(self.key_path), 0)
+
+    def test_concurrent_creation_agrees_on_one_key(self):
+        provider = keyring.FileKeyProvider(path=self.key_path)
+        barrier = threading.Barrier(8)
+        keys = []
+
+        def load():
+            barrier.wait()
+            keys.append(tuple(provider.load()))
+
+        threads = [threading.Thread(target=load) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(set(keys)), 1)
+        self.assertFalse(os.path.exists(f'{self.key_path}.lock'))
+
+    def test_environment_provider(self):
+        key = Fernet.generate_key()
+        provider = 'passwords.keyring.EnvironmentKeyProvider'
+        with mock.patch.dict(os.environ, {'VAULT_KEY': key.decode()}):
+            with self.keyring_settings(provider, variable='VAULT_KEY'):
+                ring = keyring.load_keyring()
+        blob = encrypt_password('secret', ring, engine='fernet')
+        self.assertEqual(Fernet(key).decrypt(base64.urlsafe_b64encode(blob[2:])), b'secret')
+
+        with mock.patch.dict(os.environ, {}, clear=True):
+            with self.keyring_settings(provider, variable='VAULT_KEY'):
+                with self.assertRaises(ImproperlyConfigured):
+                    keyring.load_keyring()
+
+    def test_socket_provider(self):
+        key = Fernet.generate_key()
+        server = socket.create_server(('127.0.0.1', 0))
+        self.addCleanup(server.close)
+
+        def serve():
+            conn, _ = server.accept()
+            with conn:
+                if conn.recv(64) == b'GET vault\n':
+                    conn.sendall(b'3:' + key + b'\n')
+
+        threading.Thread(target=serve, daemon=True).start()
+        provider = keyring.SocketKeyProvider(port=server.getsockname()[1])
+        self.assertEqual(provider.load(), [(3, key)])
+
+    def test_reload_request_swaps_key(self):
+        with self.keyring_settings():
+            old = keyring.load_keyring()
+            token = encrypt_password('hunter2')
+
+            os.unlink(self.key_path)
+            keyring.request_reload()
+            new = keyring.get_keyring()
+
+        self.assertIsNot(old, new)
+        self.assertEqual(decrypt_password(token, old), 'hunter2')
+
+    def test_legacy_unstamped_values_still_decrypt(self):
+        with self.keyring_settings():
+            ring = keyring.load_keyring()
+            legacy = base64.b64encode(ring.fernet.encrypt(b'hunter2')).decode()
+            self.assertIsNone(key_id_of(legacy))
+            self.assertEqual(decrypt_password(legacy), 'hunter2')
+
+    def test_added_key_becomes_primary(self):
+        with self.keyring_settings():
+            keyring.load_keyring()
+            old_token = encrypt_password('hunter2')
+            provider = keyring.get_provider()
+            self.assertEqual(provider.add_key(), 1)
+
+            # Not reloaded yet: decrypting a value under the new key reloads
+            new_token = encrypt_password('hunter3', keyring.KeyRing(provider.load()))
+            self.assertEqual(decrypt_password(new_token), 'hunter3')
+            self.assertEqual(key_id_of(encrypt_password('x')), 1)
+            self.assertEqual(decrypt_password(old_token), 'hunter2')
+
+    @mock.patch.dict(keyring._missing_keys, clear=True)
+    def test_missing_key_reload_is_rate_limited(self):
+        with self.keyring_settings():
+            keyring.load_keyring()
+            orphan = encrypt_password('hunter2', keyring.KeyRing([(7, Fernet.generate_key())]))
+            with mock.patch.object(keyring, 'load_keyring', wraps=keyring.load_keyring) as load:
+                with self.assertLogs('passwords.keyring', 'WARNING'):
+                    for _ in range(3):
+                        with self.assertRaises(keyring.UnknownKeyError):
+                            decrypt_password(orphan)
+                self.assertEqual(load.call_count, 1)
+
+                later = time.monotonic() + keyring.DEFAULT_MISSING_KEY_RETRY
+                with mock.patch('time.monotonic', return_value=later):
+                    with self.assertLogs('passwords.keyring', 'WARNING'):
+                        with self.assertRaises(keyring.UnknownKeyError):
+                            decrypt_password(orphan)
+                self.assertEqual(load.call_count, 2)
+
+    def test_encrypt_decrypt_do_not_touch_key_file(self):
+        with self.keyring_settings():
+            keyring.load_keyring()
+            with mock.patch('builtins.open', side_effect=AssertionError('file read')):
+                token = encrypt_password('hunter2')
+                self.assertEqual(decrypt_password(token), 'hunter2')
+
+
+class RotateVaultKeysTestCase(TempKeyFileMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.checkpoint = os.path.join(self.tmpdir, 'rotate.json')
+        self.settings_override = self.keyring_settings()
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        keyring.load_keyring()
+
+        self.user = User.objects.create_user(email='rotate@example.com', username='rotate', password='x')
+        ring = keyring.get_keyring()
+        legacy = base64.b64encode(ring.fernet.encrypt(b'legacy-secret')).decode()
+        self.entries = [
+            PasswordEntry.objects.create(user=self.user, site_name='site 0', username='me', encrypted_password=legacy)
+        ] + [
+            PasswordEntry.objects.create(
+                user=self.user, site_name=f'site {i}', username='me', encrypted_secret=encrypt_password(f'secret {i}'),
+            )
+            for i in range(1, 5)
+        ]
+
+    def rotate(self, **options):
+        options.setdefault('workers', 1)
+        call_command('rotate_vault_keys', chunk_size=2, checkpoint=self.checkpoint,
+                     stdout=open(os.devnull, 'w'), **options)
+
+    def stored(self):
+        return [entry.ciphertext for entry in PasswordEntry.objects.order_by('pk')]
+
+    def test_rotation_moves_every_entry_to_new_key(self):
+        self.rotate(generate_key=True)
+
+        values = self.stored()
+        self.assertEqual({key_id_of(value) for value in values}, {1})
+        self.assertTrue(all(isinstance(value, bytes) for value in values))
+        self.assertEqual(decrypt_password(values[0]), 'legacy-secret')
+        self.assertEqual(decrypt_password(values[4]), 'secret 4')
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+    def test_rotation_resumes_from_checkpoint(self):
+        keyring.get_provider().add_key()
+        with open(self.checkpoint, 'w') as f:
+            json.dump({'primary_id': 1, 'engine': 'aes-256-gcm', 'last_pk': self.entries[2].pk, 'rotated': 3}, f)
+
+        self.rotate()
+
+        self.assertEqual([key_id_of(value) for value in self.stored()], [None, 0, 0, 1, 1])
+
+    def test_rotation_in_process_pool(self):
+        self.rotate(generate_key=True, workers=2)
+        self.assertEqual({key_id_of(value) for value in self.stored()}, {1})
+
+
+@override_settings(SERVER_TIMING=NO_TIMING_LOG)
+class RotationConcurrencyTestCase(TempKeyFileMixin, TransactionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.settings_override = self.keyring_settings()
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        keyring.load_keyring()
+
+        self.user = User.objects.create_user(email='rotate@example.com', username='rotate', password='x')
+        self.entries = [
+            PasswordEntry.objects.create(
+                user=self.user, site_name=f'site {i}', username='me', encrypted_secret=encrypt_password(f'secret {i}'),
+            )
+            for i in range(2)
+        ]
+        keyring.get_provider().add_key()
+
+    def rotate(self):
+        call_command('rotate_vault_keys', chunk_size=10, workers=1, restart=True,
+                     checkpoint=os.path.join(self.tmpdir, 'rotate.json'), stdout=open(os.devnull, 'w'))
+
+    def test_api_edit_committed_during_a_chunk(self):
+        edited = self.entries[0]
+        statuses = []
+
+        def edit():
+            client = APIClient()
+            client.force_authenticate(self.user)
+            try:
+                response = client.put(f'/api/passwords/{edited.pk}/', {'password': 'edited'}, format='json')
+                statuses.append(response.status_code)
+            finally:
+                connection.close()
+
+        read = rotate_vault_keys.Command.current_values
+        threads = []
+
+        def current_values(command, pks):
+            values = read(command, pks)
+            # An API write from another connection between the read and the
+            # write; it queues behind the chunk rather than failing it
+            thread = threading.Thread(target=edit)
+            thread.start()
+            thread.join(0.5)
+            threads.append(thread)
+            return values
+
+        with mock.patch.object(rotate_vault_keys.Command, 'current_values', current_values):
+            self.rotate()
+        threads[0].join()
+
+        self.assertEqual(statuses, [200])
+        edited.refresh_from_db()
+        self.assertEqual(decrypt_password(edited.ciphertext), 'edited')
+        other = PasswordEntry.objects.get(pk=self.entries[1].pk)
+        self.assertEqual(key_id_of(other.ciphertext), 1)
+        self.assertEqual(decrypt_password(other.ciphertext), 'secret 1')
+
+    def test_locked_chunk_is_retried(self):
+        write = rotate_vault_keys.Command.write_chunk
+        attempts = []
+
+        def write_chunk(command, results):
+            attempts.append(results)
+            if len(attempts) == 1:
+                raise OperationalError('database is locked')
+            return write(command, results)
+
+        with mock.patch.object(rotate_vault_keys.Command, 'write_chunk', write_chunk):
+            with mock.patch.object(rotate_vault_keys.time, 'sleep') as sleep:
+                self.rotate()
+
+        self.assertEqual(len(attempts), 2)
+        sleep.assert_called_once_with(rotate_vault_keys.RETRY_DELAY)
+        self.assertEqual({key_id_of(entry.ciphertext) for entry in PasswordEntry.objects.all()}, {1})
+
+
+class CiphertextFormatTestCase(TempKeyFileMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        with self.keyring_settings():
+            self.ring = keyring.load_keyring()
+        self.migration = importlib.import_module('passwords.migrations.0003_convert_ciphertext_to_binary')
+
+    def legacy_text(self, password, key_id=None):
+        token = base64.b64encode(self.ring.fernet.encrypt(password.encode())).decode()
+        return token if key_id is None else f'{key_id}:{token}'
+
+    def test_binary_blob_is_smaller_than_text(self):
+        blob = encrypt_password('correct horse battery staple', self.ring, engine='fernet')
+        self.assertEqual(blob[0], crypto.FORMAT_FERNET)
+        self.assertEqual(blob[1], self.ring.primary_id)
+        self.assertLess(len(blob), len(self.legacy_text('correct horse battery staple', 0)) * 0.6)
+
+    def test_readers_accept_every_format(self):
+        for value in (
+            encrypt_password('hunter2', self.ring, engine='fernet'),
+            memoryview(encrypt_password('hunter2', self.ring, engine='fernet')),
+            self.legacy_text('hunter2'),
+            self.legacy_text('hunter2', 0),
+        ):
+            self.assertEqual(decrypt_password(value, self.ring), 'hunter2')
+
+    def test_migration_conversion_round_trips(self):
+        for key_id in (None, 0):
+            text = self.legacy_text('hunter2', key_id)
+            blob = self.migration.text_to_blob(text)
+            self.assertEqual(key_id_of(blob), key_id)
+            self.assertEqual(decrypt_password(blob, self.ring), 'hunter2')
+            self.assertEqual(self.migration.blob_to_text(blob), text)
+
+
+class CiphertextMigrationTestCase(TempKeyFileMixin, TestCase):
+    def test_malformed_rows_are_skipped_and_logged(self):
+        with self.keyring_settings():
+            ring = keyring.load_keyring()
+        migration = importlib.import_module('passwords.migrations.0003_convert_ciphertext_to_binary')
+        user = User.objects.create_user(email='legacy@example.com', username='legacy', password='x')
+        values = [
+            base64.b64encode(ring.fernet.encrypt(b'hunter2')).decode(),
+            'not base64!',
+            '0:also not base64!',
+            'x:' + base64.b64encode(ring.fernet.encrypt(b'hunter2')).decode(),
+        ]
+        entries = [
+            PasswordEntry.objects.create(user=user, site_name='Legacy', username='me', encrypted_password=value)
+            for value in values
+        ]
+
+        with self.assertLogs(migration.logger, 'WARNING') as logs:
+            migration.convert_to_binary(django_apps, None)
+
+        stored = [PasswordEntry.objects.get(pk=entry.pk) for entry in entries]
+        self.assertEqual(decrypt_password(stored[0].ciphertext, ring), 'hunter2')
+        self.assertIsNone(stored[1].encrypted_secret)
+        self.assertEqual([entry.encrypted_password for entry in stored[1:]], values[1:])
+        self.assertEqual(len(logs.records), 3)
+        self.assertIn(str(entries[1].pk), logs.output[0])
+
+
+class CipherEngineTestCase(TempKeyFileMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        with self.keyring_settings():
+            self.ring = keyring.load_keyring()
+
+    def test_every_engine_round_trips(self):
+        for name, engine in ciphers.ENGINES.items():
+            blob = encrypt_password('hunter2', self.ring, engine=name)
+            self.assertEqual(crypto.format_of(blob), engine.format_id)
+            self.assertEqual(decrypt_password(blob, self.ring), 'hunter2')
+
+    def test_default_engine_comes_from_settings(self):
+        with override_settings(PASSWORD_CIPHER='chacha20-poly1305'):
+            blob = encrypt_password('hunter2', self.ring)
+        self.assertEqual(crypto.format_of(blob), ciphers.ChaCha20Poly1305Cipher.format_id)
+
+    def test_tampered_blob_is_rejected(self):
+        blob = bytearray(encrypt_password('hunter2', self.ring, engine='aes-256-gcm'))
+        blob[-1] ^= 1
+        with self.assertRaises(InvalidTag):
+            decrypt_password(bytes(blob), self.ring)
+
+
+@override_settings(SERVER_TIMING=NO_TIMING_LOG)
+class PasswordViewTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='owner@example.com', username='owner', password='x')
+        self.other = User.objects.create_user(email='other@example.com', username='other', password='x')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_entry(self, user=None, site_name='GitHub', password='hunter2', username='me', **fields):
+        return PasswordEntry.objects.create(
+            user=user or self.user, site_name=site_name, username=username,
+            encrypted_secret=encrypt_password(password), **fields
+        )
+
+
+class MetadataListRevealTestCase(PasswordViewTestCase):
+    def test_metadata_list_does_not_decrypt(self):
+        self.create_entry()
+        with mock.patch('passwords.views.decrypt_many', side_effect=AssertionError('decrypted')):
+            response = self.client.get('/api/passwords/?mode=metadata')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[0]['site_name'], 'GitHub')
+        self.assertNotIn('decrypted_password', response.data[0])
+
+    def test_full_list_still_decrypts(self):
+        self.create_entry()
+        response = self.client.get('/api/passwords/')
+        self.assertEqual(response.data[0]['decrypted_password'], 'hunter2')
+
+    def test_reveal_returns_requested_entries_in_one_query(self):
+        first = self.create_entry(site_name='A', password='one')
+        second = self.create_entry(site_name='B', password='two')
+        foreign = self.create_entry(user=self.other, password='not yours')
+
+        with self.assertNumQueries(1):
+            response = self.client.post(
+                '/api/passwords/reveal/', {'ids': [second.id, first.id, foreign.id, 999]}, format='json'
+            )
+
+        self.assertEqual(response.data['passwords'], [
+            {'id': second.id, 'decrypted_password': 'two'},
+            {'id': first.id, 'decrypted_password': 'one'},
+        ])
+        self.assertEqual(response.data['not_found'], [foreign.id, 999])
+
+    def test_corrupt_entry_does_not_fail_the_list(self):
+        self.create_entry(site_name='A')
+        broken = self.create_entry(site_name='B')
+        PasswordEntry.objects.filter(pk=broken.pk).update(encrypted_secret=b'\x02\x00' + b'garbage' * 8)
+
+        with self.assertLogs('passwords.executor', 'WARNING'):
+            response = self.client.get('/api/passwords/')
+
+        self.assertEqual(response.data[0]['decrypted_password'], 'hunter2')
+        self.assertIsNone(response.data[1]['decrypted_password'])
+        self.assertEqual(response.data[1]['decrypt_error'], 'InvalidTag')
+
+    def test_reveal_validates_ids(self):
+        response = self.client.post('/api/passwords/reveal/', {'ids': 'all'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.post('/api/passwords/reveal/', [1, 2], format='json')
+        self.assertEqual(response.status_code, 400)
+
+        ids = list(range(views.MAX_REVEAL_IDS + 1))
+        response = self.client.post('/api/passwords/reveal/', {'ids': ids}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class DecryptionExecutorTestCase(SimpleTestCase):
+    def setUp(self):
+        ring = keyring.get_keyring()
+        self.values = [encrypt_password(f'secret {i}', ring) for i in range(20)]
+        self.values[7] = b'\x02\x00' + b'garbage' * 8
+        self.values[11] = b'\x02\xfenot a key'
+
+    def check_results(self, executor):
+        with self.assertLogs('passwords.executor', 'WARNING'):
+            results = executor.decrypt(self.values)
+        self.assertEqual(len(results), 20)
+        self.assertEqual(results[0].password, 'secret 0')
+        self.assertEqual(results[19].password, 'secret 19')
+        self.assertEqual(results[7], (None, 'InvalidTag'))
+        self.assertEqual(results[11], (None, 'unknown_key'))
+        self.assertEqual(sum(1 for result in results if result.error), 2)
+
+    def test_thread_pool_preserves_order_and_isolates_failures(self):
+        executor = DecryptionExecutor('thread', workers=4, batch_size=3, min_parallel=0)
+        self.addCleanup(executor.shutdown)
+        self.check_results(executor)
+
+    def test_process_pool(self):
+        executor = DecryptionExecutor('process', workers=2, batch_size=6, min_parallel=0)
+        self.addCleanup(executor.shutdown)
+        self.check_results(executor)
+
+    def test_small_inputs_are_decrypted_inline(self):
+        executor = DecryptionExecutor('thread', workers=4)
+        self.check_results(executor)
+        self.assertIsNone(executor._pool)
+
+
+class PaginationTestCase(PasswordViewTestCase):
+    def setUp(self):
+        super().setUp()
+        self.entries = [self.create_entry(site_name=name) for name in 'DBADCAB']
+
+    def fetch_all(self, page_size, ordering='site_name', between_pages=None):
+        seen, cursor = [], None
+        while True:
+            params = {'page_size': page_size, 'mode': 'metadata', 'ordering': ordering}
+            if cursor:
+                params['cursor'] = cursor
+            response = self.client.get('/api/passwords/', params)
+            self.assertEqual(response.status_code, 200)
+            seen += [row['id'] for row in response.data['results']]
+            cursor = response.data['next']
+            if not cursor:
+                return seen
+            if between_pages:
+                between_pages()
+
+    def test_pages_follow_site_name_then_id(self):
+        expected = [entry.id for entry in sorted(self.entries, key=lambda e: (e.site_name, e.id))]
+        self.assertEqual(self.fetch_all(page_size=3), expected)
+
+    def test_inserts_between_pages_do_not_shift_results(self):
+        before = {entry.id for entry in self.entries}
+        seen = self.fetch_all(page_size=2, between_pages=lambda: self.create_entry(site_name='A'))
+
+        self.assertEqual(len(seen), len(set(seen)))
+        self.assertLessEqual(before, set(seen))
+
+    def test_updated_at_ordering(self):
+        expected = [entry.id for entry in sorted(self.entries, key=lambda e: (e.updated_at, e.id), reverse=True)]
+        self.assertEqual(self.fetch_all(page_size=4, ordering='-updated_at'), expected)
+
+    def test_full_mode_pages_include_secrets(self):
+        response = self.client.get('/api/passwords/', {'page_size': 2})
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertEqual(response.data['results'][0]['decrypted_password'], 'hunter2')
+
+    def test_invalid_cursor_and_page_size(self):
+        self.assertEqual(self.client.get('/api/passwords/', {'cursor': 'nonsense'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/passwords/', {'page_size': 'ten'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/passwords/', {'page_size': 2, 'ordering': 'notes'}).status_code, 400)
+
+    def test_deep_page_uses_composite_index(self):
+        last = sorted(self.entries, key=lambda e: (e.site_name, e.id))[-2]
+        cursor = encode_cursor('site_name', last.site_name, last.id)
+        with CaptureQueriesContext(connection) as queries:
+            entries, next_cursor = paginate(PasswordEntry.objects.filter(user=self.user), cursor=cursor)
+        self.assertEqual(len(entries), 1)
+        self.assertIsNone(next_cursor)
+
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as db_cursor:
+                db_cursor.execute(f"EXPLAIN QUERY PLAN {queries[0]['sql']}")
+                plan = ' '.join(str(row) for row in db_cursor.fetchall())
+            self.assertIn('passwords_user_site_idx', plan)
+
+
+class ChangeLogTestCase(PasswordViewTestCase):
+    def changes(self, since, **params):
+        response = self.client.get('/api/passwords/changes/', {'since': since, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_writes_are_numbered_per_user(self):
+        created = self.client.post('/api/passwords/', {
+            'site_name': 'GitHub', 'username': 'me', 'password': 'hunter2'
+        }, format='json').data['password']
+        self.client.put(f"/api/passwords/{created['id']}/", {'notes': 'work'}, format='json')
+        other = APIClient()
+        other.force_authenticate(self.other)
+        other.post('/api/passwords/', {'site_name': 'X', 'username': 'x', 'password': 'x'}, format='json')
+        self.client.delete(f"/api/passwords/{created['id']}/")
+
+        self.assertEqual(
+            list(PasswordChange.objects.filter(user=self.user).values_list('sequence', 'action')),
+            [(1, 'created'), (2, 'updated'), (3, 'deleted')],
+        )
+        self.assertEqual(self.changes(0), {
+            'sequence': 3, 'has_more': False, 'changes': [{'id': created['id'], 'action': 'deleted'}],
+        })
+
+    def test_changes_since_returns_current_metadata(self):
+        entry = self.client.post('/api/passwords/', {
+            'site_name': 'GitHub', 'username': 'me', 'password': 'hunter2'
+        }, format='json').data['password']
+        sequence = self.client.get('/api/passwords/', {'page_size': 10}).data['sequence']
+        self.client.put(f"/api/passwords/{entry['id']}/", {'site_name': 'GitLab'}, format='json')
+
+        data = self.changes(sequence)
+        self.assertEqual(data['sequence'], sequence + 1)
+        self.assertEqual(data['changes'][0]['action'], 'updated')
+        self.assertEqual(data['changes'][0]['password']['site_name'], 'GitLab')
+        self.assertNotIn('decrypted_password', data['changes'][0]['password'])
+        self.assertEqual(self.changes(data['sequence'])['changes'], [])
+
+    def test_changes_are_batched(self):
+        for i in range(5):
+            self.client.post('/api/passwords/', {'site_name': f'S{i}', 'username': 'me', 'password': 'x'}, format='json')
+
+        first = self.changes(0, page_size=3)
+        self.assertEqual((first['sequence'], first['has_more'], len(first['changes'])), (3, True, 3))
+        rest = self.changes(first['sequence'], page_size=3)
+        self.assertEqual((rest['sequence'], rest['has_more'], len(rest['changes'])), (5, False, 2))
+
+    def test_since_is_required(self):
+        response = self.client.get('/api/passwords/changes/')
+        self.assertEqual(response.status_code, 400)
+
+
+class ConditionalGetTestCase(PasswordViewTestCase):
+    def test_unchanged_vault_answers_304_without_reading_entries(self):
+        self.client.post('/api/passwords/', {'site_name': 'A', 'username': 'me', 'password': 'x'}, format='json')
+        response = self.client.get('/api/passwords/')
+        etag = response['ETag']
+
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/passwords/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_writes_and_query_change_the_etag(self):
+        etag = self.client.get('/api/passwords/')['ETag']
+        self.assertNotEqual(self.client.get('/api/passwords/?mode=metadata')['ETag'], etag)
+
+        self.client.post('/api/passwords/', {'site_name': 'A', 'username': 'me', 'password': 'x'}, format='json')
+        response = self.client.get('/api/passwords/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 1)
+
+    def test_etag_is_per_user(self):
+        etag = self.client.get('/api/passwords/')['ETag']
+        other = APIClient()
+        other.force_authenticate(self.other)
+        self.assertEqual(other.get('/api/passwords/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class BulkCreateTestCase(PasswordViewTestCase):
+    def test_valid_items_are_created_in_one_insert(self):
+        items = [{'site_name': f'Site {i}', 'username': 'me', 'password': f'secret {i}'} for i in range(3)]
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/passwords/bulk/', items, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 3)
+        inserts = [q for q in queries if q['sql'].startswith('INSERT INTO "passwords_passwordentry"')]
+        self.assertEqual(len(inserts), 1)
+        entry = PasswordEntry.objects.get(pk=response.data['results'][2]['id'])
+        self.assertEqual(decrypt_password(entry.ciphertext), 'secret 2')
+        self.assertEqual(PasswordChange.objects.filter(user=self.user, action='created').count(), 3)
+
+    def test_invalid_items_are_reported_per_index(self):
+        items = [
+            {'site_name': 'Good', 'username': 'me', 'password': 'x'},
+            {'site_name': 'No password', 'username': 'me'},
+            'not an object',
+            {'site_name': 'S' * 256, 'username': 'me', 'password': 'x'},
+        ]
+        response = self.client.post('/api/passwords/bulk/', items, format='json')
+
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual([r['status'] for r in response.data['results']], ['created', 'error', 'error', 'error'])
+        self.assertEqual(PasswordEntry.objects.filter(user=self.user).count(), 1)
+
+    def test_ndjson_body(self):
+        body = '{"site_name": "A", "username": "me", "password": "x"}\n\n{"site_name": "B", "username": "me", "password": "y"}\n'
+        response = self.client.post('/api/passwords/bulk/', body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 2)
+
+    @skipUnless(parsers.msgpack, 'msgpack is not installed')
+    def test_msgpack_body(self):
+        body = parsers.msgpack.packb([{'site_name': 'A', 'username': 'me', 'password': 'x'}])
+        response = self.client.post('/api/passwords/bulk/', body, content_type='application/msgpack')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 1)
+
+    @override_settings(PASSWORDS_BULK={'MAX_ITEMS': 2})
+    def test_batch_size_limit(self):
+        items = [{'site_name': 'A', 'username': 'me', 'password': 'x'}] * 3
+        self.assertEqual(self.client.post('/api/passwords/bulk/', items, format='json').status_code, 400)
+
+        body = '\n'.join(['{"site_name": "A", "username": "me", "password": "x"}'] * 3)
+        response = self.client.post('/api/passwords/bulk/', body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(PasswordEntry.objects.exists())
+
+
+class BulkUpdateDeleteTestCase(PasswordViewTestCase):
+    def test_patch_applies_per_id_changes(self):
+        first = self.create_entry(site_name='First')
+        second = self.create_entry(site_name='Second')
+        before = PasswordEntry.objects.get(pk=second.pk).updated_at
+
+        response = self.client.patch('/api/passwords/bulk/', [
+            {'id': first.id, 'password': 'rotated'},
+            {'id': second.id, 'notes': 'moved to SSO'},
+        ], format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'], {first.id: {'status': 'updated'}, second.id: {'status': 'updated'}})
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(decrypt_password(first.ciphertext), 'rotated')
+        self.assertEqual(first.site_name, 'First')
+        self.assertEqual(decrypt_password(second.ciphertext), 'hunter2')
+        self.assertEqual(second.notes, 'moved to SSO')
+        self.assertGreater(second.updated_at, before)
+        self.assertEqual(PasswordChange.objects.filter(user=self.user, action='updated').count(), 2)
+
+    def test_patch_reports_partial_failures(self):
+        mine = self.create_entry()
+        theirs = self.create_entry(user=self.other)
+
+        response = self.client.patch('/api/passwords/bulk/', [
+            {'id': mine.id, 'site_name': 'Renamed'},
+            {'id': theirs.id, 'site_name': 'Stolen'},
+            {'id': 999999, 'username': ''},
+        ], format='json')
+
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual(response.data['updated'], 1)
+        self.assertEqual(response.data['results'][theirs.id], {'status': 'not_found'})
+        self.assertEqual(response.data['results'][999999]['status'], 'error')
+        theirs.refresh_from_db()
+        self.assertEqual(theirs.site_name, 'GitHub')
+
+    def test_patch_requires_unique_ids(self):
+        entry = self.create_entry()
+        response = self.client.patch('/api/passwords/bulk/', [
+            {'id': entry.id, 'notes': 'a'},
+            {'id': entry.id, 'notes': 'b'},
+        ], format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_delete_is_one_query_and_reports_missing_ids(self):
+        entries = [self.create_entry(site_name=f'Site {i}') for i in range(3)]
+        theirs = self.create_entry(user=self.other)
+        ids = [entry.id for entry in entries] + [theirs.id]
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.delete('/api/passwords/bulk/', {'ids': ids}, format='json')
+
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual(response.data['deleted'], 3)
+        self.assertEqual(response.data['results'][theirs.id], {'status': 'not_found'})
+        deletes = [q for q in queries if q['sql'].startswith('DELETE FROM "passwords_passwordentry"')]
+        self.assertEqual(len(deletes), 1)
+        self.assertEqual(list(PasswordEntry.objects.values_list('id', flat=True)), [theirs.id])
+        self.assertEqual(PasswordChange.objects.filter(user=self.user, action='deleted').count(), 3)
+
+    def test_writes_lock_the_vault_before_reading(self):
+        entry = self.create_entry()
+        for method, body in (('patch', [{'id': entry.id, 'notes': 'x'}]), ('delete', {'ids': [entry.id]})):
+            with CaptureQueriesContext(connection) as queries:
+                getattr(self.client, method)('/api/passwords/bulk/', body, format='json')
+            statements = [q['sql'] for q in queries if not q['sql'].startswith(('SAVEPOINT', 'RELEASE'))]
+            self.assertTrue(statements[0].startswith('UPDATE "passwords_vaultstate"'), statements[0])
+
+    def test_lost_lock_race_is_retryable(self):
+        entry = self.create_entry()
+        with mock.patch.object(PasswordEntry.objects, 'bulk_update', side_effect=OperationalError('database is locked')):
+            response = self.client.patch('/api/passwords/bulk/', [{'id': entry.id, 'notes': 'x'}], format='json')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '1')
+
+
+class ExportTestCase(PasswordViewTestCase):
+    def export(self, query=''):
+        response = self.client.get(f'/api/passwords/export/{query}')
+        self.assertEqual(response.status_code, 200)
+        return response, b''.join(response.streaming_content)
+
+    def test_csv_is_the_default(self):
+        self.create_entry(site_name='GitHub', password='hunter2')
+        self.create_entry(user=self.other, site_name='Elsewhere')
+
+        response, body = self.export()
+
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        rows = list(csv.DictReader(body.decode().splitlines()))
+        self.assertEqual([(row['site_name'], row['password']) for row in rows], [('GitHub', 'hunter2')])
+
+    def test_json_and_ndjson(self):
+        self.create_entry(site_name='A', password='one')
+        self.create_entry(site_name='B', password='two')
+
+        _, body = self.export('?format=json')
+        self.assertEqual([row['password'] for row in json.loads(body)], ['one', 'two'])
+
+        response, body = self.export('?format=ndjson')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        self.assertEqual([json.loads(line)['site_name'] for line in body.splitlines()], ['A', 'B'])
+
+    def test_gzip_archive(self):
+        self.create_entry(site_name='A', password='one')
+
+        response, body = self.export('?format=ndjson&compress=gzip')
+
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertIn('vault-export.ndjson.gz', response['Content-Disposition'])
+        self.assertEqual(json.loads(gzip.decompress(body))['password'], 'one')
+
+    def test_unreadable_rows_are_flagged(self):
+        broken = self.create_entry(site_name='Broken')
+        PasswordEntry.objects.filter(pk=broken.pk).update(encrypted_secret=b'\x02\x00' + b'garbage' * 8)
+
+        with self.assertLogs('passwords.executor', 'WARNING'):
+            _, body = self.export('?format=json')
+
+        self.assertEqual(json.loads(body)[0]['decrypt_error'], 'InvalidTag')
+
+    @override_settings(PASSWORDS_EXPORT={'CHUNK_SIZE': 100})
+    def test_memory_does_not_grow_with_vault_size(self):
+        def peak_while_exporting(prefix, entries):
+            user = seed_users(1, prefix, 'x')[0]
+            seed_entries(user, entries, random.Random(entries))
+            self.client.force_authenticate(user)
+            tracemalloc.start()
+            try:
+                response = self.client.get('/api/passwords/export/?format=ndjson')
+                size = sum(len(chunk) for chunk in response.streaming_content)
+                return tracemalloc.get_traced_memory()[1], size
+            finally:
+                tracemalloc.stop()
+
+        small_peak, _ = peak_while_exporting('small', 300)
+        large_peak, large_size = peak_while_exporting('large', 3000)
+
+        self.assertLess(large_peak, large_size)
+        self.assertLess(large_peak, small_peak * 2)
+
+
+class SearchTestCase(PasswordViewTestCase):
+    def search(self, query):
+        response = self.client.get(f'/api/passwords/search/{query}')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_prefix_match_on_any_field_ranked_by_site_name(self):
+        self.create_entry(site_name='Git Docs', site_url='https://docs.example.com')
+        self.create_entry(site_name='Mail', site_url='https://github.com/settings')
+        self.create_entry(site_name='GitHub')
+        self.create_entry(site_name='Bank')
+        self.create_entry(user=self.other, site_name='GitHub')
+
+        data = self.search('?q=git')
+
+        names = [row['site_name'] for row in data['results']]
+        self.assertEqual(sorted(names), ['Git Docs', 'GitHub', 'Mail'])
+        self.assertEqual(names[-1], 'Mail')
+        self.assertNotIn('decrypted_password', data['results'][0])
+
+    def test_every_term_must_match(self):
+        self.create_entry(site_name='Work Mail', username='alice')
+        self.create_entry(site_name='Home Mail', username='alice')
+
+        data = self.search('?q=ali%20work')
+
+        self.assertEqual([row['site_name'] for row in data['results']], ['Work Mail'])
+
+    def test_index_follows_updates_and_deletes(self):
+        entry = self.create_entry(site_name='Old Name')
+        gone = self.create_entry(site_name='Old Account')
+
+        self.client.put(f'/api/passwords/{entry.id}/', {'site_name': 'New Name'}, format='json')
+        self.client.delete('/api/passwords/bulk/', {'ids': [gone.id]}, format='json')
+
+        self.assertEqual(self.search('?q=old')['results'], [])
+        self.assertEqual([row['id'] for row in self.search('?q=new')['results']], [entry.id])
+
+    def test_pagination(self):
+        for i in range(5):
+            self.create_entry(site_name=f'Shop {i}')
+
+        first = self.search('?q=shop&page_size=2')
+        last = self.search('?q=shop&page_size=2&offset=4')
+
+        self.assertEqual(first['next'], 2)
+        self.assertEqual(len(last['results']), 1)
+        self.assertIsNone(last['next'])
+
+    def test_pages_slice_one_ranking(self):
+        # The weaker matches come first by id
+        for i in range(12):
+            self.create_entry(site_name=f'Site {i}', username='shopper')
+        for i in range(3):
+            self.create_entry(site_name=f'Shop {i}')
+
+        ids = []
+        offset = 0
+        while offset is not None:
+            data = self.search(f'?q=shop&page_size=4&offset={offset}')
+            ids += [row['id'] for row in data['results']]
+            offset = data['next']
+
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertEqual(len(ids), 15)
+        top = PasswordEntry.objects.filter(site_name__startswith='Shop').values_list('id', flat=True)
+        self.assertEqual(set(ids[:3]), set(top))
+
+    def test_query_is_required(self):
+        self.assertEqual(self.client.get('/api/passwords/search/?q=%20').status_code, 400)
+        self.assertEqual(self.client.get('/api/passwords/search/?q=a&offset=-1').status_code, 400)
+
+    def test_punctuation_is_not_fts_syntax(self):
+        self.create_entry(site_name='Example', username='me@example.com')
+        self.assertEqual(len(self.search('?q=%22me%40example%20OR%20*')['results']), 0)
+        self.assertEqual(len(self.search('?q=me%40example')['results']), 1)
+
+
+class FastSerializationTestCase(PasswordViewTestCase):
+    def test_rows_match_model_serializer(self):
+        self.create_entry(site_name='GitHub', site_url='https://github.com', notes='2FA on')
+        self.create_entry(site_name='Bank', site_url=None)
+        entries = PasswordEntry.objects.filter(user=self.user)
+
+        expected = PasswordEntrySerializer(entries, many=True).data
+        self.assertEqual(entry_rows(entries), [dict(row) for row in expected])
+        with override_settings(TIME_ZONE='Asia/Manila'):
+            expected = PasswordEntrySerializer(entries, many=True).data
+            self.assertEqual(entry_rows(entries), [dict(row) for row in expected])
+
+    def test_rows_can_carry_ciphertext(self):
+        entry = self.create_entry()
+        row, = entry_rows(PasswordEntry.objects.filter(pk=entry.pk), with_secret=True)
+        self.assertEqual(decrypt_password(row['ciphertext']), 'hunter2')
+
+    def test_updated_at_cursor_from_rows(self):
+        for i in range(3):
+            self.create_entry(site_name=f'Site {i}')
+
+        first = self.client.get('/api/passwords/?mode=metadata&ordering=-updated_at&page_size=2').data
+        second = self.client.get(f'/api/passwords/?mode=metadata&cursor={first["next"]}').data
+
+        ids = [row['id'] for row in first['results'] + second['results']]
+        self.assertEqual(len(set(ids)), 3)
+
+    def test_fast_renderer_matches_json_renderer(self):
+        data = {
+            'when': datetime(2026, 1, 2, 3, 4, 5, 678901, tzinfo=dt_timezone.utc),
+            'lazy': gettext_lazy('Password not found'),
+            'results': {7: {'status': 'updated'}},
+            'text': 'caf\u00e9 \u2028 line',
+        }
+        self.assertEqual(renderers.FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_fast_parser_reports_bad_json(self):
+        response = self.client.post('/api/passwords/bulk/', '[{"site_name": ', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('JSON parse error', response.data['detail'])
+
+
+class CompressionTestCase(PasswordViewTestCase):
+    def setUp(self):
+        super().setUp()
+        for i in range(40):
+            self.create_entry(site_name=f'Site {i}', notes='Recovery codes are in the safe')
+
+    def test_large_vault_responses_are_gzipped(self):
+        response = self.client.get('/api/passwords/?mode=metadata', HTTP_ACCEPT_ENCODING='gzip, deflate')
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertTrue(response['ETag'].startswith('W/"'))
+        self.assertEqual(len(json.loads(gzip.decompress(response.content))), 40)
+
+    def test_small_or_unaccepted_responses_are_left_alone(self):
+        small = self.client.get('/api/passwords/changes/?since=39', HTTP_ACCEPT_ENCODING='gzip')
+        refused = self.client.get('/api/passwords/?mode=metadata', HTTP_ACCEPT_ENCODING='gzip;q=0, identity')
+
+        self.assertFalse(small.has_header('Content-Encoding'))
+        self.assertFalse(refused.has_header('Content-Encoding'))
+        self.assertEqual(len(refused.json()), 40)
+
+    def test_weak_etag_still_revalidates(self):
+        first = self.client.get('/api/passwords/?mode=metadata', HTTP_ACCEPT_ENCODING='gzip')
+        second = self.client.get(
+            '/api/passwords/?mode=metadata', HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=first['ETag']
+        )
+        self.assertEqual(second.status_code, 304)
+
+    @skipUnless(middleware.brotli, 'brotli is not installed')
+    def test_brotli_is_preferred(self):
+        response = self.client.get('/api/passwords/?mode=metadata', HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(len(json.loads(middleware.brotli.decompress(response.content))), 40)
+
+    @skipUnless(renderers.msgpack, 'msgpack is not installed')
+    def test_msgpack_is_negotiated(self):
+        response = self.client.get('/api/passwords/?mode=metadata', HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        self.assertEqual(len(renderers.msgpack.unpackb(response.content)), 40)
+
+    def test_accepted_encodings(self):
+        self.assertEqual(middleware.accepted_encodings('gzip;q=1.0, br;q=0, *'), {'gzip', '*'})
+
+
+class DatabaseTuningTestCase(SimpleTestCase):
+    def test_new_sqlite_connections_get_pragmas(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        wrapper = SQLiteDatabaseWrapper({**connection.settings_dict, 'NAME': os.path.join(directory, 'tuned.sqlite3')})
+        self.addCleanup(wrapper.close)
+
+        with wrapper.cursor() as cursor:
+            pragmas = {}
+            for name in ('journal_mode', 'synchronous', 'busy_timeout', 'cache_size'):
+                cursor.execute(f'PRAGMA {name}')
+                pragmas[name] = cursor.fetchone()[0]
+
+        self.assertEqual(pragmas, {'journal_mode': 'wal', 'synchronous': 1, 'busy_timeout': 5000, 'cache_size': -64000})
+
+    def test_connections_are_persistent_and_health_checked(self):
+        self.assertGreater(settings.DATABASES['default']['CONN_MAX_AGE'], 0)
+        self.assertTrue(settings.DATABASES['default']['CONN_HEALTH_CHECKS'])
+
+
+class AsyncViewTestCase(PasswordViewTestCase):
+    def setUp(self):
+        super().setUp()
+        self.async_client = AsyncClient()
+        # AsyncClient in Django 4.2 ignores constructor headers, so they go on each request
+        self.auth = {'Authorization': f'Bearer {RefreshToken.for_user(self.user).access_token}'}
+
+    async def test_list_matches_sync_view(self):
+        await sync_to_async(self.create_entry)(site_name='GitHub', password='hunter2')
+
+        response = await self.async_client.get('/api/async/passwords/', headers=self.auth)
+        expected = await sync_to_async(self.client.get)('/api/passwords/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), expected.json())
+        self.assertEqual(response['ETag'], expected['ETag'])
+        revalidated = await self.async_client.get('/api/async/passwords/', headers={**self.auth, 'If-None-Match': response['ETag']})
+        self.assertEqual(revalidated.status_code, 304)
+
+    async def test_metadata_pages(self):
+        for i in range(3):
+            await sync_to_async(self.create_entry)(site_name=f'Site {i}')
+
+        response = await self.async_client.get('/api/async/passwords/?mode=metadata&page_size=2', headers=self.auth)
+
+        data = response.json()
+        self.assertEqual([row['site_name'] for row in data['results']], ['Site 0', 'Site 1'])
+        self.assertNotIn('decrypted_password', data['results'][0])
+        self.assertIsNotNone(data['next'])
+
+    async def test_create_update_delete(self):
+        response = await self.async_client.post(
+            '/api/async/passwords/', {'site_name': 'Mail', 'username': 'me', 'password': 'one'},
+            content_type='application/json', headers=self.auth
+        )
+        self.assertEqual(response.status_code, 201)
+        pk = response.json()['password']['id']
+
+        response = await self.async_client.put(
+            f'/api/async/passwords/{pk}/', {'password': 'two'}, content_type='application/json', headers=self.auth
+        )
+        self.assertEqual(response.status_code, 200)
+        response = await self.async_client.get(f'/api/async/passwords/{pk}/', headers=self.auth)
+        self.assertEqual(response.json()['decrypted_password'], 'two')
+
+        response = await self.async_client.delete(f'/api/async/passwords/{pk}/', headers=self.auth)
+        self.assertEqual(response.status_code, 204)
+        actions = [change.action async for change in PasswordChange.objects.filter(user=self.user)]
+        self.assertEqual(actions, ['created', 'updated', 'deleted'])
+
+    async def test_malformed_bodies_and_failures_match_sync_views(self):
+        entry = await sync_to_async(self.create_entry)()
+        for method, path, expected in (
+            ('post', '/api/async/passwords/', 400),
+            ('put', f'/api/async/passwords/{entry.id}/', 400),
+            ('post', '/api/async/auth/login/', 400),
+            ('post', '/api/async/auth/register/', 400),
+        ):
+            response = await getattr(self.async_client, method)(
+                path, ['not', 'an', 'object'], content_type='application/json', headers=self.auth
+            )
+            self.assertEqual((path, response.status_code), (path, expected))
+            self.assertIn('error', response.json())
+
+        with mock.patch('passwords.async_views.encrypt_password', side_effect=ValueError('bad key')):
+            response = await self.async_client.post(
+                '/api/async/passwords/', {'site_name': 'Mail', 'username': 'me', 'password': 'one'},
+                content_type='application/json', headers=self.auth
+            )
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(response.json(), {'error': 'Failed to save password'})
+
+    async def test_other_users_entries_and_bad_tokens(self):
+        theirs = await sync_to_async(self.create_entry)(user=self.other)
+
+        response = await self.async_client.get(f'/api/async/passwords/{theirs.id}/', headers=self.auth)
+        self.assertEqual(response.status_code, 404)
+        response = await self.async_client.get('/api/async/passwords/', headers={'Authorization': 'Bearer nope'})
+        self.assertEqual(response.status_code, 401)
+
+    async def test_login_and_profile(self):
+        await sync_to_async(User.objects.create_user)(email='async@example.com', username='async', password='S3cure-pass!')
+
+        response = await self.async_client.post(
+            '/api/async/auth/login/', {'email': 'async@example.com', 'password': 'S3cure-pass!'},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        token = response.json()['tokens']['access']
+        profile = await self.async_client.get('/api/async/auth/profile/', headers={'Authorization': f'Bearer {token}'})
+        self.assertEqual(profile.json()['user']['email'], 'async@example.com')
+
+        response = await self.async_client.post(
+            '/api/async/auth/login/', {'email': 'async@example.com', 'password': 'wrong'},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 401)
+
+
+@override_settings(SERVER_TIMING={'HEADER': True, 'LOG': True})
+class ServerTimingTestCase(PasswordViewTestCase):
+    def timings(self, header):
+        return {
+            name: dict(param.split('=', 1) for param in params)
+            for name, *params in (part.strip().split(';') for part in header.split(','))
+        }
+
+    def test_list_reports_each_phase(self):
+        for i in range(5):
+            self.create_entry(site_name=f'Site {i}')
+
+        with self.assertLogs('password_manager.timing', 'INFO') as logs, CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/passwords/')
+
+        timings = self.timings(response['Server-Timing'])
+        self.assertEqual(set(timings), {'db', 'crypto', 'serialize', 'total'})
+        self.assertEqual(timings['db']['desc'], f'"{len(queries)} queries"')
+        self.assertGreater(float(timings['crypto']['dur']), 0)
+        self.assertGreater(float(timings['serialize']['dur']), 0)
+
+        record = logs.records[0]
+        self.assertEqual(record.timing['queries'], len(queries))
+        self.assertEqual((record.timing['path'], record.timing['status']), ('/api/passwords/', 200))
+        self.assertIn('path=/api/passwords/ status=200', record.getMessage())
+
+    def test_phases_are_exclusive(self):
+        # RequestTimings(), serialize start, db start, db end, serialize end
+        clock = iter([0.0, 10.0, 12.0, 15.0, 16.0])
+        with mock.patch.object(timing.time, 'perf_counter', lambda: next(clock)):
+            token = timing._timings.set(timing.RequestTimings())
+            try:
+                with timing.phase('serialize'):
+                    with timing.phase('db'):
+                        pass
+                durations = timing.current().durations
+            finally:
+                timing._timings.reset(token)
+
+        self.assertEqual(durations, {'db': 3.0, 'crypto': 0.0, 'serialize': 3.0})
+        # Outside a request phases cost nothing and record nothing
+        with timing.phase('db'):
+            self.assertIsNone(timing.current())
+
+    @override_settings(SERVER_TIMING={'HEADER': False, 'LOG': False})
+    def test_header_can_be_turned_off(self):
+        self.assertFalse(self.client.get('/api/passwords/').has_header('Server-Timing'))
+
+    async def test_async_views_are_timed(self):
+        await sync_to_async(self.create_entry)()
+        auth = {'Authorization': f'Bearer {RefreshToken.for_user(self.user).access_token}'}
+
+        with self.assertLogs('password_manager.timing', 'INFO'):
+            response = await AsyncClient().get('/api/async/passwords/', headers=auth)
+
+        timings = self.timings(response['Server-Timing'])
+        self.assertNotEqual(timings['db']['desc'], '"0 queries"')
+        self.assertGreater(float(timings['crypto']['dur']), 0)
+
+
+class MetricsTestCase(PasswordViewTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def sample(self, text, line_start):
+        """Value of the exposition line starting with ``line_start``"""
+        for line in text.splitlines():
+            if line.startswith(line_start + ' '):
+                return float(line.rsplit(' ', 1)[1])
+        return 0.0
+
+    def client_for_staff(self):
+        staff = User.objects.get_or_create(
+            email='staff@example.com', defaults={'username': 'staff', 'is_staff': True},
+        )[0]
+        client = APIClient()
+        client.force_authenticate(staff)
+        return client
+
+    def test_exposition_format(self):
+        registry = metrics.Registry()
+        counter = metrics.Counter('demo_total', 'Demo counter', ['name'], registry=registry)
+        histogram = metrics.Histogram('demo_seconds', 'Demo histogram', ['op'], buckets=(0.1, 1), registry=registry)
+        counter.inc(name='a "quoted"\\name\n')
+        counter.inc(2, name='plain')
+        for value in (0.05, 0.5, 5):
+            histogram.observe(value, op='x')
+
+        self.assertEqual(metrics.exposition(registry.snapshot()), '\n'.join([
+            '# HELP demo_seconds Demo histogram',
+            '# TYPE demo_seconds histogram',
+            'demo_seconds_bucket{op="x",le="0.1"} 1',
+            'demo_seconds_bucket{op="x",le="1.0"} 2',
+            'demo_seconds_bucket{op="x",le="+Inf"} 3',
+            'demo_seconds_sum{op="x"} 5.55',
+            'demo_seconds_count{op="x"} 3',
+            '# HELP demo_total Demo counter',
+            '# TYPE demo_total counter',
+            'demo_total{name="a \\"quoted\\"\\\\name\\n"} 1',
+            'demo_total{name="plain"} 2',
+        ]) + '\n')
+
+    def test_concurrent_updates_are_not_lost(self):
+        registry = metrics.Registry()
+        counter = metrics.Counter('hits_total', 'Hits', ['worker'], registry=registry)
+        histogram = metrics.Histogram('sizes', 'Sizes', buckets=(1, 10), registry=registry)
+
+        def work():
+            for i in range(2000):
+                counter.inc(worker=i % 3)
+                histogram.observe(i % 20)
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        snapshot = registry.snapshot()
+        self.assertEqual(sum(value for _, value in snapshot['hits_total']['series']), 16000)
+        self.assertEqual(sum(snapshot['sizes']['series'][0][1]['counts']), 16000)
+
+    def test_worker_processes_are_merged(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        registry = metrics.Registry()
+        counter = metrics.Counter('jobs_total', 'Jobs', ['kind'], registry=registry)
+        histogram = metrics.Histogram('job_seconds', 'Job time', buckets=(1,), registry=registry)
+        store = metrics.SnapshotStore(registry)
+
+        with override_settings(METRICS={'DIR': directory, 'FLUSH_INTERVAL': 60}):
+            counter.inc(kind='a')
+            histogram.observe(0.5)
+            pid = os.fork()
+            if pid == 0:
+                # Child worker: its own updates on top of the forked state
+                counter.inc(2, kind='a')
+                counter.inc(kind='b')
+                store.flush(force=True)
+                os._exit(0)
+            os.waitpid(pid, 0)
+            merged = store.collect()
+
+        self.assertEqual(len(os.listdir(directory)), 2)
+        self.assertEqual(dict((key[0], value) for key, value in merged['jobs_total']['series']), {'a': 4, 'b': 1})
+        self.assertEqual(merged['job_seconds']['series'][0][1], {'counts': [2, 0], 'sum': 1.0})
+
+    def test_reused_pid_does_not_overwrite_a_dead_workers_snapshot(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        registry = metrics.Registry()
+        counter = metrics.Counter('jobs_total', 'Jobs', registry=registry)
+        counter.inc(3)
+
+        with override_settings(METRICS={'DIR': directory}), mock.patch.object(metrics.os, 'getpid', return_value=42):
+            metrics.SnapshotStore(registry).flush(force=True)
+            # A later worker that got the same pid, with its own registry
+            later = metrics.Registry()
+            metrics.Counter('jobs_total', 'Jobs', registry=later).inc()
+            merged = metrics.SnapshotStore(later).collect()
+
+        self.assertEqual(len(os.listdir(directory)), 2)
+        self.assertEqual(merged['jobs_total']['series'], [[[], 4]])
+
+    def test_endpoint_is_staff_only(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+
+    def test_endpoint_reports_requests_logins_and_crypto(self):
+        self.create_entry()
+        before = self.client_for_staff().get('/metrics').content.decode()
+        self.client.get('/api/passwords/')
+        APIClient().post('/api/auth/login/', {'email': 'owner@example.com', 'password': 'wrong'}, format='json')
+
+        response = self.client_for_staff().get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], metrics.CONTENT_TYPE)
+        text = response.content.decode()
+
+        def grew(line_start):
+            return self.sample(text, line_start) - self.sample(before, line_start)
+
+        route = 'http_requests_total{route="api/passwords/",method="GET",status="200"}'
+        self.assertEqual(grew(route), 1)
+        self.assertEqual(grew('http_request_db_queries_count{route="api/passwords/"}'), 1)
+        self.assertEqual(grew('auth_logins_total{outcome="invalid"}'), 1)
+        self.assertGreaterEqual(grew('vault_crypto_duration_seconds_count{operation="decrypt"}'), 1)
+
+
+class SeedVaultTestCase(TestCase):
+    def test_seeds_encrypted_vaults(self):
+        out = StringIO()
+        call_command('seed_vault', users=2, entries=25, batch_size=10, stdout=out)
+
+        users = User.objects.filter(email__startswith='seed').order_by('id')
+        self.assertEqual([user.email for user in users], ['seed0@example.com', 'seed1@example.com'])
+        self.assertTrue(users[0].check_password('seed-pass-123'))
+        for user in users:
+            entries = PasswordEntry.objects.filter(user=user)
+            self.assertEqual(entries.count(), 25)
+            self.assertEqual(PasswordChange.objects.filter(user=user).count(), 25)
+            for entry in entries:
+                self.assertGreaterEqual(len(decrypt_password(entry.ciphertext)), 8)
+        self.assertIn('Seeded 2 users with 50 entries', out.getvalue())
+
+        # Seeding again continues after the highest number, even with gaps
+        User.objects.filter(email='seed0@example.com').delete()
+        call_command('seed_vault', users=1, entries=0, stdout=StringIO())
+        self.assertTrue(User.objects.filter(email='seed2@example.com').exists())
+
+    def test_same_seed_same_vault(self):
+        vaults = []
+        for prefix in ('a', 'b'):
+            call_command('seed_vault', prefix=prefix, entries=20, seed=7, stdout=StringIO())
+            vaults.append(list(
+                PasswordEntry.objects.filter(user__email=f'{prefix}0@example.com')
+                .order_by('id').values_list('site_name', 'site_url', 'notes')
+            ))
+        self.assertEqual(vaults[0], vaults[1])
+
+
+class BenchmarkRegressionTestCase(SimpleTestCase):
+    def test_percentile_is_nearest_rank(self):
+        samples = list(range(1, 101))
+        self.assertEqual([percentile(samples, pct) for pct in (50, 95, 99, 100)], [50, 95, 99, 100])
+        self.assertEqual(percentile([3.0], 99), 3.0)
+
+    def test_regressions_beyond_threshold(self):
+        baseline = {
+            'list/100': {'p50_ms': 10.0, 'p95_ms': 20.0, 'peak_alloc_kib': 100.0},
+            'detail/100': {'p50_ms': 2.0, 'p95_ms': 2.5, 'peak_alloc_kib': 30.0},
+        }
+        results = {
+            'list/100': {'p50_ms': 11.0, 'p95_ms': 30.0, 'peak_alloc_kib': 150.0},
+            # +40%, but under a millisecond: jitter
+            'detail/100': {'p50_ms': 2.8, 'p95_ms': 2.5, 'peak_alloc_kib': 30.0},
+            'export/100': {'p50_ms': 99.0, 'p95_ms': 99.0, 'peak_alloc_kib': 999.0},
+        }
+        self.assertEqual(regressions(results, baseline, 0.2), [
+            'list/100 p95_ms: 20.0 -> 30.0 (+50%)',
+            'list/100 peak_alloc_kib: 100.0 -> 150.0 (+50%)',
+        ])
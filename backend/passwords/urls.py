@@ -4,4 +4,9 @@ from . import views
 urlpatterns = [
     path('', views.password_list, name='password_list'),
     path('<int:pk>/', views.password_detail, name='password_detail'),
+    path('reveal/', views.password_reveal, name='password_reveal'),
+    path('changes/', views.password_changes, name='password_changes'),
+    path('bulk/', views.password_bulk, name='password_bulk'),
+    path('export/', views.password_export, name='password_export'),
+    path('search/', views.password_search, name='password_search'),
 ]
\ No newline at end of file
@@ -1,43 +1,100 @@
+import hashlib
 from rest_framework import status
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, parser_classes, permission_classes, renderer_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from .models import PasswordEntry
-from .serializers import PasswordEntrySerializer
-from cryptography.fernet import Fernet
 from django.conf import settings
-import base64
-import os
+from django.db import OperationalError, transaction
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.http import parse_etags
+from .models import PasswordChange, PasswordEntry
+from .serializers import PasswordEntrySerializer, entry_rows
+from .crypto import encrypt_many, encrypt_password
+from .executor import decrypt_many
+from .pagination import DEFAULT_ORDERING, InvalidCursor, paginate
+from .changes import changes_since, current_sequence, lock_vault, record_changes
+from .parsers import BULK_PARSERS
+from .renderers import CSVExportRenderer, JSONExportRenderer, NDJSONExportRenderer
+from .export import stream_export
+from .search import search
 
-# Generate a key for encryption (in production, store this securely)
-def get_encryption_key():
-    """Get or create encryption key"""
-    key_file = os.path.join(settings.BASE_DIR, 'encryption_key.key')
+# Upper bound on ids accepted by a single reveal request
+MAX_REVEAL_IDS = 500
+
+ENTRY_FIELDS = ('site_name', 'site_url', 'username', 'password', 'notes')
+REQUIRED_FIELDS = ('site_name', 'username', 'password')
+
+# Column limits checked up front so one bad bulk item cannot fail the insert
+ENTRY_MAX_LENGTHS = {'site_name': 255, 'username': 255, 'site_url': 200}
+
+def get_page_size(request):
+    """Page size from the query string, bounded by settings.PASSWORDS_PAGINATION"""
+    config = getattr(settings, 'PASSWORDS_PAGINATION', {})
+    page_size = config.get('PAGE_SIZE', 100)
+    if 'page_size' in request.query_params:
+        try:
+            page_size = int(request.query_params['page_size'])
+        except ValueError:
+            raise ValueError('page_size must be a number') from None
+    if page_size < 1:
+        raise ValueError('page_size must be positive')
+    return min(page_size, config.get('MAX_PAGE_SIZE', 1000))
+
+def vault_etag(request, sequence):
+    """Strong ETag for a list response: vault version plus what shaped the body"""
+    variant = f'{sorted(request.query_params.lists())}|{request.accepted_media_type}'
+    digest = hashlib.blake2b(variant.encode(), digest_size=8).hexdigest()
+    return f'"{request.user.id}.{sequence}.{digest}"'
+
+def etag_matches(etag, if_none_match):
+    """Whether an If-None-Match header value matches etag (weak comparison)"""
+    etags = [tag.removeprefix('W/') for tag in parse_etags(if_none_match)]
+    return '*' in etags or etag in etags
+
+def get_bulk_limit():
+    """Most entries accepted by one bulk request (settings.PASSWORDS_BULK)"""
+    return getattr(settings, 'PASSWORDS_BULK', {}).get('MAX_ITEMS', 5000)
+
+def clean_bulk_entry(item, partial=False):
+    """Validate one bulk item; returns (fields, error message)"""
+    if not isinstance(item, dict):
+        return None, 'Each entry must be an object'
     
-    if os.path.exists(key_file):
-        with open(key_file, 'rb') as f:
-            key = f.read()
+    if partial:
+        fields = {field: item[field] for field in ENTRY_FIELDS if field in item}
     else:
-        key = Fernet.generate_key()
-        with open(key_file, 'wb') as f:
-            f.write(key)
-    
-    return key
-
-def encrypt_password(password):
-    """Encrypt password"""
-    key = get_encryption_key()
-    fernet = Fernet(key)
-    encrypted_password = fernet.encrypt(password.encode())
-    return base64.b64encode(encrypted_password).decode()
-
-def decrypt_password(encrypted_password):
-    """Decrypt password"""
-    key = get_encryption_key()
-    fernet = Fernet(key)
-    decoded_password = base64.b64decode(encrypted_password.encode())
-    decrypted_password = fernet.decrypt(decoded_password)
-    return decrypted_password.decode()
+        fields = {field: item.get(field) or '' for field in ENTRY_FIELDS}
+    if not all(isinstance(value, str) for value in fields.values()):
+        return None, 'Entry fields must be strings'
+    if any(field in fields and not fields[field] for field in REQUIRED_FIELDS):
+        return None, 'Site name, username, and password are required'
+    for field, max_length in ENTRY_MAX_LENGTHS.items():
+        if len(fields.get(field, '')) > max_length:
+            return None, f'{field} must be at most {max_length} characters'
+    return fields, None
+
+def bulk_items(request, key=None):
+    """The list a bulk request operates on, or an error Response"""
+    items = request.data.get(key) if key and isinstance(request.data, dict) else request.data
+    if not isinstance(items, list) or not items:
+        return None, Response({
+            'error': f'{key} must be a non-empty list' if key else 'Expected a non-empty list of entries'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    max_items = get_bulk_limit()
+    if len(items) > max_items:
+        return None, Response({
+            'error': f'At most {max_items} entries can be sent at once'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    return items, None
+
+def add_decrypted(data, result):
+    """Add a DecryptResult to a response row; failures carry an error code"""
+    data['decrypted_password'] = result.password
+    if result.error:
+        data['decrypt_error'] = result.error
+    return data
 
 @api_view(['GET', 'POST'])
 @permission_classes([IsAuthenticated])
@@ -45,29 +102,68 @@ def password_list(request):
     """List user's passwords or create new password"""
     
     if request.method == 'GET':
+        # Conditional GET: the vault version alone tells whether anything
+        # changed, so a matching validator is answered without reading the
+        # entries table. The version is read before the rows, which also
+        # makes replaying changes after it on top of the response safe.
+        sequence = current_sequence(request.user.id)
+        etag = vault_etag(request, sequence)
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH', '')
+        if if_none_match and etag_matches(etag, if_none_match):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+        
         # Get all passwords for the current user
-        passwords = PasswordEntry.objects.filter(user=request.user)
+        passwords = PasswordEntry.objects.filter(user_id=request.user.id)
         
-        # Decrypt passwords before sending
-        password_data = []
-        for password_entry in passwords:
-            data = PasswordEntrySerializer(password_entry).data
+        # Metadata only: skip loading and decrypting the secrets; clients
+        # fetch the ones they need through the reveal endpoint
+        metadata_only = request.query_params.get('mode') == 'metadata'
+        
+        def serialize(queryset):
+            return entry_rows(queryset, with_secret=not metadata_only)
+        
+        # Paginate when the client asks for pages; plain requests still get
+        # the whole vault for older clients
+        paginated = 'cursor' in request.query_params or 'page_size' in request.query_params
+        if paginated:
             try:
-                data['decrypted_password'] = decrypt_password(password_entry.encrypted_password)
-            except:
-                data['decrypted_password'] = 'Error decrypting'
-            password_data.append(data)
+                password_data, next_cursor = paginate(
+                    passwords,
+                    ordering=request.query_params.get('ordering', DEFAULT_ORDERING),
+                    cursor=request.query_params.get('cursor'),
+                    page_size=get_page_size(request),
+                    serialize=serialize,
+                )
+            except (InvalidCursor, ValueError) as e:
+                return Response({
+                    'error': str(e)
+                }, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            password_data = serialize(passwords)
+        
+        if not metadata_only:
+            # Decrypt passwords before sending
+            results = decrypt_many(data.pop('ciphertext') for data in password_data)
+            for data, result in zip(password_data, results):
+                add_decrypted(data, result)
         
-        return Response(password_data)
+        if paginated:
+            return Response({
+                'results': password_data,
+                'next': next_cursor,
+                'sequence': sequence
+            }, headers={'ETag': etag})
+        return Response(password_data, headers={'ETag': etag})
     
     elif request.method == 'POST':
         # Create new password entry
         try:
-            site_name = request.data.get('site_name')
-            site_url = request.data.get('site_url', '')
-            username = request.data.get('username')
-            password = request.data.get('password')
-            notes = request.data.get('notes', '')
+            data = request.data if isinstance(request.data, dict) else {}
+            site_name = data.get('site_name')
+            site_url = data.get('site_url', '')
+            username = data.get('username')
+            password = data.get('password')
+            notes = data.get('notes', '')
             
             if not site_name or not username or not password:
                 return Response({
@@ -75,17 +171,20 @@ def password_list(request):
                 }, status=status.HTTP_400_BAD_REQUEST)
             
             # Encrypt password
-            encrypted_password = encrypt_password(password)
+            encrypted_secret = encrypt_password(password)
             
             # Create password entry
-            password_entry = PasswordEntry.objects.create(
-                user=request.user,
-                site_name=site_name,
-                site_url=site_url,
-                username=username,
-                encrypted_password=encrypted_password,
-                notes=notes
-            )
+            with transaction.atomic():
+                lock_vault(request.user.id)
+                password_entry = PasswordEntry.objects.create(
+                    user_id=request.user.id,
+                    site_name=site_name,
+                    site_url=site_url,
+                    username=username,
+                    encrypted_secret=encrypted_secret,
+                    notes=notes
+                )
+                record_changes(request.user.id, PasswordChange.CREATED, [password_entry.id])
             
             return Response({
                 'message': 'Password saved successfully',
@@ -103,7 +202,7 @@ def password_detail(request, pk):
     """Get, update, or delete a specific password"""
     
     try:
-        password_entry = PasswordEntry.objects.get(pk=pk, user=request.user)
+        password_entry = PasswordEntry.objects.get(pk=pk, user_id=request.user.id)
     except PasswordEntry.DoesNotExist:
         return Response({
             'error': 'Password not found'
@@ -111,13 +210,15 @@ def password_detail(request, pk):
     
     if request.method == 'GET':
         data = PasswordEntrySerializer(password_entry).data
-        try:
-            data['decrypted_password'] = decrypt_password(password_entry.encrypted_password)
-        except:
-            data['decrypted_password'] = 'Error decrypting'
+        add_decrypted(data, decrypt_many([password_entry.ciphertext])[0])
         return Response(data)
     
     elif request.method == 'PUT':
+        if not isinstance(request.data, dict):
+            return Response({
+                'error': 'Expected a JSON object'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
         # Update password entry
         try:
             site_name = request.data.get('site_name', password_entry.site_name)
@@ -133,9 +234,13 @@ def password_detail(request, pk):
             
             # Only encrypt new password if provided
             if password:
-                password_entry.encrypted_password = encrypt_password(password)
+                password_entry.encrypted_secret = encrypt_password(password)
+                password_entry.encrypted_password = ''
             
-            password_entry.save()
+            with transaction.atomic():
+                lock_vault(request.user.id)
+                password_entry.save()
+                record_changes(request.user.id, PasswordChange.UPDATED, [password_entry.id])
             
             return Response({
                 'message': 'Password updated successfully',
@@ -148,7 +253,308 @@ def password_detail(request, pk):
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
     elif request.method == 'DELETE':
-        password_entry.delete()
+        with transaction.atomic():
+            lock_vault(request.user.id)
+            entry_id = password_entry.id
+            password_entry.delete()
+            record_changes(request.user.id, PasswordChange.DELETED, [entry_id])
         return Response({
             'message': 'Password deleted successfully'
-        }, status=status.HTTP_204_NO_CONTENT)
\ No newline at end of file
+        }, status=status.HTTP_204_NO_CONTENT)
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def password_reveal(request):
+    """Decrypt the passwords for a list of entry ids in one query"""
+    
+    ids = request.data.get('ids') if isinstance(request.data, dict) else None
+    if not isinstance(ids, list) or not all(isinstance(pk, int) for pk in ids):
+        return Response({
+            'error': 'ids must be a list of password ids'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    if len(ids) > MAX_REVEAL_IDS:
+        return Response({
+            'error': f'At most {MAX_REVEAL_IDS} passwords can be revealed at once'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    entries = PasswordEntry.objects.filter(user_id=request.user.id, id__in=ids).only(
+        'id', 'encrypted_password', 'encrypted_secret'
+    )
+    
+    entries = list(entries)
+    results = decrypt_many(password_entry.ciphertext for password_entry in entries)
+    revealed = {}
+    for password_entry, result in zip(entries, results):
+        revealed[password_entry.id] = add_decrypted({'id': password_entry.id}, result)
+    
+    return Response({
+        'passwords': [revealed[pk] for pk in dict.fromkeys(ids) if pk in revealed],
+        'not_found': [pk for pk in dict.fromkeys(ids) if pk not in revealed],
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def password_changes(request):
+    """List changes to the user's vault after a sequence number"""
+    
+    try:
+        since = int(request.query_params.get('since', ''))
+    except ValueError:
+        return Response({
+            'error': 'since must be a sequence number'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        limit = get_page_size(request)
+    except ValueError as e:
+        return Response({
+            'error': str(e)
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    actions, sequence, has_more = changes_since(request.user.id, since, limit)
+    
+    # Current metadata for entries that still exist; anything missing has
+    # been deleted, possibly by a change beyond this batch
+    live_ids = [entry_id for entry_id, action in actions.items() if action != PasswordChange.DELETED]
+    entries = entry_rows(PasswordEntry.objects.filter(user_id=request.user.id, id__in=live_ids))
+    entries = {data['id']: data for data in entries}
+    
+    changes = []
+    for entry_id, action in actions.items():
+        data = entries.get(entry_id)
+        if data is None:
+            changes.append({'id': entry_id, 'action': PasswordChange.DELETED})
+        else:
+            changes.append({
+                'id': entry_id,
+                'action': action,
+                'password': data
+            })
+    
+    return Response({
+        'sequence': sequence,
+        'has_more': has_more,
+        'changes': changes
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def password_search(request):
+    """Ranked prefix search over site name, username, and URL"""
+    
+    query = request.query_params.get('q', '').strip()
+    if not query:
+        return Response({
+            'error': 'q is required'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        page_size = get_page_size(request)
+    except ValueError as e:
+        return Response({
+            'error': str(e)
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        offset = int(request.query_params.get('offset', 0))
+    except ValueError:
+        offset = -1
+    if offset < 0:
+        return Response({
+            'error': 'offset must be a non-negative number'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    entries, has_more = search(request.user.id, query, page_size, offset)
+    return Response({
+        'results': entries,
+        'next': offset + page_size if has_more else None
+    })
+
+@api_view(['POST', 'PATCH', 'DELETE'])
+@permission_classes([IsAuthenticated])
+@parser_classes(BULK_PARSERS)
+def password_bulk(request):
+    """Create, update, or delete many passwords in one request and one transaction"""
+    
+    if request.method == 'POST':
+        return bulk_create_entries(request)
+    elif request.method == 'PATCH':
+        return bulk_update_entries(request)
+    elif request.method == 'DELETE':
+        return bulk_delete_entries(request)
+
+def vault_busy():
+    """Response for a bulk write that lost a lock race; the client retries it"""
+    return Response({
+        'error': 'The vault is busy, try again'
+    }, status=status.HTTP_503_SERVICE_UNAVAILABLE, headers={'Retry-After': '1'})
+
+def bulk_create_entries(request):
+    """Insert a list of new entries; results are reported per list index"""
+    
+    items, error = bulk_items(request)
+    if error:
+        return error
+    
+    # Validate everything before doing any crypto or database work
+    results = [None] * len(items)
+    valid = []
+    for index, item in enumerate(items):
+        fields, message = clean_bulk_entry(item)
+        if message:
+            results[index] = {'index': index, 'status': 'error', 'error': message}
+        else:
+            valid.append((index, fields))
+    
+    if valid:
+        secrets = encrypt_many(fields['password'] for _, fields in valid)
+        entries = [
+            PasswordEntry(
+                user_id=request.user.id,
+                site_name=fields['site_name'],
+                site_url=fields['site_url'],
+                username=fields['username'],
+                encrypted_secret=secret,
+                notes=fields['notes']
+            )
+            for (_, fields), secret in zip(valid, secrets)
+        ]
+        
+        try:
+            with transaction.atomic():
+                lock_vault(request.user.id)
+                PasswordEntry.objects.bulk_create(entries)
+                record_changes(request.user.id, PasswordChange.CREATED, [entry.id for entry in entries])
+        except OperationalError:
+            return vault_busy()
+        
+        for (index, _), entry in zip(valid, entries):
+            results[index] = {'index': index, 'status': 'created', 'id': entry.id}
+    
+    failed = len(items) - len(valid)
+    return Response({
+        'created': len(valid),
+        'failed': failed,
+        'results': results
+    }, status=status.HTTP_207_MULTI_STATUS if failed else status.HTTP_201_CREATED)
+
+def bulk_update_entries(request):
+    """Apply per-id field changes; results are reported per id"""
+    
+    items, error = bulk_items(request)
+    if error:
+        return error
+    
+    ids = [item.get('id') if isinstance(item, dict) else None for item in items]
+    if not all(isinstance(pk, int) for pk in ids) or len(set(ids)) != len(ids):
+        return Response({
+            'error': 'Every entry needs a unique password id'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    results = {}
+    changes = {}
+    for pk, item in zip(ids, items):
+        fields, message = clean_bulk_entry(item, partial=True)
+        if message:
+            results[pk] = {'status': 'error', 'error': message}
+        elif not fields:
+            results[pk] = {'status': 'error', 'error': 'No fields to update'}
+        else:
+            changes[pk] = fields
+    
+    # Only the columns some item touches are loaded and written back
+    columns = {field for fields in changes.values() for field in fields} - {'password'}
+    if any('password' in fields for fields in changes.values()):
+        columns |= {'encrypted_secret', 'encrypted_password'}
+    columns.add('updated_at')
+    
+    try:
+        with transaction.atomic():
+            lock_vault(request.user.id)
+            entries = list(
+                PasswordEntry.objects.select_for_update()
+                .filter(user_id=request.user.id, id__in=changes)
+                .only('id', *columns)
+            )
+            with_password = [entry for entry in entries if 'password' in changes[entry.id]]
+            secrets = encrypt_many(changes[entry.id]['password'] for entry in with_password)
+            for entry, secret in zip(with_password, secrets):
+                entry.encrypted_secret = secret
+                entry.encrypted_password = ''
+            
+            # bulk_update() skips auto_now, so updated_at is set by hand
+            now = timezone.now()
+            for entry in entries:
+                for field, value in changes[entry.id].items():
+                    if field != 'password':
+                        setattr(entry, field, value)
+                entry.updated_at = now
+            
+            PasswordEntry.objects.bulk_update(entries, sorted(columns))
+            record_changes(request.user.id, PasswordChange.UPDATED, [entry.id for entry in entries])
+    except OperationalError:
+        return vault_busy()
+    
+    for entry in entries:
+        results[entry.id] = {'status': 'updated'}
+    for pk in changes:
+        results.setdefault(pk, {'status': 'not_found'})
+    
+    return Response({
+        'updated': len(entries),
+        'failed': len(ids) - len(entries),
+        'results': {pk: results[pk] for pk in ids}
+    }, status=status.HTTP_207_MULTI_STATUS if len(entries) < len(ids) else status.HTTP_200_OK)
+
+def bulk_delete_entries(request):
+    """Delete a list of ids with one query; results are reported per id"""
+    
+    ids, error = bulk_items(request, 'ids')
+    if error:
+        return error
+    if not all(isinstance(pk, int) for pk in ids):
+        return Response({
+            'error': 'ids must be a list of password ids'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        with transaction.atomic():
+            lock_vault(request.user.id)
+            entries = PasswordEntry.objects.select_for_update().filter(user_id=request.user.id, id__in=ids)
+            deleted = list(entries.values_list('id', flat=True))
+            PasswordEntry.objects.filter(id__in=deleted).delete()
+            record_changes(request.user.id, PasswordChange.DELETED, deleted)
+    except OperationalError:
+        return vault_busy()
+    
+    ids = list(dict.fromkeys(ids))
+    found = set(deleted)
+    return Response({
+        'deleted': len(found),
+        'failed': len(ids) - len(found),
+        'results': {pk: {'status': 'deleted' if pk in found else 'not_found'} for pk in ids}
+    }, status=status.HTTP_207_MULTI_STATUS if len(found) < len(ids) else status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@renderer_classes([CSVExportRenderer, JSONExportRenderer, NDJSONExportRenderer])
+def password_export(request):
+    """Stream the whole vault, decrypted, as CSV, JSON, or NDJSON"""
+    
+    export_format = request.accepted_renderer.format
+    compress = request.query_params.get('compress') == 'gzip'
+    chunk_size = getattr(settings, 'PASSWORDS_EXPORT', {}).get('CHUNK_SIZE', 1000)
+    
+    entries = PasswordEntry.objects.filter(user_id=request.user.id).order_by('site_name', 'id')
+    response = StreamingHttpResponse(
+        stream_export(entries, export_format, chunk_size, compress),
+        content_type='application/gzip' if compress else f'{request.accepted_renderer.media_type}; charset=utf-8'
+    )
+    filename = f'vault-export.{export_format}' + ('.gz' if compress else '')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response['Cache-Control'] = 'no-store'
+    return response
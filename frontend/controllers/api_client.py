@@ -1,42 +1,112 @@
+import base64
 import requests
 import json
-from typing import Optional, Dict, Any
+import threading
+import time
+from collections import deque
+from urllib.parse import urlencode
+from typing import Optional, Dict, Any, List
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# MessagePack is smaller and faster to decode; ask for it when we can read it
+ACCEPT = 'application/msgpack, application/json;q=0.9' if msgpack else 'application/json'
+
+# Refresh the access token this many seconds before it expires
+REFRESH_MARGIN = 60
+
+# Requests kept for the debug panel
+TIMING_HISTORY = 200
+
+
+def token_expiry(token: str) -> Optional[float]:
+    """Expiry timestamp of a JWT, read without verifying it (the server does that)"""
+    try:
+        payload = token.split('.')[1]
+        return float(json.loads(base64.urlsafe_b64decode(payload + '=' * (-len(payload) % 4)))['exp'])
+    except (IndexError, KeyError, TypeError, ValueError):
+        return None
+
+def parse_server_timing(header: str) -> Dict[str, Dict[str, Any]]:
+    """Parse a Server-Timing header into {metric: {'dur': ms, 'desc': text}}"""
+    metrics = {}
+    for part in header.split(','):
+        name, *params = [item.strip() for item in part.split(';')]
+        if not name:
+            continue
+        metric = {}
+        for param in params:
+            key, _, value = param.partition('=')
+            value = value.strip('"')
+            if key == 'dur':
+                try:
+                    value = float(value)
+                except ValueError:
+                    continue
+            metric[key] = value
+        metrics[name] = metric
+    return metrics
+
 
 class APIClient:
     def __init__(self, base_url: str = "http://127.0.0.1:8000/api"):
         self.base_url = base_url
         self.access_token: Optional[str] = None
         self.refresh_token: Optional[str] = None
+        self.access_expires_at: Optional[float] = None
+        # Only one thread refreshes at a time; the others wait and reuse its token
+        self._refresh_lock = threading.Lock()
+        # Recent requests with client and server timings, newest last
+        self.timings = deque(maxlen=TIMING_HISTORY)
+        # endpoint -> (ETag, body) for conditional GETs
+        self._etag_cache: Dict[str, Any] = {}
     
-    def _make_request(self, method: str, endpoint: str, data: Dict = None, auth_required: bool = True) -> Dict[str, Any]:
-        """Make HTTP request to API"""
+    def _make_request(self, method: str, endpoint: str, data: Dict = None, auth_required: bool = True,
+                      conditional: bool = False) -> Dict[str, Any]:
+        """Make HTTP request to API; conditional GETs reuse the cached body on 304"""
         url = f"{self.base_url}{endpoint}"
         
         headers = {
-            'Content-Type': 'application/json'
+            'Content-Type': 'application/json',
+            'Accept': ACCEPT,
+            # gzip, plus br when urllib3 can decode it
+            'Accept-Encoding': requests.utils.DEFAULT_ACCEPT_ENCODING
         }
         
-        if auth_required and self.access_token:
-            headers['Authorization'] = f'Bearer {self.access_token}'
+        cached = self._etag_cache.get(endpoint) if conditional else None
+        if cached:
+            headers['If-None-Match'] = cached[0]
         
         try:
-            if method == 'GET':
-                response = requests.get(url, headers=headers)
-            elif method == 'POST':
-                response = requests.post(url, headers=headers, data=json.dumps(data) if data else None)
-            elif method == 'PUT':
-                response = requests.put(url, headers=headers, data=json.dumps(data) if data else None)
-            elif method == 'DELETE':
-                response = requests.delete(url, headers=headers)
-            else:
+            if auth_required:
+                self._ensure_fresh_token()
+            started = time.perf_counter()
+            response = self._send(method, url, headers, data, auth_required)
+            if response is None:
                 return {'error': 'Invalid HTTP method'}
             
-            if response.status_code == 200 or response.status_code == 201:
-                return response.json()
+            # The token may have expired or been rotated elsewhere; refresh once and retry
+            if response.status_code == 401 and auth_required and self.refresh_token:
+                if self.refresh_access_token(stale_token=response.request.headers.get('Authorization')):
+                    response = self._send(method, url, headers, data, auth_required)
+            self._record_timing(method, endpoint, response, time.perf_counter() - started)
+            
+            if response.status_code == 304 and cached:
+                return cached[1]
+            
+            # 207 carries per-item results from the bulk endpoints
+            if response.status_code in (200, 201, 207):
+                result = self._decode(response)
+                if conditional and response.headers.get('ETag'):
+                    self._etag_cache[endpoint] = (response.headers['ETag'], result)
+                return result
             else:
                 try:
-                    error_data = response.json()
-                    return {'error': error_data.get('error', 'Request failed')}
+                    error_data = self._decode(response)
+                    return {'error': error_data.get('error', error_data.get('detail', 'Request failed'))}
                 except:
                     return {'error': f'Request failed with status {response.status_code}'}
                     
@@ -45,6 +115,81 @@ class APIClient:
         except Exception as e:
             return {'error': f'Request failed: {str(e)}'}
     
+    def _send(self, method: str, url: str, headers: Dict[str, str], data: Any, auth_required: bool):
+        """Send one request with the current access token; None for an unknown method"""
+        headers = dict(headers)
+        if auth_required and self.access_token:
+            headers['Authorization'] = f'Bearer {self.access_token}'
+        
+        if method == 'GET':
+            return requests.get(url, headers=headers)
+        elif method == 'POST':
+            return requests.post(url, headers=headers, data=json.dumps(data) if data else None)
+        elif method == 'PUT':
+            return requests.put(url, headers=headers, data=json.dumps(data) if data else None)
+        elif method == 'PATCH':
+            return requests.patch(url, headers=headers, data=json.dumps(data) if data else None)
+        elif method == 'DELETE':
+            return requests.delete(url, headers=headers, data=json.dumps(data) if data else None)
+        return None
+    
+    def _record_timing(self, method: str, endpoint: str, response, elapsed: float):
+        """Keep client latency and any Server-Timing breakdown for the debug panel"""
+        self.timings.append({
+            'method': method,
+            'endpoint': endpoint,
+            'status': response.status_code,
+            'client_ms': elapsed * 1000,
+            'server': parse_server_timing(response.headers.get('Server-Timing', '')),
+        })
+    
+    def _set_tokens(self, tokens: Dict[str, str]):
+        self.access_token = tokens['access']
+        self.refresh_token = tokens.get('refresh', self.refresh_token)
+        self.access_expires_at = token_expiry(self.access_token)
+    
+    def _ensure_fresh_token(self):
+        """Refresh ahead of time when the access token is about to expire"""
+        if self.refresh_token and self.access_expires_at and time.time() > self.access_expires_at - REFRESH_MARGIN:
+            self.refresh_access_token(stale_token=f'Bearer {self.access_token}')
+    
+    def refresh_access_token(self, stale_token: str = None) -> bool:
+        """
+        Trade the refresh token for new tokens; returns whether a usable token is set.
+        
+        Pass the 'Bearer ...' header that was found to be stale: if another
+        thread has already replaced it while this one waited for the lock, its
+        token is reused instead of refreshing again.
+        """
+        with self._refresh_lock:
+            if stale_token is not None and self.access_token and stale_token != f'Bearer {self.access_token}':
+                return True
+            if not self.refresh_token:
+                return False
+            
+            try:
+                response = requests.post(
+                    f"{self.base_url}/auth/refresh/",
+                    headers={'Content-Type': 'application/json', 'Accept': ACCEPT},
+                    data=json.dumps({'refresh': self.refresh_token})
+                )
+            except requests.exceptions.RequestException:
+                return False
+            
+            if response.status_code != 200:
+                # The refresh token expired or was revoked; the user has to log in again
+                if response.status_code == 401:
+                    self.refresh_token = None
+                return False
+            self._set_tokens(self._decode(response)['tokens'])
+            return True
+    
+    def _decode(self, response) -> Any:
+        """Decode a JSON or MessagePack response body"""
+        if msgpack and response.headers.get('Content-Type', '').startswith('application/msgpack'):
+            return msgpack.unpackb(response.content, raw=False, strict_map_key=False)
+        return response.json()
+    
     def register(self, email: str, username: str, password: str) -> Dict[str, Any]:
         """Register new user"""
         data = {
@@ -56,8 +201,7 @@ class APIClient:
         result = self._make_request('POST', '/auth/register/', data, auth_required=False)
         
         if 'tokens' in result:
-            self.access_token = result['tokens']['access']
-            self.refresh_token = result['tokens']['refresh']
+            self._set_tokens(result['tokens'])
         
         return result
     
@@ -71,14 +215,58 @@ class APIClient:
         result = self._make_request('POST', '/auth/login/', data, auth_required=False)
         
         if 'tokens' in result:
-            self.access_token = result['tokens']['access']
-            self.refresh_token = result['tokens']['refresh']
+            self._set_tokens(result['tokens'])
         
         return result
     
-    def get_passwords(self) -> Dict[str, Any]:
-        """Get user's passwords"""
-        return self._make_request('GET', '/passwords/')
+    def get_passwords(self, metadata_only: bool = False, cursor: str = None,
+                      page_size: int = None) -> Dict[str, Any]:
+        """Get user's passwords, optionally without decrypting them or one page at a time"""
+        params = {}
+        if metadata_only:
+            params['mode'] = 'metadata'
+        if page_size:
+            params['page_size'] = page_size
+        if cursor:
+            params['cursor'] = cursor
+        
+        endpoint = '/passwords/'
+        if params:
+            endpoint += '?' + urlencode(params)
+        return self._make_request('GET', endpoint, conditional=True)
+    
+    def get_all_passwords(self, metadata_only: bool = False, page_size: int = 500) -> Dict[str, Any]:
+        """Get every password by following page cursors, plus the vault sequence to sync from"""
+        passwords = []
+        sequence = None
+        cursor = None
+        while True:
+            result = self.get_passwords(metadata_only, cursor=cursor, page_size=page_size)
+            if 'error' in result:
+                return result
+            passwords.extend(result['results'])
+            if sequence is None:
+                sequence = result.get('sequence')
+            cursor = result.get('next')
+            if not cursor:
+                return {'results': passwords, 'sequence': sequence}
+    
+    def get_changes(self, since: int) -> Dict[str, Any]:
+        """Get vault changes made after the given sequence number"""
+        return self._make_request('GET', f'/passwords/changes/?since={since}')
+    
+    def search_passwords(self, query: str, offset: int = 0, page_size: int = None) -> Dict[str, Any]:
+        """Ranked server-side search over site name, username, and URL"""
+        params = {'q': query}
+        if offset:
+            params['offset'] = offset
+        if page_size:
+            params['page_size'] = page_size
+        return self._make_request('GET', '/passwords/search/?' + urlencode(params))
+    
+    def reveal_passwords(self, password_ids: List[int]) -> Dict[str, Any]:
+        """Decrypt the passwords for the given entry ids"""
+        return self._make_request('POST', '/passwords/reveal/', {'ids': list(password_ids)})
     
     def create_password(self, site_name: str, username: str, password: str, site_url: str = '', notes: str = '') -> Dict[str, Any]:
         """Create new password entry"""
@@ -92,6 +280,14 @@ class APIClient:
         
         return self._make_request('POST', '/passwords/', data)
     
+    def bulk_create_passwords(self, entries: List[Dict[str, str]]) -> Dict[str, Any]:
+        """Create many password entries in one request (e.g. an import)"""
+        return self._make_request('POST', '/passwords/bulk/', entries)
+    
+    def bulk_update_passwords(self, changes: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Apply field changes to many entries; each change carries its 'id'"""
+        return self._make_request('PATCH', '/passwords/bulk/', changes)
+    
     def update_password(self, password_id: int, site_name: str = None, username: str = None, 
                        password: str = None, site_url: str = None, notes: str = None) -> Dict[str, Any]:
         """Update password entry"""
@@ -113,7 +309,37 @@ class APIClient:
         """Delete password entry"""
         return self._make_request('DELETE', f'/passwords/{password_id}/')
     
+    def bulk_delete_passwords(self, password_ids: List[int]) -> Dict[str, Any]:
+        """Delete many password entries in one request"""
+        return self._make_request('DELETE', '/passwords/bulk/', {'ids': password_ids})
+    
+    def export_passwords(self, path: str, export_format: str = 'csv', compress: bool = False) -> Dict[str, Any]:
+        """Stream a decrypted export of the vault straight into a file"""
+        query = {'format': export_format}
+        if compress:
+            query['compress'] = 'gzip'
+        url = f"{self.base_url}/passwords/export/?{urlencode(query)}"
+        self._ensure_fresh_token()
+        headers = {'Authorization': f'Bearer {self.access_token}'} if self.access_token else {}
+        
+        try:
+            with requests.get(url, headers=headers, stream=True) as response:
+                if response.status_code != 200:
+                    return {'error': f'Export failed with status {response.status_code}'}
+                written = 0
+                with open(path, 'wb') as f:
+                    for chunk in response.iter_content(chunk_size=64 * 1024):
+                        f.write(chunk)
+                        written += len(chunk)
+                return {'path': path, 'bytes': written}
+        except requests.exceptions.ConnectionError:
+            return {'error': 'Cannot connect to server. Make sure Django server is running.'}
+        except Exception as e:
+            return {'error': f'Export failed: {str(e)}'}
+    
     def logout(self):
-        """Clear tokens"""
+        """Clear tokens and cached responses"""
         self.access_token = None
-        self.refresh_token = None
\ No newline at end of file
+        self.refresh_token = None
+        self.access_expires_at = None
+        self._etag_cache.clear()
\ No newline at end of file
@@ -0,0 +1,99 @@
+from PySide6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout,
+                               QTableWidget, QTableWidgetItem, QPushButton,
+                               QLabel, QHeaderView)
+from PySide6.QtCore import Qt, QTimer
+
+COLUMNS = ['Method', 'Endpoint', 'Status', 'Client ms', 'Server ms', 'DB ms', 'Queries', 'Crypto ms', 'Serialize ms']
+
+
+class DebugPanel(QWidget):
+    """Recent API requests with the server's Server-Timing breakdown"""
+
+    def __init__(self, api_client):
+        super().__init__()
+        self.api_client = api_client
+        self.setWindowTitle("Debug - Request Timings")
+        self.setGeometry(150, 150, 900, 400)
+        # Refresh while open, so new requests show up as they happen
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+        self.init_ui()
+
+    def init_ui(self):
+        layout = QVBoxLayout()
+
+        info = QLabel("Server columns are filled only when the server sends Server-Timing headers "
+                      "(SERVER_TIMING['HEADER'], on with DEBUG).")
+        info.setStyleSheet("color: #666; font-size: 12px;")
+        info.setWordWrap(True)
+
+        self.table = QTableWidget()
+        self.table.setColumnCount(len(COLUMNS))
+        self.table.setHorizontalHeaderLabels(COLUMNS)
+        self.table.setAlternatingRowColors(True)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        self.table.horizontalHeader().setSectionResizeMode(1, QHeaderView.Stretch)
+
+        button_layout = QHBoxLayout()
+        self.summary_label = QLabel()
+        self.clear_btn = QPushButton("Clear")
+        self.clear_btn.clicked.connect(self.clear)
+        button_layout.addWidget(self.summary_label)
+        button_layout.addStretch()
+        button_layout.addWidget(self.clear_btn)
+
+        layout.addWidget(info)
+        layout.addWidget(self.table)
+        layout.addLayout(button_layout)
+        self.setLayout(layout)
+
+    def refresh(self):
+        """Show the recorded requests, newest first"""
+        timings = list(self.api_client.timings)
+        self.table.setRowCount(len(timings))
+        for row, timing in enumerate(reversed(timings)):
+            server = timing['server']
+            db = server.get('db', {})
+            values = [
+                timing['method'],
+                timing['endpoint'],
+                str(timing['status']),
+                f"{timing['client_ms']:.1f}",
+                self.duration(server, 'total'),
+                self.duration(server, 'db'),
+                db.get('desc', '').replace(' queries', ''),
+                self.duration(server, 'crypto'),
+                self.duration(server, 'serialize'),
+            ]
+            for column, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                if column >= 2:
+                    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                self.table.setItem(row, column, item)
+
+        if timings:
+            slowest = max(timings, key=lambda timing: timing['client_ms'])
+            self.summary_label.setText(
+                f"{len(timings)} requests, slowest {slowest['method']} {slowest['endpoint']} "
+                f"({slowest['client_ms']:.0f} ms)"
+            )
+        else:
+            self.summary_label.setText("No requests yet")
+
+    def duration(self, server, name):
+        dur = server.get(name, {}).get('dur')
+        return '' if dur is None else f"{dur:.1f}"
+
+    def clear(self):
+        self.api_client.timings.clear()
+        self.refresh()
+
+    def closeEvent(self, event):
+        self.timer.stop()
+        super().closeEvent(event)
+
+    def showEvent(self, event):
+        self.timer.start(1000)
+        self.refresh()
+        super().showEvent(event)
@@ -132,7 +132,7 @@ class EditPasswordDialog(QDialog):
             self.notes_input.setPlainText(result.get('notes', ''))
             
             # Set current password
-            decrypted_password = result.get('decrypted_password', '')
+            decrypted_password = result.get('decrypted_password') or ''
             self.current_password_input.setText(decrypted_password)
             self.current_password_input.setPlaceholderText("")
         else:
@@ -1,10 +1,12 @@
 from PySide6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, 
                                QTableWidget, QTableWidgetItem, QPushButton, 
                                QLabel, QMessageBox, QHeaderView, QLineEdit,
-                               QSplitter, QFrame)
+                               QSplitter, QFrame, QFileDialog)
 from PySide6.QtCore import Qt
+from PySide6.QtGui import QKeySequence, QShortcut
 from controllers.api_client import APIClient
 from ui.add_password_dialog import AddPasswordDialog
+from ui.debug_panel import DebugPanel
 from ui.edit_password_dialog import EditPasswordDialog
 
 class MainWindow(QWidget):
@@ -14,6 +16,8 @@ class MainWindow(QWidget):
         self.setWindowTitle("Password Manager - My Passwords")
         self.setGeometry(100, 100, 1000, 700)
         self.password_data = []  # Store full password data
+        self.sync_sequence = None  # Vault change sequence the table reflects
+        self.debug_panel = None
         self.init_ui()
         self.load_passwords()
     
@@ -49,7 +53,7 @@ class MainWindow(QWidget):
         # Make table look better
         self.password_table.setAlternatingRowColors(True)
         self.password_table.setSelectionBehavior(QTableWidget.SelectRows)
-        self.password_table.setSelectionMode(QTableWidget.SingleSelection)
+        self.password_table.setSelectionMode(QTableWidget.ExtendedSelection)
         
         # Set column widths
         header_view = self.password_table.horizontalHeader()
@@ -118,11 +122,15 @@ class MainWindow(QWidget):
         layout.addWidget(self.status_label)
         
         self.setLayout(layout)
+        
+        # Request timings for troubleshooting slow calls
+        QShortcut(QKeySequence("Ctrl+Shift+D"), self, self.toggle_debug_panel)
     
     def load_passwords(self):
         """Load passwords from API"""
         self.status_label.setText("Loading passwords...")
-        result = self.api_client.get_passwords()
+        # Secrets are fetched on demand when the user views one
+        result = self.api_client.get_all_passwords(metadata_only=True)
         
         if 'error' in result:
             QMessageBox.critical(self, "Error", f"Failed to load passwords: {result['error']}")
@@ -130,13 +138,46 @@ class MainWindow(QWidget):
             return
         
         # Store full password data
-        self.password_data = result if isinstance(result, list) else []
+        self.password_data = result.get('results', [])
+        self.sync_sequence = result.get('sequence')
         self.populate_table(self.password_data)
         
         # Update status
         count = len(self.password_data)
         self.status_label.setText(f"Loaded {count} password{'s' if count != 1 else ''}")
     
+    def sync_changes(self):
+        """Apply vault changes since the last load instead of refetching everything"""
+        if self.sync_sequence is None:
+            self.load_passwords()
+            return
+        
+        passwords = {password['id']: password for password in self.password_data}
+        while True:
+            result = self.api_client.get_changes(self.sync_sequence)
+            if 'error' in result:
+                # Fall back to a full reload
+                self.load_passwords()
+                return
+            
+            for change in result.get('changes', []):
+                if change['action'] == 'deleted':
+                    passwords.pop(change['id'], None)
+                else:
+                    passwords[change['id']] = change['password']
+            
+            self.sync_sequence = result['sequence']
+            if not result.get('has_more'):
+                break
+        
+        self.password_data = sorted(passwords.values(), key=lambda p: (p.get('site_name', ''), p['id']))
+        self.filter_passwords()
+        
+        # Update status
+        if not self.search_input.text():
+            count = len(self.password_data)
+            self.status_label.setText(f"Loaded {count} password{'s' if count != 1 else ''}")
+    
     def populate_table(self, passwords):
         """Populate table with password data"""
         # Clear table
@@ -205,10 +246,16 @@ class MainWindow(QWidget):
         
         return item.data(Qt.UserRole)
     
+    def get_selected_passwords(self):
+        """Get the data of every selected row"""
+        rows = sorted({index.row() for index in self.password_table.selectionModel().selectedRows()})
+        items = [self.password_table.item(row, 0) for row in rows]
+        return [item.data(Qt.UserRole) for item in items if item]
+    
     def add_password(self):
         """Show add password dialog"""
         dialog = AddPasswordDialog(self.api_client)
-        dialog.password_added.connect(self.load_passwords)
+        dialog.password_added.connect(self.sync_changes)
         dialog.exec()
     
     def edit_password(self):
@@ -219,7 +266,7 @@ class MainWindow(QWidget):
             return
         
         dialog = EditPasswordDialog(self.api_client, password_data)
-        dialog.password_updated.connect(self.load_passwords)
+        dialog.password_updated.connect(self.sync_changes)
         dialog.exec()
     
     def view_password(self):
@@ -230,13 +277,18 @@ class MainWindow(QWidget):
             return
         
         # Get the decrypted password
-        result = self.api_client._make_request('GET', f'/passwords/{password_data["id"]}/')
+        result = self.api_client.reveal_passwords([password_data['id']])
         
         if 'error' in result:
             QMessageBox.critical(self, "Error", f"Failed to retrieve password: {result['error']}")
             return
         
-        decrypted_password = result.get('decrypted_password', 'Error decrypting')
+        revealed = result.get('passwords', [])
+        if not revealed:
+            QMessageBox.critical(self, "Error", "Failed to retrieve password: Password not found")
+            return
+        
+        decrypted_password = revealed[0].get('decrypted_password') or 'Error decrypting'
         site_name = password_data.get('site_name', 'Unknown')
         
         # Show password in message box
@@ -250,31 +302,71 @@ class MainWindow(QWidget):
         msg.exec()
     
     def delete_password(self):
-        """Delete selected password"""
-        password_data = self.get_selected_password()
-        if not password_data:
+        """Delete the selected passwords"""
+        selected = self.get_selected_passwords()
+        if not selected:
             QMessageBox.warning(self, "Warning", "Please select a password to delete")
             return
         
-        site_name = password_data.get('site_name', 'Unknown')
+        if len(selected) == 1:
+            target = f"the password for '{selected[0].get('site_name', 'Unknown')}'"
+        else:
+            target = f"{len(selected)} passwords"
         
         # Confirm deletion
         reply = QMessageBox.question(self, "Confirm Delete", 
-                                   f"Are you sure you want to delete the password for '{site_name}'?\n\nThis action cannot be undone.",
+                                   f"Are you sure you want to delete {target}?\n\nThis action cannot be undone.",
                                    QMessageBox.Yes | QMessageBox.No)
         
         if reply == QMessageBox.Yes:
-            result = self.api_client.delete_password(password_data['id'])
+            result = self.api_client.bulk_delete_passwords([password['id'] for password in selected])
             
             if 'error' in result:
                 QMessageBox.critical(self, "Error", f"Failed to delete password: {result['error']}")
+            elif result.get('failed'):
+                QMessageBox.warning(self, "Partially Deleted",
+                                    f"Deleted {result['deleted']} of {len(selected)} passwords; "
+                                    f"the rest no longer exist.")
+                self.sync_changes()
             else:
-                QMessageBox.information(self, "Success", "Password deleted successfully!")
-                self.load_passwords()  # Refresh the list
+                QMessageBox.information(self, "Success", "Password deleted successfully!" if len(selected) == 1
+                                        else f"{result['deleted']} passwords deleted successfully!")
+                self.sync_changes()  # Refresh the list
     
     def export_passwords(self):
-        """Export passwords (placeholder)"""
-        QMessageBox.information(self, "Export", "Export functionality coming in next update!")
+        """Export the whole vault to a CSV, JSON, or NDJSON file"""
+        path, _ = QFileDialog.getSaveFileName(
+            self, "Export Passwords", "vault-export.csv",
+            "CSV (*.csv);;JSON (*.json);;NDJSON (*.ndjson);;Compressed NDJSON (*.ndjson.gz)"
+        )
+        if not path:
+            return
+        
+        compress = path.endswith('.gz')
+        extension = path[:-3] if compress else path
+        export_format = next((fmt for fmt in ('ndjson', 'json', 'csv') if extension.endswith(f'.{fmt}')), 'csv')
+        
+        reply = QMessageBox.warning(self, "Export Passwords",
+                                    "The export file will contain your passwords in plain text.\n\nContinue?",
+                                    QMessageBox.Yes | QMessageBox.No)
+        if reply != QMessageBox.Yes:
+            return
+        
+        result = self.api_client.export_passwords(path, export_format, compress)
+        
+        if 'error' in result:
+            QMessageBox.critical(self, "Error", f"Failed to export passwords: {result['error']}")
+        else:
+            QMessageBox.information(self, "Success", f"Passwords exported to {path}")
+    
+    def toggle_debug_panel(self):
+        """Show or hide the request timing panel"""
+        if self.debug_panel is None:
+            self.debug_panel = DebugPanel(self.api_client)
+        if self.debug_panel.isVisible():
+            self.debug_panel.close()
+        else:
+            self.debug_panel.show()
     
     def logout(self):
         """Logout and close application"""